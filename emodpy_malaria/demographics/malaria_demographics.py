@@ -1,9 +1,12 @@
+from concurrent.futures import ThreadPoolExecutor
 import json
 import logging
 from functools import partial
 from pathlib import Path
 from typing import Optional, Union
 
+import numpy as np
+
 from emod_api.demographics.fertility_distribution import FertilityDistribution
 from emod_api.demographics.node import Node
 from emodpy.demographics.demographics import Demographics
@@ -13,6 +16,8 @@ from emodpy_malaria.demographics.malaria_node import (
     _set_enable_demog_risk,
     _set_innate_immune_variation_type,
 )
+from emodpy_malaria.migration.vector_migration_data import VectorMigrationData
+from emodpy_malaria.utils.asset_cache import AssetCache
 from emodpy_malaria.utils.distributions import BaseDistribution
 from emodpy_malaria.weather.weather_set import WeatherSet
 from emodpy_malaria.utils.emod_enum import (
@@ -39,6 +44,7 @@ class MalariaDemographics(Demographics):
     - `set_initial_prevalence_distribution()` — initial infection prevalence
     - `set_migration_heterogeneity()` — per-individual migration rate heterogeneity
     - `add_vector_migration()` — per-species vector migration
+    - `add_vector_migrations()` — vector migration for several species, written concurrently
     - `add_weather()` — weather files with node/idref validation
 
     Inherited from base (see [DemographicsBase](https://emod.idmod.org/emod-api/autoapi/emod_api/demographics/demographics_base/)):
@@ -78,6 +84,7 @@ class MalariaDemographics(Demographics):
         vector_migration_filename_path: Optional[str] = None,
         x_vector_migration: Optional[float] = None,
         filename: Optional[str] = None,
+        cache: Optional[AssetCache] = None,
     ):
         """Add vector migration for a species.
 
@@ -95,9 +102,10 @@ class MalariaDemographics(Demographics):
             x_vector_migration (float): Scale factor for the rate of vector migration to other nodes.
             filename (str): Output path for the binary file when using ``data``.
                 If None, auto-generates as ``vector_migration_{species}.bin``.
+            cache (AssetCache): Optional [AssetCache](https://emod.idmod.org/emodpy-malaria/autoapi/emodpy_malaria/utils/asset_cache/)
+                keyed by ``data.digest()``. If the same data was written before, the cached ``.bin``/``.json``
+                pair is copied into place instead of being written again.
         """
-        from emodpy_malaria.vector_config import _set_vector_migration_config
-
         if not species:
             raise ValueError("species is required for vector migration.")
 
@@ -110,31 +118,114 @@ class MalariaDemographics(Demographics):
                 "vector_migration_filename_path (path to existing binary).")
 
         if data is not None:
-            valid_ids = {n.id for n in self.nodes if n.id != 0}
-            data_ids = set(data.node_ids)
-            unknown = data_ids - valid_ids
-            if unknown:
-                raise ValueError(
-                    f"Vector migration data contains node IDs not in "
-                    f"demographics: {sorted(unknown)}")
-
-            if data.idref != self.idref:
-                logger.warning(
-                    f"VectorMigrationData idref '{data.idref}' does not match "
-                    f"demographics idref '{self.idref}'. Updating migration "
-                    f"idref to '{self.idref}'.")
-                data._idref = self.idref
-
             if filename is None:
                 filename = f"vector_migration_{species}.bin"
             path = Path(filename).absolute()
-            data.to_migration_file(path)
+            self._check_vector_migration(data, self._migration_node_ids())
+            self._write_vector_migration(data, path, cache)
         else:
             path = Path(vector_migration_filename_path).absolute()
             if not path.exists():
                 raise FileNotFoundError(
                     f"Vector migration file not found: {path}")
 
+        self._register_vector_migration(species, path, x_vector_migration)
+
+    def add_vector_migrations(
+        self,
+        species_data: dict,
+        *,
+        x_vector_migration: Union[float, dict[str, float], None] = None,
+        filenames: Optional[dict[str, str]] = None,
+        cache: Optional[AssetCache] = None,
+        max_workers: Optional[int] = None,
+    ):
+        """Add vector migration for several species at once.
+
+        Equivalent to calling ``add_vector_migration()`` for each species, but demographics node IDs are
+        collected once and the migration data are built, then written, concurrently in a thread pool (the
+        rate computations and binary writer run in NumPy, which releases the GIL). Every species is built and
+        validated before any file is written, so an error for one species leaves no files behind.
+
+        Args:
+            species_data (dict): Maps each species name to one of
+
+                - a [VectorMigrationData](https://emod.idmod.org/emodpy-malaria/autoapi/emodpy_malaria/migration/) object,
+                - a list of 4 gravity parameters for ``VectorMigrationData.from_gravity_model()``, or
+                - a dict of keyword arguments for ``VectorMigrationData.from_gravity_model()``
+                  (e.g. ``gravity_params``, ``female_multiplier``, ``k_nearest``).
+
+            x_vector_migration (Union[float, dict[str, float]]): Scale factor for the rate of vector migration,
+                for all species or per species.
+            filenames (dict[str, str]): Output path per species; species not listed are written to
+                ``vector_migration_{species}.bin``.
+            cache (AssetCache): Optional cache, as for ``add_vector_migration()``.
+            max_workers (int): Maximum number of threads (default: one per species, up to the executor's
+                default limit).
+        """
+        if not species_data:
+            raise ValueError("species_data must name at least one species.")
+        if any(not species for species in species_data):
+            raise ValueError("species is required for vector migration.")
+        filenames = filenames or {}
+        paths = {species: Path(filenames.get(species, f"vector_migration_{species}.bin")).absolute()
+                 for species in species_data}
+        if len(set(paths.values())) != len(paths):
+            raise ValueError(f"Each species needs its own migration file, got {sorted(map(str, paths.values()))}.")
+        if not isinstance(x_vector_migration, dict):
+            x_vector_migration = {species: x_vector_migration for species in species_data}
+
+        valid_ids = self._migration_node_ids()
+
+        def build(value):
+            if isinstance(value, VectorMigrationData):
+                return value
+            if isinstance(value, dict):
+                return VectorMigrationData.from_gravity_model(self, **value)
+            return VectorMigrationData.from_gravity_model(self, gravity_params=list(value))
+
+        with ThreadPoolExecutor(max_workers=max_workers or min(len(species_data), 32)) as pool:
+            built = [pool.submit(build, value) for value in species_data.values()]
+            data = dict(zip(species_data, (future.result() for future in built)))
+            for species_migration in data.values():
+                self._check_vector_migration(species_migration, valid_ids)
+            written = [pool.submit(self._write_vector_migration, data[species], paths[species], cache)
+                       for species in species_data]
+            for future in written:
+                future.result()
+
+        for species in species_data:
+            self._register_vector_migration(species, paths[species], x_vector_migration.get(species))
+
+    def _migration_node_ids(self) -> np.ndarray:
+        """Sorted IDs of the demographics nodes that migration data may refer to."""
+        return np.unique(np.fromiter((n.id for n in self.nodes if n.id != 0), dtype=np.int64))
+
+    def _check_vector_migration(self, data, valid_ids: np.ndarray):
+        unknown = np.setdiff1d(data.node_ids, valid_ids)
+        if len(unknown):
+            raise ValueError(
+                f"Vector migration data contains node IDs not in "
+                f"demographics: {unknown.tolist()}")
+
+        if data.idref != self.idref:
+            logger.warning(
+                f"VectorMigrationData idref '{data.idref}' does not match "
+                f"demographics idref '{self.idref}'. Updating migration "
+                f"idref to '{self.idref}'.")
+            data._idref = self.idref
+
+    @staticmethod
+    def _write_vector_migration(data, path: Path, cache: Optional[AssetCache]):
+        if cache is None:
+            data.to_migration_file(path)
+        else:
+            cache.get_or_create(data.digest(), [path, path.parent / (path.name + ".json")],
+                                partial(data.to_migration_file, path))
+
+    def _register_vector_migration(self, species: str, path: Path, x_vector_migration: Optional[float]):
+        from emodpy_malaria.vector_config import _set_vector_migration_config
+
         self.migration_files.append(path)
 
         kwargs = dict(
@@ -165,6 +256,7 @@ class MalariaDemographics(Demographics):
         relative_humidity_scale_factor: float = 1.0,
         relative_humidity_variance: float = 0.0,
         enable_rainfall_stochasticity: bool = False,
+        cache: Optional[AssetCache] = None,
     ):
         """Add weather data files and configure ``CLIMATE_BY_DATA`` mode.
 
@@ -204,6 +296,10 @@ class MalariaDemographics(Demographics):
                 Gaussian noise on daily relative humidity.
             enable_rainfall_stochasticity (bool): Draw daily rainfall from an
                 exponential distribution with mean equal to the data value.
+            cache (AssetCache): Optional [AssetCache](https://emod.idmod.org/emodpy-malaria/autoapi/emodpy_malaria/utils/asset_cache/)
+                keyed by each variable's ``WeatherData.digest()``. If the same weather data was written
+                before, the cached ``.bin``/``.bin.json`` pairs are copied into place instead of being
+                written again.
         """
         from emodpy_malaria.weather.weather_variable import WeatherVariable
         from emodpy_malaria.weather.weather_config import set_climate_by_data
@@ -255,6 +351,7 @@ class MalariaDemographics(Demographics):
         data.to_files(
             dir_path=file_paths[WeatherVariable.AIR_TEMPERATURE].parent,
             file_names={v: p.name for v, p in file_paths.items()},
+            cache=cache,
         )
 
         for path in file_paths.values():
@@ -4,3 +4,9 @@ from emodpy.utils.emod_enum import MigrationPattern as MigrationPattern  # noqa:
 from emodpy.utils.emod_enum import InterpolationType as InterpolationType  # noqa: F401
 from emodpy_malaria.migration.vector_migration_data import VectorMigrationData as VectorMigrationData  # noqa: F401
 from emodpy_malaria.migration.vector_migration_data import VECTOR_MIGRATION_BY_GENETICS as VECTOR_MIGRATION_BY_GENETICS  # noqa: F401
+from emodpy_malaria.migration.migration_file import MigrationFile as MigrationFile  # noqa: F401
+from emodpy_malaria.migration.migration_diff import MigrationDiff as MigrationDiff  # noqa: F401
+from emodpy_malaria.migration.migration_diff import diff_migration_files as diff_migration_files  # noqa: F401
+from emodpy_malaria.migration.migration_diff import iter_edge_changes as iter_edge_changes  # noqa: F401
+from emodpy_malaria.migration.migration_diff import merge_migration_files as merge_migration_files  # noqa: F401
+from emodpy_malaria.migration.migration_ops import MigrationOps as MigrationOps  # noqa: F401
@@ -0,0 +1,270 @@
+"""Batched gravity-model engine for vector migration.
+
+Computes gravity-model migration rates for every source/destination pair in NumPy blocks of source
+nodes, so peak memory is bounded by ``block_size * node_count`` rather than ``node_count ** 2``.
+Only the top ``value_limit`` destinations (by rate) are kept for each source node, which is all
+that ever gets written to an EMOD migration file.
+
+Optionally, destinations can be restricted to candidates found with a KD-tree over the nodes (the
+``k_nearest`` nodes and/or those within ``max_distance_km``), so the formula is only evaluated for
+nearby pairs and the build is O(N log N) instead of O(N^2).
+
+rate = g[0] * from_pop^g[1] * to_pop^g[2] * distance_km^g[3], capped at 1.0
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+# mean Earth radius (km) used for great-circle distances
+EARTH_RADIUS_KM = 6371.0088
+
+# WGS84 ellipsoid
+WGS84_SEMI_MAJOR_AXIS_KM = 6378.137
+WGS84_FLATTENING = 1.0 / 298.257223563
+
+
+class GravityEdges(NamedTuple):
+    """Flat (COO) gravity-model rates, grouped by source node in input node order.
+
+    Attributes:
+        sources (np.ndarray): source node ID for each rate
+        destinations (np.ndarray): destination node ID for each rate
+        rates (np.ndarray): migration rate (float64) for each source/destination pair
+    """
+    sources: np.ndarray
+    destinations: np.ndarray
+    rates: np.ndarray
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance in kilometres between points given in degrees.
+
+    Inputs broadcast against each other, so a column of source coordinates and a row of destination
+    coordinates produce a full block of pairwise distances. Differs from the WGS84 geodesic distance
+    by less than 0.5%.
+
+    Args:
+        lat1: latitude(s) of the first point(s), degrees
+        lon1: longitude(s) of the first point(s), degrees
+        lat2: latitude(s) of the second point(s), degrees
+        lon2: longitude(s) of the second point(s), degrees
+
+    Returns:
+        (np.ndarray): distances in kilometres
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(value, dtype=np.float64)) for value in (lat1, lon1, lat2, lon2))
+    half_dlat = np.sin((lat2 - lat1) / 2.0)
+    half_dlon = np.sin((lon2 - lon1) / 2.0)
+    a = half_dlat * half_dlat + np.cos(lat1) * np.cos(lat2) * half_dlon * half_dlon
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def wgs84_distance_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Distance in kilometres on the WGS84 ellipsoid between points given in degrees.
+
+    Uses Lambert's formula, which is within about 10 m of the exact geodesic distance over thousands of
+    kilometres (relative error around 1e-5), so it can stand in for per-pair geodesic calculations. Inputs
+    broadcast against each other as for haversine_km().
+
+    Args:
+        lat1: latitude(s) of the first point(s), degrees
+        lon1: longitude(s) of the first point(s), degrees
+        lat2: latitude(s) of the second point(s), degrees
+        lon2: longitude(s) of the second point(s), degrees
+
+    Returns:
+        (np.ndarray): distances in kilometres
+    """
+    f = WGS84_FLATTENING
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(value, dtype=np.float64)) for value in (lat1, lon1, lat2, lon2))
+    # reduced latitudes, then the central angle between them
+    beta1 = np.arctan((1.0 - f) * np.tan(lat1))
+    beta2 = np.arctan((1.0 - f) * np.tan(lat2))
+    half_dlat = np.sin((beta2 - beta1) / 2.0)
+    half_dlon = np.sin((lon2 - lon1) / 2.0)
+    a = half_dlat * half_dlat + np.cos(beta1) * np.cos(beta2) * half_dlon * half_dlon
+    sigma = 2.0 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    p = (beta1 + beta2) / 2.0
+    q = (beta2 - beta1) / 2.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = (sigma - np.sin(sigma)) * (np.sin(p) * np.cos(q)) ** 2 / np.cos(sigma / 2.0) ** 2
+        y = (sigma + np.sin(sigma)) * (np.cos(p) * np.sin(q)) ** 2 / np.sin(sigma / 2.0) ** 2
+        distance = WGS84_SEMI_MAJOR_AXIS_KM * (sigma - f / 2.0 * (x + y))
+    return np.where(sigma > 0, distance, 0.0)
+
+
+def _power(values: np.ndarray, exponent: float) -> np.ndarray:
+    """values ** exponent, with 0 wherever values is not positive (avoids 0 ** negative = inf)."""
+    result = np.zeros_like(values, dtype=np.float64)
+    positive = values > 0
+    result[positive] = values[positive] ** exponent
+    return result
+
+
+def _unit_vectors(latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """(N, 3) Cartesian coordinates on the unit sphere for latitudes and longitudes in degrees."""
+    lat, lon = np.radians(latitudes), np.radians(longitudes)
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+def candidate_pairs(latitudes, longitudes, max_distance_km: float = None,
+                    k_nearest: int = None) -> tuple[np.ndarray, np.ndarray]:
+    """Find nearby source/destination candidate pairs with a KD-tree over the nodes.
+
+    The tree is built once over unit-sphere coordinates, where straight-line (chord) distance is
+    monotonic in great-circle distance, so nearest neighbours and radius limits are exact.
+
+    Args:
+        latitudes: node latitudes, degrees
+        longitudes: node longitudes, degrees
+        max_distance_km (float): only pair nodes within this great-circle distance
+        k_nearest (int): only pair each source with its k nearest other nodes
+
+    Returns:
+        (tuple[np.ndarray, np.ndarray]): source and destination node indices (never the same node),
+        grouped by source index in ascending order
+    """
+    if max_distance_km is None and k_nearest is None:
+        raise ValueError("At least one of max_distance_km or k_nearest is required.")
+    if k_nearest is not None and k_nearest < 1:
+        raise ValueError(f"k_nearest must be a positive integer, got {k_nearest}.")
+    if max_distance_km is not None and max_distance_km <= 0:
+        raise ValueError(f"max_distance_km must be positive, got {max_distance_km}.")
+
+    points = _unit_vectors(np.asarray(latitudes, dtype=np.float64), np.asarray(longitudes, dtype=np.float64))
+    count = len(points)
+    tree = cKDTree(points)
+    # chord length on the unit sphere for the great-circle cutoff
+    chord = np.inf if max_distance_km is None else 2.0 * np.sin(min(max_distance_km / EARTH_RADIUS_KM, np.pi) / 2.0)
+
+    if k_nearest is not None:
+        # one extra neighbour because each node is its own nearest neighbour
+        k = min(int(k_nearest) + 1, count)
+        _, neighbours = tree.query(points, k=k, distance_upper_bound=chord)
+        neighbours = neighbours.reshape(count, k)
+        sources = np.broadcast_to(np.arange(count)[:, None], neighbours.shape)
+        found = (neighbours < count) & (neighbours != sources)
+        sources, destinations = sources[found], neighbours[found]
+    else:
+        pairs = tree.sparse_distance_matrix(tree, chord, output_type="ndarray")
+        pairs = pairs[pairs["i"] != pairs["j"]]
+        order = np.lexsort((pairs["j"], pairs["i"]))
+        sources, destinations = pairs["i"][order], pairs["j"][order]
+
+    return sources.astype(np.int64), destinations.astype(np.int64)
+
+
+def _top_k_pairs(sources: np.ndarray, destinations: np.ndarray, rates: np.ndarray, limit: int,
+                 tie_ids: np.ndarray) -> np.ndarray:
+    """Indices of the **limit** highest rates for each source, in (source, destination) order.
+
+    Equal rates are ranked by ascending **tie_ids** (the destinations' node IDs), as in the migration file writers.
+    """
+    ranked = np.lexsort((tie_ids, -rates, sources))
+    starts = np.searchsorted(sources[ranked], sources[ranked], side="left")
+    keep = ranked[np.arange(len(ranked)) - starts < limit]
+    return keep[np.lexsort((destinations[keep], sources[keep]))]
+
+
+def gravity_edges(node_ids, latitudes, longitudes, populations, gravity_params: list,
+                  value_limit: int = None, block_size: int = 512, max_distance_km: float = None,
+                  k_nearest: int = None, ellipsoidal: bool = False) -> GravityEdges:
+    """Compute gravity-model migration rates, keeping the top **value_limit** destinations per source.
+
+    Pairs where either population is zero, the distance is zero, or the source and destination are the
+    same node get no rate.
+
+    Args:
+        node_ids: node IDs, one per node
+        latitudes: node latitudes, degrees
+        longitudes: node longitudes, degrees
+        populations: node populations
+        gravity_params (list): four values [g0, g1, g2, g3] used as
+            rate = g0 * from_pop^g1 * to_pop^g2 * distance_km^g3, capped at 1.0
+        value_limit (int): maximum number of destinations kept per source node (default: all)
+        block_size (int): number of source nodes processed per NumPy block; peak memory is
+            proportional to block_size * len(node_ids)
+        max_distance_km (float): if given, only destinations within this great-circle distance are considered
+        k_nearest (int): if given, only the k nearest destinations of each source are considered;
+            with either option candidates come from a KD-tree and **block_size** is not used
+        ellipsoidal (bool): use WGS84 ellipsoidal distances (see wgs84_distance_km()) instead of great-circle
+            distances in the rate formula; candidate selection is unchanged
+
+    Returns:
+        (GravityEdges): rates grouped by source node (input order), destinations in input order
+    """
+    if len(gravity_params) != 4:
+        raise ValueError(f"gravity_params must have exactly 4 values, got {len(gravity_params)}")
+    if block_size < 1:
+        raise ValueError(f"block_size must be a positive integer, got {block_size}.")
+
+    node_ids = np.asarray(node_ids, dtype=np.int64)
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    populations = np.asarray(populations, dtype=np.float64)
+    count = len(node_ids)
+    if not (len(latitudes) == len(longitudes) == len(populations) == count):
+        raise ValueError("node_ids, latitudes, longitudes, and populations must all have the same length.")
+
+    g0, g1, g2, g3 = (float(g) for g in gravity_params)
+    distance_km = wgs84_distance_km if ellipsoidal else haversine_km
+    limit = count - 1 if value_limit is None else max(0, min(int(value_limit), count - 1))
+    from_factor = g0 * _power(populations, g1)
+    to_factor = _power(populations, g2)
+
+    if max_distance_km is not None or k_nearest is not None:
+        rows, columns = candidate_pairs(latitudes, longitudes, max_distance_km=max_distance_km, k_nearest=k_nearest)
+        distance = distance_km(latitudes[rows], longitudes[rows], latitudes[columns], longitudes[columns])
+        rates = np.minimum(from_factor[rows] * to_factor[columns] * _power(distance, g3), 1.0)
+        keep = rates > 0
+        rows, columns, rates = rows[keep], columns[keep], rates[keep]
+        keep = _top_k_pairs(rows, columns, rates, limit, node_ids[columns])
+        rows, columns, rates = rows[keep], columns[keep], rates[keep]
+        return GravityEdges(node_ids[rows], node_ids[columns], rates)
+
+    sources, destinations, rates = [], [], []
+    for start in range(0, count if limit > 0 else 0, block_size):
+        stop = min(start + block_size, count)
+        rows = np.arange(stop - start)
+        distance = distance_km(latitudes[start:stop, None], longitudes[start:stop, None],
+                               latitudes[None, :], longitudes[None, :])
+        block = from_factor[start:stop, None] * to_factor[None, :] * _power(distance, g3)
+        np.minimum(block, 1.0, out=block)
+        block[rows, rows + start] = 0.0
+
+        if limit < count - 1:
+            # top-k per source row; sort the selected columns so destinations stay in node order
+            columns = np.argpartition(-block, limit - 1, axis=1)[:, :limit]
+            columns.sort(axis=1)
+            selected = np.take_along_axis(block, columns, axis=1)
+            keep = selected > 0
+            block_rows = np.broadcast_to(rows[:, None], columns.shape)[keep]
+            columns = columns[keep]
+
+            # argpartition picks arbitrarily among rates tied at the limit-th place; re-rank those rows
+            # so ties go to the lowest destination node IDs, as in the migration file writers
+            boundary = selected.min(axis=1)
+            tied = np.flatnonzero((boundary > 0) & (np.count_nonzero(block >= boundary[:, None], axis=1) > limit))
+            if len(tied):
+                tied_rows, tied_columns = np.nonzero(block[tied] >= boundary[tied, None])
+                tied_rows = tied[tied_rows]
+                ranked = _top_k_pairs(tied_rows, tied_columns, block[tied_rows, tied_columns], limit,
+                                      node_ids[tied_columns])
+                untied = ~np.isin(block_rows, tied)
+                block_rows = np.concatenate((block_rows[untied], tied_rows[ranked]))
+                columns = np.concatenate((columns[untied], tied_columns[ranked]))
+                order = np.lexsort((columns, block_rows))
+                block_rows, columns = block_rows[order], columns[order]
+        else:
+            block_rows, columns = np.nonzero(block > 0)
+        sources.append(node_ids[block_rows + start])
+        destinations.append(node_ids[columns])
+        rates.append(block[block_rows, columns])
+
+    if not sources:
+        empty = np.zeros(0, dtype=np.int64)
+        return GravityEdges(empty, empty.copy(), np.zeros(0, dtype=np.float64))
+    return GravityEdges(np.concatenate(sources), np.concatenate(destinations), np.concatenate(rates))
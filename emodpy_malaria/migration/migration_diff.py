@@ -0,0 +1,292 @@
+"""Compare and merge EMOD migration binaries without loading them into dictionaries.
+
+Both operations work directly on the binary layout through
+[MigrationFile](https://emod.idmod.org/emodpy-malaria/autoapi/emodpy_malaria/migration/migration_file/). Source
+nodes are processed in chunks, reading only their blocks from each file, so memory use is bounded by the chunk
+size rather than the size of the files.
+
+Edges are (source, destination) pairs. Layers are compared by index (gender-major, age-minor; allele combination
+index for VECTOR_MIGRATION_BY_GENETICS files); a layer missing from one file is treated as empty.
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime
+import json
+from pathlib import Path
+from typing import Iterator, NamedTuple, Union
+
+import numpy as np
+
+from emodpy_malaria.migration.migration_file import ENTRY_SIZE, MigrationFile, node_blocks
+from emodpy_malaria.utils.node_offsets import encode_node_offsets
+
+DEFAULT_CHUNK_SIZE = 65536
+
+# metadata entries that differ between any two writes of the same data
+_IGNORED_METADATA = ("DateCreated",)
+
+
+class EdgeChanges(NamedTuple):
+    """Edges that differ between two migration files, for one chunk of source nodes in one layer.
+
+    Old or new rates are NaN for edges that are missing from that file.
+
+    Attributes:
+        layer (int): layer index
+        sources (np.ndarray): source node IDs
+        destinations (np.ndarray): destination node IDs
+        old_rates (np.ndarray): rates in the first file
+        new_rates (np.ndarray): rates in the second file
+    """
+    layer: int
+    sources: np.ndarray
+    destinations: np.ndarray
+    old_rates: np.ndarray
+    new_rates: np.ndarray
+
+    @property
+    def added(self) -> np.ndarray:
+        """np.ndarray: mask of edges only in the second file"""
+        return np.isnan(self.old_rates)
+
+    @property
+    def removed(self) -> np.ndarray:
+        """np.ndarray: mask of edges only in the first file"""
+        return np.isnan(self.new_rates)
+
+    @property
+    def changed(self) -> np.ndarray:
+        """np.ndarray: mask of edges in both files whose rates differ"""
+        return ~(self.added | self.removed)
+
+    @property
+    def deltas(self) -> np.ndarray:
+        """np.ndarray: new rate minus old rate (NaN for added and removed edges)"""
+        return self.new_rates - self.old_rates
+
+
+@dataclass
+class LayerDiff:
+    """Summary of the differences in one layer.
+
+    Attributes:
+        layer (int): layer index
+        added (int): number of edges only in the second file
+        removed (int): number of edges only in the first file
+        changed (int): number of edges whose rates differ by more than the tolerance
+        max_delta (float): largest absolute rate difference of the changed edges
+    """
+    layer: int
+    added: int = 0
+    removed: int = 0
+    changed: int = 0
+    max_delta: float = 0.0
+
+    @property
+    def identical(self) -> bool:
+        """bool: True if no edges were added, removed, or changed"""
+        return not (self.added or self.removed or self.changed)
+
+
+@dataclass
+class MigrationDiff:
+    """Summary of the differences between two migration files.
+
+    Attributes:
+        layers (list[LayerDiff]): one entry per layer
+        metadata (dict): {key: (old value, new value)} for metadata entries that differ (DateCreated is ignored)
+        nodes_added (np.ndarray): source node IDs only in the second file
+        nodes_removed (np.ndarray): source node IDs only in the first file
+    """
+    layers: list[LayerDiff] = field(default_factory=list)
+    metadata: dict = field(default_factory=dict)
+    nodes_added: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.uint32))
+    nodes_removed: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.uint32))
+
+    @property
+    def identical(self) -> bool:
+        """bool: True if the files have the same edges (within tolerance) and metadata"""
+        return (all(layer.identical for layer in self.layers) and not self.metadata
+                and not len(self.nodes_added) and not len(self.nodes_removed))
+
+    def __str__(self) -> str:
+        lines = [f"{key}: {old!r} -> {new!r}" for key, (old, new) in self.metadata.items()]
+        if len(self.nodes_added) or len(self.nodes_removed):
+            lines.append(f"Source nodes: {len(self.nodes_added)} added, {len(self.nodes_removed)} removed")
+        for layer in self.layers:
+            lines.append(f"Layer {layer.layer}: {layer.added} added, {layer.removed} removed, "
+                         f"{layer.changed} changed (max |delta| {layer.max_delta:g})")
+        return "\n".join(lines) if lines else "identical"
+
+
+def _open(migration_file: Union[str, Path, MigrationFile]) -> MigrationFile:
+    return migration_file if isinstance(migration_file, MigrationFile) else MigrationFile(migration_file)
+
+
+def _chunks(node_ids: np.ndarray, chunk_size: int) -> Iterator[np.ndarray]:
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be a positive integer, got {chunk_size}.")
+    for start in range(0, len(node_ids), chunk_size):
+        yield node_ids[start:start + chunk_size]
+
+
+def _chunk_edges(reader: MigrationFile, layer: int, node_ids: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    if layer >= reader.layer_count:
+        empty = np.zeros(0, dtype=np.uint32)
+        return empty, empty.copy(), np.zeros(0, dtype=np.float64)
+    return reader.node_edges(layer, node_ids)
+
+
+def _edge_keys(sources: np.ndarray, destinations: np.ndarray) -> np.ndarray:
+    """One uint64 per (source, destination) pair."""
+    return (sources.astype(np.uint64) << np.uint64(32)) | destinations.astype(np.uint64)
+
+
+def iter_edge_changes(first: Union[str, Path, MigrationFile], second: Union[str, Path, MigrationFile],
+                      tolerance: float = 0.0, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[EdgeChanges]:
+    """Stream the edges that differ between two migration files.
+
+    Args:
+        first (Union[str, Path, MigrationFile]): old migration binary (metadata at path + ".json")
+        second (Union[str, Path, MigrationFile]): new migration binary
+        tolerance (float): edges in both files are reported only if their rates differ by more than this
+        chunk_size (int): number of source nodes compared at a time
+
+    Returns:
+        (Iterator[EdgeChanges]): differing edges, one item per layer and chunk of source nodes that has any
+    """
+    first, second = _open(first), _open(second)
+    node_ids = np.union1d(first.node_ids, second.node_ids)
+    for layer in range(max(first.layer_count, second.layer_count)):
+        for chunk in _chunks(node_ids, chunk_size):
+            old_sources, old_destinations, old_rates = _chunk_edges(first, layer, chunk)
+            new_sources, new_destinations, new_rates = _chunk_edges(second, layer, chunk)
+            old_keys = _edge_keys(old_sources, old_destinations)
+            new_keys = _edge_keys(new_sources, new_destinations)
+
+            _, old_common, new_common = np.intersect1d(old_keys, new_keys, assume_unique=False, return_indices=True)
+            changed = np.abs(new_rates[new_common] - old_rates[old_common]) > tolerance
+            old_common, new_common = old_common[changed], new_common[changed]
+            removed = np.flatnonzero(~np.isin(old_keys, new_keys))
+            added = np.flatnonzero(~np.isin(new_keys, old_keys))
+            if not (len(old_common) or len(removed) or len(added)):
+                continue
+
+            nan_removed = np.full(len(removed), np.nan)
+            nan_added = np.full(len(added), np.nan)
+            yield EdgeChanges(
+                layer=layer,
+                sources=np.concatenate((old_sources[old_common], old_sources[removed], new_sources[added])),
+                destinations=np.concatenate((old_destinations[old_common], old_destinations[removed],
+                                             new_destinations[added])),
+                old_rates=np.concatenate((old_rates[old_common], old_rates[removed], nan_added)),
+                new_rates=np.concatenate((new_rates[new_common], nan_removed, new_rates[added])),
+            )
+
+
+def diff_migration_files(first: Union[str, Path, MigrationFile], second: Union[str, Path, MigrationFile],
+                         tolerance: float = 0.0, chunk_size: int = DEFAULT_CHUNK_SIZE) -> MigrationDiff:
+    """Summarize the differences between two migration files.
+
+    Use iter_edge_changes() for the individual edges.
+
+    Args:
+        first (Union[str, Path, MigrationFile]): old migration binary (metadata at path + ".json")
+        second (Union[str, Path, MigrationFile]): new migration binary
+        tolerance (float): edges in both files count as changed only if their rates differ by more than this
+        chunk_size (int): number of source nodes compared at a time
+
+    Returns:
+        (MigrationDiff): per-layer counts of added, removed, and changed edges, plus metadata and node differences
+    """
+    first, second = _open(first), _open(second)
+    result = MigrationDiff(
+        layers=[LayerDiff(layer) for layer in range(max(first.layer_count, second.layer_count))],
+        nodes_added=np.setdiff1d(second.node_ids, first.node_ids),
+        nodes_removed=np.setdiff1d(first.node_ids, second.node_ids),
+    )
+    for key in sorted(set(first.metadata) | set(second.metadata)):
+        old, new = first.metadata.get(key), second.metadata.get(key)
+        if key not in _IGNORED_METADATA and old != new:
+            result.metadata[key] = (old, new)
+
+    for changes in iter_edge_changes(first, second, tolerance=tolerance, chunk_size=chunk_size):
+        layer = result.layers[changes.layer]
+        changed = changes.changed
+        layer.added += int(changes.added.sum())
+        layer.removed += int(changes.removed.sum())
+        layer.changed += int(changed.sum())
+        if changed.any():
+            layer.max_delta = max(layer.max_delta, float(np.abs(changes.deltas[changed]).max()))
+    return result
+
+
+def merge_migration_files(base: Union[str, Path, MigrationFile], overlay: Union[str, Path, MigrationFile],
+                          output: Union[str, Path], by: str = "edge", value_limit: int = None,
+                          chunk_size: int = DEFAULT_CHUNK_SIZE) -> Path:
+    """Write a migration file with the edges of **overlay** laid over those of **base**.
+
+    Both files must have the same layers (GenderDataType, AgesYears and AlleleCombinations). The output keeps the
+    metadata of **base**, with a new creation date and node layout.
+
+    Args:
+        base (Union[str, Path, MigrationFile]): migration binary to start from (metadata at path + ".json")
+        overlay (Union[str, Path, MigrationFile]): migration binary whose rates take precedence
+        output (Union[str, Path]): output binary path (metadata written to path + ".json")
+        by (str): "edge" to replace only the base edges that the overlay also has (other base edges are kept), or
+            "node" to replace every block of a source node that is in the overlay file
+        value_limit (int): max destinations per source node (default: as many as the merged data needs); the
+            highest rates are kept
+        chunk_size (int): number of source nodes merged at a time
+
+    Returns:
+        (Path): path to the output binary
+    """
+    if by not in ("edge", "node"):
+        raise ValueError(f"by must be 'edge' or 'node', got {by!r}.")
+    base, overlay = _open(base), _open(overlay)
+    for key in ("GenderDataType", "AgesYears", "AlleleCombinations"):
+        if base.metadata.get(key) != overlay.metadata.get(key):
+            raise ValueError(f"Cannot merge migration files with different {key}: "
+                             f"{base.metadata.get(key)!r} and {overlay.metadata.get(key)!r}.")
+    node_ids = np.union1d(base.node_ids, overlay.node_ids).astype(np.uint32)
+
+    def merged(layer: int):
+        for chunk in _chunks(node_ids, chunk_size):
+            base_sources, base_destinations, base_rates = base.node_edges(layer, chunk)
+            sources, destinations, rates = overlay.node_edges(layer, chunk)
+            if by == "node":
+                keep = ~np.isin(base_sources, overlay.node_ids)
+            else:
+                keep = ~np.isin(_edge_keys(base_sources, base_destinations), _edge_keys(sources, destinations))
+            yield (chunk, np.concatenate((base_sources[keep], sources)),
+                   np.concatenate((base_destinations[keep], destinations)), np.concatenate((base_rates[keep], rates)))
+
+    # first pass sizes the blocks, second pass writes them
+    datavalue_count = 0
+    for layer in range(base.layer_count):
+        for _, sources, _, _ in merged(layer):
+            if len(sources):
+                datavalue_count = max(datavalue_count, int(np.unique(sources, return_counts=True)[1].max()))
+    if value_limit is not None:
+        datavalue_count = min(datavalue_count, value_limit)
+    datavalue_count = max(datavalue_count, 1)
+
+    output = Path(output).absolute()
+    metadata = dict(base.metadata)
+    metadata.update({
+        "DateCreated": f"{datetime.now():%a %b %d %Y %H:%M:%S}",
+        "NodeCount": len(node_ids),
+        "DatavalueCount": datavalue_count,
+    })
+    offsets = ENTRY_SIZE * datavalue_count * np.arange(len(node_ids))
+    with (output.parent / (output.name + ".json")).open("w") as f:
+        json.dump({"Metadata": metadata, "NodeOffsets": encode_node_offsets(node_ids, offsets)}, f,
+                  indent=4, separators=(",", ": "))
+
+    with output.open("wb") as f:
+        for layer in range(base.layer_count):
+            for chunk, sources, destinations, rates in merged(layer):
+                node_blocks(chunk, sources, destinations, rates, datavalue_count).tofile(f)
+
+    return output
@@ -0,0 +1,296 @@
+"""Bulk access to EMOD migration binary files.
+
+An EMOD migration binary is a sequence of rate layers (gender-major, age-minor; one layer per allele
+combination for VECTOR_MIGRATION_BY_GENETICS). Each layer holds one block per source node, and each
+block is ``DatavalueCount`` uint32 destination IDs followed by ``DatavalueCount`` float64 rates. The
+``NodeOffsets`` entry of the JSON metadata maps each source node to the byte offset of its block
+within a layer.
+
+[MigrationFile](https://emod.idmod.org/emodpy-malaria/autoapi/emodpy_malaria/migration/migration_file/) maps the
+whole binary once as a NumPy structured array, so destinations and rates for a layer are available as
+dense ``(node_count, DatavalueCount)`` arrays without seeking per node or building dictionaries.
+"""
+
+import json
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+
+from emodpy_malaria.utils.node_offsets import ENTRY_LENGTH, decode_node_offsets
+
+# each destination entry is a uint32 node ID plus a float64 rate
+ENTRY_SIZE = np.dtype(np.uint32).itemsize + np.dtype(np.float64).itemsize
+
+_ONE_FOR_EACH_GENDER = "ONE_FOR_EACH_GENDER"
+_VECTOR_MIGRATION_BY_GENETICS = "VECTOR_MIGRATION_BY_GENETICS"
+
+
+def block_dtype(datavalue_count: int) -> np.dtype:
+    """NumPy structured dtype for one source node's block of destinations and rates.
+
+    Args:
+        datavalue_count (int): number of destination entries per source node
+
+    Returns:
+        (np.dtype): dtype with "destinations" (uint32) and "rates" (float64) sub-array fields
+    """
+    return np.dtype([("destinations", "<u4", (datavalue_count,)), ("rates", "<f8", (datavalue_count,))])
+
+
+def node_blocks(node_ids, sources, destinations, rates, datavalue_count: int,
+                reverse_ties: bool = False) -> np.ndarray:
+    """Build one layer of a migration binary from flat source/destination/rate arrays.
+
+    For each source node the **datavalue_count** highest rates are kept, equal rates in input order, and
+    written in ascending rate order (so small rates are not lost in the cumulative sum), padded with zeros.
+
+    Args:
+        node_ids: sorted source node IDs, one block each, in file order
+        sources: source node ID for each rate (every ID must be in **node_ids**)
+        destinations: destination node ID for each rate
+        rates: migration rate for each source/destination pair
+        datavalue_count (int): number of destination entries per block
+        reverse_ties (bool): write each block in exactly the reverse of the order entries were kept in, i.e.
+            equal rates in reverse input order; by default equal rates are written in input order
+
+    Returns:
+        (np.ndarray): structured array of shape (len(node_ids),) with block_dtype(datavalue_count)
+    """
+    node_ids = np.asarray(node_ids)
+    rates = np.asarray(rates, dtype=np.float64)
+    node_count = len(node_ids)
+    blocks = np.zeros(node_count, dtype=block_dtype(datavalue_count))
+    if not len(rates) or not datavalue_count:
+        return blocks
+
+    # group entries by source node, keeping input order within each node
+    rows = np.searchsorted(node_ids, np.asarray(sources))
+    grouped = np.argsort(rows, kind="stable")
+    rows, rates = rows[grouped], rates[grouped]
+    destinations = np.asarray(destinations)[grouped]
+    counts = np.bincount(rows, minlength=node_count)
+    starts = np.cumsum(counts) - counts
+    kept = np.minimum(counts, datavalue_count)
+    limit = min(datavalue_count, int(counts.max()))
+    columns = np.arange(limit)
+
+    # selected[i, j] is the position within node i's entries of its (j + 1)th highest rate
+    width = int(counts.max())
+    if width * node_count <= 4 * len(rates) + node_count:
+        # pad to (node_count, width) and sort each row, highest rate first (stable, so ties keep input order)
+        padded = np.full((node_count, width), np.inf)
+        padded[rows, np.arange(len(rates)) - starts[rows]] = -rates
+        selected = np.argsort(padded, axis=1, kind="stable")[:, :limit]
+    else:
+        # a few very long rows would make the padded array too large, so rank all entries with one flat sort
+        ranked = np.lexsort((-rates, rows))
+        rank = np.arange(len(ranked)) - starts[rows[ranked]]
+        ranked, rank = ranked[rank < datavalue_count], rank[rank < datavalue_count]
+        selected = np.zeros((node_count, limit), dtype=np.int64)
+        selected[rows[ranked], rank] = ranked - starts[rows[ranked]]
+
+    valid = columns[None, :] < kept[:, None]
+    if reverse_ties:
+        written = np.take_along_axis(selected, np.maximum(kept[:, None] - 1 - columns[None, :], 0), axis=1)
+    else:
+        # ascending rate; a stable sort keeps equal rates in the order they were selected (input order)
+        kept_rates = np.where(valid, rates[np.minimum(starts[:, None] + selected, len(rates) - 1)], np.inf)
+        written = np.take_along_axis(selected, np.argsort(kept_rates, axis=1, kind="stable"), axis=1)
+
+    entries = (starts[:, None] + written)[valid]
+    block_destinations = blocks["destinations"]
+    block_rates = blocks["rates"]
+    block_destinations[:, :limit][valid] = destinations[entries]
+    block_rates[:, :limit][valid] = rates[entries]
+
+    return blocks
+
+
+def layer_count_from_metadata(metadata: dict) -> int:
+    """Number of rate layers in a migration binary described by the given "Metadata" dictionary."""
+    gender_data_type = metadata.get("GenderDataType", "SAME_FOR_BOTH_GENDERS")
+    ages = metadata.get("AgesYears", [])
+    if gender_data_type == _VECTOR_MIGRATION_BY_GENETICS:
+        # AgesYears is repurposed as rate layer indices, one per allele combination
+        return len(ages) if ages else max(len(metadata.get("AlleleCombinations", [])), 1)
+    num_genders = 2 if gender_data_type in (_ONE_FOR_EACH_GENDER, 1) else 1
+    return num_genders * max(len(ages), 1)
+
+
+class MigrationFile:
+    """Read-only bulk view of an EMOD migration binary and its JSON metadata.
+
+    Rows of every per-layer array are in ``NodeOffsets`` order, matching ``node_ids``.
+    """
+
+    def __init__(self, binary_path: Union[str, Path], metafile: Union[str, Path] = None,
+                 memory_map: bool = True):
+        """Open a migration binary.
+
+        Args:
+            binary_path (Union[str, Path]): path to the binary migration file
+            metafile (Union[str, Path]): path to JSON metadata file (default: **binary_path** + ".json")
+            memory_map (bool): map the binary with ``np.memmap`` (default) rather than reading it into memory
+                with a single ``np.fromfile`` call
+        """
+        self._binary_path = Path(binary_path).absolute()
+        self._metafile = Path(metafile) if metafile else self._binary_path.parent / (self._binary_path.name + ".json")
+
+        if not self._binary_path.exists():
+            raise FileNotFoundError(f"Binary file not found: {self._binary_path}")
+        if not self._metafile.exists():
+            raise FileNotFoundError(f"Metadata file not found: {self._metafile}")
+
+        with self._metafile.open("r") as f:
+            jason = json.load(f)
+        if "Metadata" not in jason or "NodeOffsets" not in jason:
+            raise ValueError(f"Metadata file '{self._metafile}' must have 'Metadata' and 'NodeOffsets' entries.")
+
+        self._metadata = jason["Metadata"]
+        self._node_count = int(self._metadata["NodeCount"])
+        self._datavalue_count = int(self._metadata["DatavalueCount"])
+        self._layer_count = layer_count_from_metadata(self._metadata)
+
+        node_offsets = jason["NodeOffsets"]
+        if len(node_offsets) != ENTRY_LENGTH * self._node_count:
+            raise ValueError(f"Length of node offsets string {len(node_offsets)} != 16 * node count {self._node_count}.")
+        self._node_ids, offsets = decode_node_offsets(node_offsets)
+        self._offsets = offsets.astype(np.int64)
+
+        block_size = ENTRY_SIZE * self._datavalue_count
+        if block_size and np.any(self._offsets % block_size):
+            raise ValueError(f"Node offsets in '{self._metafile}' are not multiples of the node block size ({block_size}).")
+        self._block_index = self._offsets // block_size if block_size else np.zeros(self._node_count, dtype=np.int64)
+        if np.any(self._block_index >= max(self._node_count, 1)):
+            raise ValueError(f"Node offsets in '{self._metafile}' point past the end of a layer.")
+
+        dtype = block_dtype(self._datavalue_count)
+        shape = (self._layer_count, self._node_count)
+        expected_size = dtype.itemsize * self._layer_count * self._node_count
+        actual_size = self._binary_path.stat().st_size
+        if actual_size < expected_size:
+            raise ValueError(f"Binary file '{self._binary_path}' has {actual_size} bytes, "
+                             f"metadata requires {expected_size} bytes.")
+
+        if expected_size == 0:
+            self._blocks = np.zeros(shape, dtype=dtype)
+        elif memory_map:
+            self._blocks = np.memmap(self._binary_path, dtype=dtype, mode="r", shape=shape)
+        else:
+            self._blocks = np.fromfile(self._binary_path, dtype=dtype,
+                                       count=self._layer_count * self._node_count).reshape(shape)
+
+        # blocks are normally stored in NodeOffsets order, in which case layer views need no copy
+        self._in_order = bool(np.array_equal(self._block_index, np.arange(self._node_count)))
+        self._sorter = np.argsort(self._node_ids, kind="stable")
+
+    @property
+    def metadata(self) -> dict:
+        """dict: the "Metadata" section of the JSON metadata file"""
+        return self._metadata
+
+    @property
+    def node_ids(self) -> np.ndarray:
+        """np.ndarray: source node IDs (uint32) in NodeOffsets order"""
+        return self._node_ids
+
+    @property
+    def node_offsets(self) -> np.ndarray:
+        """np.ndarray: byte offset of each source node's block within a layer, in NodeOffsets order"""
+        return self._offsets
+
+    @property
+    def node_count(self) -> int:
+        """int: number of source nodes"""
+        return self._node_count
+
+    @property
+    def datavalue_count(self) -> int:
+        """int: number of destination entries per source node"""
+        return self._datavalue_count
+
+    @property
+    def layer_count(self) -> int:
+        """int: number of rate layers in the binary"""
+        return self._layer_count
+
+    @property
+    def gender_data_type(self):
+        """GenderDataType metadata value (SAME_FOR_BOTH_GENDERS if absent)"""
+        return self._metadata.get("GenderDataType", "SAME_FOR_BOTH_GENDERS")
+
+    @property
+    def blocks(self) -> np.ndarray:
+        """np.ndarray: structured array of shape (layer_count, node_count) in file order"""
+        return self._blocks
+
+    def layer(self, index: int = 0) -> np.ndarray:
+        """Structured array of node blocks for one layer, rows in NodeOffsets order.
+
+        Args:
+            index (int): layer index (gender-major, age-minor; allele combination index for genetics files)
+
+        Returns:
+            (np.ndarray): structured array of shape (node_count,) with "destinations" and "rates" fields
+        """
+        if not 0 <= index < self._layer_count:
+            raise IndexError(f"Layer index {index} out of range for {self._layer_count} layers.")
+        blocks = self._blocks[index]
+        return blocks if self._in_order else blocks[self._block_index]
+
+    def destinations(self, index: int = 0) -> np.ndarray:
+        """Dense (node_count, DatavalueCount) uint32 array of destination IDs for one layer."""
+        return self.layer(index)["destinations"]
+
+    def rates(self, index: int = 0) -> np.ndarray:
+        """Dense (node_count, DatavalueCount) float64 array of rates for one layer."""
+        return self.layer(index)["rates"]
+
+    def edges(self, index: int = 0) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Flat (sources, destinations, rates) arrays for one layer.
+
+        Padding entries (rate <= 0 or destination ID 0) are dropped. Entries are grouped by source node in
+        NodeOffsets order and keep their order within each block.
+
+        Args:
+            index (int): layer index
+
+        Returns:
+            (tuple[np.ndarray, np.ndarray, np.ndarray]): source IDs, destination IDs, and rates
+        """
+        destinations = self.destinations(index)
+        rates = self.rates(index)
+        valid = (rates > 0) & (destinations > 0)
+        sources = np.broadcast_to(self._node_ids[:, None], destinations.shape)
+        return sources[valid], destinations[valid], np.asarray(rates[valid], dtype=np.float64)
+
+    def node_edges(self, index: int, node_ids) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Flat (sources, destinations, rates) arrays for some source nodes of one layer.
+
+        Only the blocks of the requested nodes are read, so a large file can be processed in bounded memory by
+        calling this for successive chunks of node IDs. Padding entries are dropped as in edges().
+
+        Args:
+            index (int): layer index
+            node_ids: source node IDs; IDs not in the file are ignored
+
+        Returns:
+            (tuple[np.ndarray, np.ndarray, np.ndarray]): source IDs, destination IDs, and rates, grouped by source
+            node in the order of **node_ids**
+        """
+        if not 0 <= index < self._layer_count:
+            raise IndexError(f"Layer index {index} out of range for {self._layer_count} layers.")
+        node_ids = np.asarray(node_ids, dtype=np.int64).ravel()
+        rows = np.zeros(0, dtype=np.int64)
+        if self._node_count:
+            positions = np.searchsorted(self._node_ids, node_ids, sorter=self._sorter)
+            rows = self._sorter[np.minimum(positions, self._node_count - 1)]
+            rows = rows[self._node_ids[rows] == node_ids]
+
+        blocks = self._blocks[index][self._block_index[rows]]
+        destinations = blocks["destinations"]
+        rates = blocks["rates"]
+        valid = (rates > 0) & (destinations > 0)
+        sources = np.broadcast_to(self._node_ids[rows][:, None], destinations.shape)
+        return sources[valid], destinations[valid], np.asarray(rates[valid], dtype=np.float64)
@@ -0,0 +1,363 @@
+"""Vectorized operations on vector migration rates.
+
+MigrationOps records a chain of operations - row scaling, row normalization and caps, masking, thresholding,
+top-k pruning and combining with another dataset - and runs them on each rate layer's flat
+(source, destination, rate) arrays when evaluate() is called, so a scenario costs one pass over the data and
+one write::
+
+    scenario = (MigrationOps(data)
+                .scale(0.5, sources=district_node_ids)
+                .cap(0.2)
+                .top_k(10)
+                .evaluate())
+    scenario.to_migration_file("vector_migration.bin")
+
+The input may be a VectorMigrationData or a (legacy) VectorMigration object; evaluate() returns a new object
+of the same type and never modifies the input. Operations apply to every layer unless given ``layers``, a
+list of layer indices (gender-major; allele combination index for VECTOR_MIGRATION_BY_GENETICS data). Edges
+keep their insertion order, which decides ties when a file is written with a value limit.
+"""
+
+import copy
+from typing import Callable, NamedTuple, Union
+
+import numpy as np
+
+from emodpy_malaria.migration.vector_migration import Layer, VectorMigration
+from emodpy_malaria.migration.vector_migration_data import VectorMigrationData, _ArrayLayer, _layer_arrays
+
+COMBINE_METHODS = ("add", "max", "replace")
+
+
+class _Operation(NamedTuple):
+    description: str
+    layers: Union[frozenset, None]
+    function: Callable
+    # layers of the other dataset, for combine()
+    other: list = None
+
+    def key(self, index: int):
+        """Hashable summary of what this operation does to layer **index**."""
+        if self.layers is not None and index not in self.layers:
+            return None
+        if self.other is None:
+            return True
+        return id(self.other[index if len(self.other) > 1 else 0])
+
+
+class MigrationOps:
+    """Lazy chain of vectorized operations on the rate layers of migration data.
+
+    Each operation returns a new MigrationOps with the operation appended, so partial chains can be reused;
+    nothing is computed until evaluate(). Layers shared by the input (e.g. identical genetics layers) are
+    processed once and stay shared in the result.
+
+    Args:
+        data (Union[VectorMigrationData, VectorMigration]): migration data to operate on
+    """
+
+    def __init__(self, data: Union[VectorMigrationData, VectorMigration]):
+        if not isinstance(data, (VectorMigrationData, VectorMigration)):
+            raise TypeError(f"MigrationOps requires VectorMigrationData or VectorMigration, got {type(data).__name__}.")
+        self._data = data
+        self._operations = ()
+
+    def __repr__(self) -> str:
+        chain = " -> ".join(operation.description for operation in self._operations) or "no operations"
+        return f"MigrationOps({type(self._data).__name__}, {len(self._data._layers)} layers: {chain})"
+
+    def scale(self, factor: float, sources=None, destinations=None, layers: list = None) -> "MigrationOps":
+        """Multiply rates by **factor**, capping each rate at 1.0.
+
+        Args:
+            factor (float): non-negative multiplier
+            sources: only scale rates out of these node IDs (default all)
+            destinations: only scale rates into these node IDs (default all)
+            layers (list): layer indices to apply to (default all)
+
+        Returns:
+            (MigrationOps): chain with this operation appended
+        """
+        if not factor >= 0:
+            raise ValueError(f"Scale factor must be non-negative, got {factor}.")
+        source_ids, destination_ids = _node_id_array(sources), _node_id_array(destinations)
+
+        def function(s, d, r):
+            selected = _edge_mask(s, d, source_ids, destination_ids)
+            r = r.copy()
+            r[selected] = np.minimum(1.0, r[selected] * factor)
+            return s, d, r
+
+        return self._then(f"scale({factor})", function, layers)
+
+    def normalize(self, total: float = 1.0, sources=None, layers: list = None) -> "MigrationOps":
+        """Scale each source node's outbound rates so they sum to **total**.
+
+        Rows with no positive rates are left unchanged.
+
+        Args:
+            total (float): outbound rate sum per source node, in (0.0, 1.0]
+            sources: only normalize these source node IDs (default all)
+            layers (list): layer indices to apply to (default all)
+
+        Returns:
+            (MigrationOps): chain with this operation appended
+        """
+        if not 0.0 < total <= 1.0:
+            raise ValueError(f"Normalized total must be in (0.0, 1.0], got {total}.")
+        source_ids = _node_id_array(sources)
+
+        def function(s, d, r):
+            return s, d, _scale_rows(s, r, source_ids, lambda sums: total / sums)
+
+        return self._then(f"normalize({total})", function, layers)
+
+    def cap(self, max_total: float, sources=None, layers: list = None) -> "MigrationOps":
+        """Scale down the outbound rates of any source node whose rates sum to more than **max_total**.
+
+        Args:
+            max_total (float): largest allowed outbound rate sum per source node, non-negative
+            sources: only cap these source node IDs (default all)
+            layers (list): layer indices to apply to (default all)
+
+        Returns:
+            (MigrationOps): chain with this operation appended
+        """
+        if not max_total >= 0:
+            raise ValueError(f"Cap must be non-negative, got {max_total}.")
+        source_ids = _node_id_array(sources)
+
+        def function(s, d, r):
+            return s, d, _scale_rows(s, r, source_ids, lambda sums: np.minimum(1.0, max_total / sums))
+
+        return self._then(f"cap({max_total})", function, layers)
+
+    def mask(self, sources=None, destinations=None, invert: bool = False, layers: list = None) -> "MigrationOps":
+        """Keep only the edges out of **sources** and into **destinations**.
+
+        Args:
+            sources: source node IDs to keep (default all)
+            destinations: destination node IDs to keep (default all)
+            invert (bool): drop the matching edges instead of keeping them
+            layers (list): layer indices to apply to (default all)
+
+        Returns:
+            (MigrationOps): chain with this operation appended
+        """
+        if sources is None and destinations is None:
+            raise ValueError("mask() requires sources and/or destinations.")
+        source_ids, destination_ids = _node_id_array(sources), _node_id_array(destinations)
+
+        def function(s, d, r):
+            keep = _edge_mask(s, d, source_ids, destination_ids) != invert
+            return s[keep], d[keep], r[keep]
+
+        return self._then(f"mask(invert={invert})", function, layers)
+
+    def threshold(self, min_rate: float, layers: list = None) -> "MigrationOps":
+        """Drop edges with rates below **min_rate**.
+
+        Args:
+            min_rate (float): smallest rate to keep
+            layers (list): layer indices to apply to (default all)
+
+        Returns:
+            (MigrationOps): chain with this operation appended
+        """
+        def function(s, d, r):
+            keep = r >= min_rate
+            return s[keep], d[keep], r[keep]
+
+        return self._then(f"threshold({min_rate})", function, layers)
+
+    def top_k(self, k: int, layers: list = None) -> "MigrationOps":
+        """Keep the **k** largest outbound rates of each source node.
+
+        Among equal rates, edges earlier in insertion order are kept.
+
+        Args:
+            k (int): number of edges to keep per source node, at least 1
+            layers (list): layer indices to apply to (default all)
+
+        Returns:
+            (MigrationOps): chain with this operation appended
+        """
+        if int(k) != k or k < 1:
+            raise ValueError(f"k must be a positive integer, got {k}.")
+        k = int(k)
+
+        def function(s, d, r):
+            # rank edges within each source: descending rate, then insertion order
+            order = np.lexsort((np.arange(len(r)), -r, s))
+            ordered_sources = s[order]
+            starts = np.flatnonzero(np.concatenate(([True], ordered_sources[1:] != ordered_sources[:-1])))
+            ranks = np.arange(len(r)) - np.repeat(starts, np.diff(np.append(starts, len(r))))
+            keep = np.sort(order[ranks < k])
+            return s[keep], d[keep], r[keep]
+
+        return self._then(f"top_k({k})", function, layers)
+
+    def combine(self, other: Union[VectorMigrationData, VectorMigration, "MigrationOps"], how: str = "add",
+                layers: list = None) -> "MigrationOps":
+        """Union of these rates with **other**'s, edge by edge.
+
+        Edges in both datasets get a rate from **how**: "add" (sum, capped at 1.0), "max", or "replace" (the
+        other dataset's rate). Edges only in **other** are appended with their own rates. A single-layer
+        **other** applies to every layer; otherwise the layers must correspond one to one.
+
+        Args:
+            other (Union[VectorMigrationData, VectorMigration, MigrationOps]): rates to combine with; a
+                MigrationOps is evaluated now
+            how (str): one of "add", "max" or "replace"
+            layers (list): layer indices to apply to (default all)
+
+        Returns:
+            (MigrationOps): chain with this operation appended
+        """
+        if how not in COMBINE_METHODS:
+            raise ValueError(f"Unknown combine method '{how}', expected one of {list(COMBINE_METHODS)}.")
+        if isinstance(other, MigrationOps):
+            other = other.evaluate()
+        if not isinstance(other, (VectorMigrationData, VectorMigration)):
+            raise TypeError(f"Cannot combine with {type(other).__name__}.")
+        if _idref(other) != _idref(self._data):
+            raise ValueError(f"Cannot combine migration data with different IdReference values "
+                             f"('{_idref(self._data)}' and '{_idref(other)}').")
+        other_layers = list(other._layers)
+        if len(other_layers) > 1 and _layer_structure(other) != _layer_structure(self._data):
+            raise ValueError(f"Cannot combine migration data with different layers: {_layer_structure(self._data)} "
+                             f"and {_layer_structure(other)}.")
+
+        def function(s, d, r, other_arrays):
+            return _combine_arrays((s, d, r), other_arrays, how)
+
+        return self._then(f"combine('{how}')", function, layers, other_layers)
+
+    def evaluate(self) -> Union[VectorMigrationData, VectorMigration]:
+        """Run the chained operations.
+
+        Returns:
+            (Union[VectorMigrationData, VectorMigration]): new migration data of the input's type and metadata
+        """
+        layers = self._data._layers
+        arrays_cache = {}
+        results = {}
+        new_layers = []
+        for index, layer in enumerate(layers):
+            key = (id(layer),) + tuple(operation.key(index) for operation in self._operations)
+            if key not in results:
+                if id(layer) not in arrays_cache:
+                    arrays_cache[id(layer)] = _arrays(layer)
+                arrays = arrays_cache[id(layer)]
+                for operation in self._operations:
+                    if operation.key(index) is None:
+                        continue
+                    if operation.other is None:
+                        arrays = operation.function(*arrays)
+                    else:
+                        other_layer = operation.other[index if len(operation.other) > 1 else 0]
+                        if id(other_layer) not in arrays_cache:
+                            arrays_cache[id(other_layer)] = _arrays(other_layer)
+                        arrays = operation.function(*arrays, arrays_cache[id(other_layer)])
+                results[key] = arrays
+            # layers with the same input and operations share the computation, not the result
+            new_layers.append(self._new_layer(*results[key]))
+
+        result = copy.copy(self._data)
+        if isinstance(result, VectorMigration):
+            result._agesyears = list(result._agesyears)
+        else:
+            result._ages = list(result._ages)
+            result._allele_combinations = copy.deepcopy(result._allele_combinations)
+        result._layers = new_layers
+        return result
+
+    def _then(self, description: str, function: Callable, layers: list = None, other: list = None) -> "MigrationOps":
+        if layers is not None:
+            layers = frozenset(int(index) for index in layers)
+            invalid = sorted(index for index in layers if not 0 <= index < len(self._data._layers))
+            if invalid:
+                raise ValueError(f"Layer indices {invalid} out of range for {len(self._data._layers)} layers.")
+        if other is not None and len(other) not in (1, len(self._data._layers)):
+            raise ValueError(f"Cannot combine {len(self._data._layers)} layers with {len(other)} layers.")
+        chained = copy.copy(self)
+        chained._operations = self._operations + (_Operation(description, layers, function, other),)
+        return chained
+
+    def _new_layer(self, sources: np.ndarray, destinations: np.ndarray, rates: np.ndarray):
+        if isinstance(self._data, VectorMigration):
+            return Layer.from_arrays(sources, destinations, rates)
+        return _ArrayLayer(sources, destinations, rates)
+
+
+def _arrays(layer) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Flat int64 sources, int64 destinations and float64 rates of a dict layer or a CSR Layer."""
+    if isinstance(layer, Layer):
+        return (np.repeat(layer.nodes.astype(np.int64), np.diff(layer.indptr)),
+                layer.destinations.astype(np.int64), layer.rates)
+    return _layer_arrays(layer)
+
+
+def _node_id_array(node_ids) -> Union[np.ndarray, None]:
+    if node_ids is None:
+        return None
+    if not isinstance(node_ids, np.ndarray):
+        node_ids = list(node_ids)
+    return np.unique(np.asarray(node_ids, dtype=np.int64))
+
+
+def _edge_mask(sources: np.ndarray, destinations: np.ndarray, source_ids, destination_ids) -> np.ndarray:
+    selected = np.ones(len(sources), dtype=bool)
+    if source_ids is not None:
+        selected &= np.isin(sources, source_ids)
+    if destination_ids is not None:
+        selected &= np.isin(destinations, destination_ids)
+    return selected
+
+
+def _scale_rows(sources: np.ndarray, rates: np.ndarray, source_ids, row_factor: Callable) -> np.ndarray:
+    """Multiply each selected source's rates by row_factor(row sum), for rows with a positive sum, capping each
+    rate at 1.0."""
+    rows, inverse = np.unique(sources, return_inverse=True)
+    sums = np.bincount(inverse, weights=rates, minlength=len(rows))
+    selected = sums > 0
+    if source_ids is not None:
+        selected &= np.isin(rows, source_ids)
+    factors = np.ones(len(rows))
+    factors[selected] = row_factor(sums[selected])
+    return np.minimum(1.0, rates * factors[inverse])
+
+
+def _combine_arrays(first: tuple, second: tuple, how: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Union of two layers' edges; shared edges are combined by **how**, second-only edges are appended."""
+    (s1, d1, r1), (s2, d2, r2) = first, second
+    keys1, keys2 = (s.astype(np.uint64) << np.uint64(32) | d.astype(np.uint64) for s, d in ((s1, d1), (s2, d2)))
+    order = np.argsort(keys2, kind="stable")
+    positions = np.searchsorted(keys2, keys1, sorter=order)
+    found = positions < len(keys2)
+    found[found] = keys2[order[positions[found]]] == keys1[found]
+    matched = order[positions[found]]
+
+    rates = r1.copy()
+    if how == "add":
+        rates[found] = np.minimum(1.0, rates[found] + r2[matched])
+    elif how == "max":
+        rates[found] = np.maximum(rates[found], r2[matched])
+    else:
+        rates[found] = r2[matched]
+
+    appended = np.ones(len(keys2), dtype=bool)
+    appended[matched] = False
+    return (np.concatenate((s1, s2[appended])), np.concatenate((d1, d2[appended])),
+            np.concatenate((rates, r2[appended])))
+
+
+def _idref(data) -> str:
+    return data.IdReference if isinstance(data, VectorMigration) else data.idref
+
+
+def _layer_structure(data) -> tuple:
+    """(gender data type, ages or allele combinations) describing what each layer index means."""
+    if isinstance(data, VectorMigration):
+        return data.GenderDataType, data.AgesYears or None
+    return data.gender_data_type, data.allele_combinations
@@ -34,17 +34,30 @@
 # DestinationsPerNode. The binary file will have DestinationsPerNode entries
 # per node.
 #
+# The CSV file is read in chunks (--chunk-size rows at a time) in two passes: the first pass detects the
+# column configuration, the FromNodeIDs and the maximum number of destinations per node; the second pass
+# writes each chunk straight into a memory-mapped output file. So files larger than memory can be converted.
+#
 # -----------------------------------------------------------------------------
 
+import argparse
+import ast
 import collections
 import datetime
 import json
 import os
-import struct
 import sys
-import pandas as pd
 from enum import Enum
-import ast
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from emodpy_malaria.utils.node_offsets import encode_node_offsets
+
+# each destination entry is a uint32 node ID plus a float64 rate
+_ENTRY_SIZE = 12
+DEFAULT_CHUNK_SIZE = 1_000_000
 
 
 class GenderDataType(Enum):
@@ -59,11 +72,16 @@ class MetaData:
         self.offset_str = ""
         self.max_destinations_per_node = 0
         self.gender_data_type = None
+        self.filename_in = ""
         self.filename_out = ""
         self.num_columns = 0
+        self.has_headers = False
+        self.chunk_size = DEFAULT_CHUNK_SIZE
         self.allele_combinations = []
-        self.data_df = None
+        self.from_node_ids = None  # in order of first appearance in the file
         self.ref_id = None
+        self.migration_type = None
+        self.author = None
 
 
 # -----------------------------------------------------------------------------
@@ -73,11 +91,15 @@ def write_metadata_file(metadata):
     output_json = collections.OrderedDict([])
 
     output_json["Metadata"] = {}
+    if metadata.author is not None:
+        output_json["Metadata"]["Author"] = metadata.author
     output_json["Metadata"]["IdReference"] = metadata.ref_id
     output_json["Metadata"]["DateCreated"] = datetime.datetime.now().ctime()
     output_json["Metadata"]["Tool"] = os.path.basename(sys.argv[0])
     output_json["Metadata"]["DatavalueCount"] = metadata.max_destinations_per_node
     output_json["Metadata"]["GenderDataType"] = metadata.gender_data_type.value
+    if metadata.migration_type is not None:
+        output_json["Metadata"]["MigrationType"] = metadata.migration_type
     if metadata.allele_combinations:
         output_json["Metadata"]["AlleleCombinations"] = metadata.allele_combinations
     output_json["Metadata"]["NodeCount"] = metadata.node_count
@@ -96,16 +118,23 @@ def is_number(value):
         return False
 
 
-def get_summary_data(metadata):
-    # ----------------------------
-    # collect data from CSV file
-    # ----------------------------
-    data_df = metadata.data_df
-    metadata.num_columns = len(data_df.iloc[0])
+def read_chunks(metadata):
+    """Yield the data rows of the CSV file as DataFrames of at most metadata.chunk_size rows."""
+    yield from pd.read_csv(metadata.filename_in, header=None, skiprows=1 if metadata.has_headers else 0,
+                           chunksize=metadata.chunk_size)
+
+
+def get_column_configuration(metadata):
+    # ------------------------------------------------------------------
+    # determine the column configuration from the first line of the file
+    # ------------------------------------------------------------------
+    headers = pd.read_csv(metadata.filename_in, nrows=0).columns
+    metadata.num_columns = len(headers)
     if metadata.num_columns < 3:
         raise ValueError(f"There are {metadata.num_columns} in the file, but we expect at least three. "
                          f"Please review comments for expected column configurations and try again.")
-    if is_number(data_df.columns[0]):  # no column headers
+    metadata.has_headers = not is_number(headers[0])
+    if not metadata.has_headers:
         if metadata.num_columns == 3:
             print(f"File doesn't seem to have headers, and with {metadata.num_columns} columns, "
                   "we are assuming 'FromNodeID', 'ToNodeID', 'Rate' column configuration.")
@@ -119,7 +148,6 @@ def get_summary_data(metadata):
                              f"obvious what the column configuration should be. If you are trying to create a "
                              f"VECTOR_MIGRATION_BY_GENETICS file, please add headers as shown in the comments.")
     else:  # has headers, force user to use one of the three formats
-        headers = data_df.columns
         if 'FromNodeID' not in headers[0] or 'ToNodeID' not in headers[1]:
             raise ValueError(f"With headers, we expect first two column headers to be 'FromNodeID', 'ToNodeID', but "
                              f"they are {headers[0]} and {headers[1]}.")
@@ -132,7 +160,7 @@ def get_summary_data(metadata):
         elif metadata.num_columns > 3:
             if "[]" in headers[2]:
                 metadata.gender_data_type = GenderDataType.VECTOR_MIGRATION_BY_GENETICS
-                for alleles in data_df.columns.tolist()[2:]:
+                for alleles in headers.tolist()[2:]:
                     metadata.allele_combinations.append(ast.literal_eval(alleles))
             elif metadata.num_columns == 4:
                 if 'RateMales' in headers[2] and 'RateFemales' in headers[3]:
@@ -147,27 +175,46 @@ def get_summary_data(metadata):
                                  f"expected headers. Please review the headers expected in the comments, correct, "
                                  f"and try again.")
 
+
+def get_summary_data(metadata):
+    # ----------------------------
+    # collect data from CSV file
+    # ----------------------------
+    get_column_configuration(metadata)
+
     # -------------------------------------------------------------------------
-    # Find the list node that individuals can migrate from
-    # Also find the maximum number of nodes that one can go to from a give node.
+    # First pass: find the list of nodes that individuals can migrate from (in order of first appearance)
+    # and the maximum number of nodes that one can go to from a given node.
     # This max is used in determine the layout of the binary data.
     # -------------------------------------------------------------------------
-    from_node_id_list = data_df[data_df.columns[0]].unique().tolist()
-    for from_node_id in from_node_id_list:
-        to_node_id_list = data_df[data_df.iloc[:, 0] == from_node_id].iloc[:, 1]
-        if len(to_node_id_list) != len(to_node_id_list.unique()):
-            raise ValueError(f"For 'FromNodeID' = {from_node_id}, there are non-unique 'ToNodeIDs'.")
-        if len(to_node_id_list) > metadata.max_destinations_per_node:
-            metadata.max_destinations_per_node = len(to_node_id_list)
+    chunk_ids, chunk_counts, chunk_first = [], [], []
+    rows_read = 0
+    for chunk in read_chunks(metadata):
+        from_ids = chunk.iloc[:, 0].to_numpy(dtype=np.int64)
+        ids, first, counts = np.unique(from_ids, return_index=True, return_counts=True)
+        chunk_ids.append(ids)
+        chunk_counts.append(counts)
+        chunk_first.append(first + rows_read)
+        rows_read += len(from_ids)
+
+    if not rows_read:
+        raise ValueError(f"There is no data in {metadata.filename_in}.")
+
+    ids, inverse = np.unique(np.concatenate(chunk_ids), return_inverse=True)
+    counts = np.bincount(inverse, weights=np.concatenate(chunk_counts)).astype(np.int64)
+    first = np.full(len(ids), rows_read, dtype=np.int64)
+    np.minimum.at(first, inverse, np.concatenate(chunk_first))
+    order = np.argsort(first)
+    metadata.from_node_ids = ids[order]
+    metadata.max_destinations_per_node = int(counts.max())
 
     # -------------------------------------------------------------------
     # Create NodeOffsets string
     # This contains the location of each From Node's data in the bin file
     # -------------------------------------------------------------------
-    for from_node_id in from_node_id_list:
-        metadata.offset_str += '%0.8X' % from_node_id
-        metadata.offset_str += '%0.8X' % (metadata.node_count * metadata.max_destinations_per_node * 12) # 12 -> sizeof(uint32_t) + sizeof(double)
-        metadata.node_count += 1
+    metadata.node_count = len(metadata.from_node_ids)
+    offsets = np.arange(metadata.node_count) * metadata.max_destinations_per_node * _ENTRY_SIZE
+    metadata.offset_str = encode_node_offsets(metadata.from_node_ids, offsets, uppercase=True)
 
     # return metadata
 
@@ -176,55 +223,90 @@ def get_summary_data(metadata):
 # WriteBinFileGender
 # -----------------------------------------------------------------------------
 def write_bin_file(metadata):
-    bin_file = open(metadata.filename_out, 'wb')
-    data_df = metadata.data_df
-    from_node_id_list = data_df[data_df.columns[0]].unique().tolist()
-    for data_index in range(2, metadata.num_columns):
-        for from_node_id in from_node_id_list:
-            # Initialize with zeros
-            to_node_id_array = [0] * metadata.max_destinations_per_node
-            rates_array = [0] * metadata.max_destinations_per_node
-
-            # Populate arrays with data
-            to_node_id_list = data_df[data_df.iloc[:, 0] == from_node_id].iloc[:, 1].tolist()
-            for index, to_node_id in enumerate(to_node_id_list):
-                rate_list = data_df[(data_df.iloc[:, 0] == from_node_id) & (data_df.iloc[:, 1] == to_node_id)].iloc[:, data_index].to_list()
-                if len(rate_list) > 1:  # should only have one entry for the to/from node id combination
-                    raise ValueError(f"For FromNodeID {from_node_id} and ToNodeID {to_node_id}, there are multiple "
-                                     f"rates in column index {data_index}.")
-                to_node_id_array[index] = to_node_id
-                rates_array[index] = rate_list[0]  # get the one rate
-
-            # Format data into binary
-            bin_data_id = struct.pack('I' * len(to_node_id_array), *to_node_id_array)
-            bin_data_rt = struct.pack('d' * len(rates_array), *rates_array)
-
-            bin_file.write(bin_data_id)
-            bin_file.write(bin_data_rt)
-
-    bin_file.close()
+    # -------------------------------------------------------------------------
+    # Second pass: scatter each chunk into its nodes' blocks of a memory-mapped output file.
+    # Each rate column is a layer; within a node, destinations are in the order they appear in the file.
+    # -------------------------------------------------------------------------
+    num_layers = metadata.num_columns - 2
+    dvc = metadata.max_destinations_per_node
+    dtype = np.dtype([("destinations", "<u4", (dvc,)), ("rates", "<f8", (dvc,))])
+    output = np.memmap(metadata.filename_out, dtype=dtype, mode="w+", shape=(num_layers, metadata.node_count))
 
+    sorted_ids = np.argsort(metadata.from_node_ids)
+    filled = np.zeros(metadata.node_count, dtype=np.int64)
+    for chunk in read_chunks(metadata):
+        values = chunk.to_numpy()
+        rows = sorted_ids[np.searchsorted(metadata.from_node_ids, values[:, 0].astype(np.int64), sorter=sorted_ids)]
+        # position of each entry within its node's block: entries already written plus rank within this chunk
+        grouped = np.argsort(rows, kind="stable")
+        counts = np.bincount(rows, minlength=metadata.node_count)
+        columns = np.empty(len(rows), dtype=np.int64)
+        columns[grouped] = np.arange(len(rows)) - (np.cumsum(counts) - counts)[rows[grouped]]
+        columns += filled[rows]
+        filled += counts
+        for layer in range(num_layers):
+            output[layer]["destinations"][rows, columns] = values[:, 1].astype(np.uint32)
+            output[layer]["rates"][rows, columns] = values[:, 2 + layer].astype(np.float64)
+    output.flush()
 
-if __name__ == "__main__":
-    if not (len(sys.argv) == 2 or len(sys.argv) == 3):
-        print('\nUsage: %s [input-migration-csv] [idreference(optional)]' % os.path.basename(sys.argv[0]))
-        exit(0)
+    # each FromNodeID/ToNodeID combination should only have one entry; check a block of nodes at a time
+    repeated_node_id = None
+    nodes_per_block = max(1, metadata.chunk_size // max(dvc, 1))
+    for start in range(0, metadata.node_count, nodes_per_block):
+        block = np.sort(output[0]["destinations"][start:start + nodes_per_block], axis=1)
+        repeated = np.any((block[:, 1:] == block[:, :-1]) & (block[:, 1:] != 0), axis=1)
+        if repeated.any():
+            repeated_node_id = metadata.from_node_ids[start + int(np.argmax(repeated))]
+            break
+    del output
+
+    if repeated_node_id is not None:
+        os.remove(metadata.filename_out)
+        raise ValueError(f"For 'FromNodeID' = {repeated_node_id}, there are non-unique 'ToNodeIDs'.")
+
+
+def convert_csv_to_bin(filename_in, filename_out=None, id_ref="temp_id_reference", chunk_size=DEFAULT_CHUNK_SIZE,
+                       migration_type=None, author=None):
+    """Convert a migration CSV file to an EMOD binary migration file and its .json metadata file.
 
-    filename_in = sys.argv[1]
-    id_ref = "temp_id_reference"
-    if len(sys.argv) == 3:
-        id_ref = sys.argv[2]
+    Args:
+        filename_in: path to the CSV file, in one of the column configurations described above
+        filename_out: path of the binary file to write (default: **filename_in** with a .bin extension)
+        id_ref: IdReference for the metadata file, must match the demographics
+        chunk_size: number of CSV rows read at a time
+        migration_type: optional MigrationType to record in the metadata
+        author: optional Author to record in the metadata
 
+    Returns:
+        MetaData describing the file written
+    """
     meta_data = MetaData()
     meta_data.ref_id = id_ref
-    meta_data.data_df = pd.read_csv(filename_in)
-    meta_data.filename_out = filename_in.split(".")[0] + ".bin"
+    meta_data.filename_in = str(filename_in)
+    meta_data.filename_out = str(filename_out) if filename_out else str(Path(filename_in).with_suffix(".bin"))
+    meta_data.chunk_size = int(chunk_size)
+    meta_data.migration_type = migration_type
+    meta_data.author = author
+    if meta_data.chunk_size < 1:
+        raise ValueError(f"chunk_size must be a positive integer, got {chunk_size}.")
     get_summary_data(meta_data)
     write_bin_file(meta_data)
     write_metadata_file(meta_data)
+    return meta_data
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a migration CSV file to an EMOD binary migration file.")
+    parser.add_argument("filename_in", help="input migration csv")
+    parser.add_argument("id_ref", nargs="?", default=None, help="IdReference (optional)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows read at a time")
+    args = parser.parse_args()
+
+    meta_data = convert_csv_to_bin(args.filename_in, id_ref=args.id_ref or "temp_id_reference",
+                                   chunk_size=args.chunk_size)
 
     print(f"max_destinations_per_node = {meta_data.max_destinations_per_node}")
-    print(f"Finished converting {filename_in} to {meta_data.filename_out} and +.json metadata file.")
-    if len(sys.argv) == 2:
+    print(f"Finished converting {args.filename_in} to {meta_data.filename_out} and +.json metadata file.")
+    if args.id_ref is None:
         print(f"IdReference in {meta_data.filename_out}.json file is set to a temporary value, please update it"
               f" to match your demographics.")
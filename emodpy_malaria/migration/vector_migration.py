@@ -1,9 +1,9 @@
-from collections import defaultdict
+from collections.abc import Mapping, MutableMapping
 from datetime import datetime
-from functools import partial
+from itertools import chain
 import json
 from numbers import Integral
-from os import environ, SEEK_SET
+from os import environ
 from pathlib import Path
 from platform import system
 from warnings import warn
@@ -12,26 +12,205 @@ import numpy as np
 import csv
 
 # for from_params()
-import scipy.spatial.distance as spspd
-from emod_api.demographics import Demographics as Demog
+from scipy.spatial import cKDTree
 
-# for from_demog_and_param_gravity()
-from geographiclib.geodesic import Geodesic
+# for from_demographics_and_gravity_params() and from_file()
+from emodpy_malaria.migration.gravity import gravity_edges
+from emodpy_malaria.migration.migration_file import ENTRY_SIZE, MigrationFile, node_blocks
+from emodpy_malaria.utils.node_offsets import decode_node_offsets, encode_node_offsets
 
 
-class Layer(dict):
+class _LayerRow(MutableMapping):
+    """Write-through view of the outbound rates for one source node in a Layer.
+
+    Reads come from the layer's write buffer if the row has been modified, otherwise from the CSR arrays. Writes
+    go to the layer's write buffer, so a row view stays valid across freeze(). As with the defaultdict rows of
+    earlier versions, reading a destination with no rate returns 0.0 (so ``row[dst] += rate`` works), but does
+    not add the destination to the row.
+    """
+
+    __slots__ = ("_layer", "_key")
+
+    def __init__(self, layer, key):
+
+        self._layer = layer
+        self._key = key
+
+        return
+
+    def _frozen(self):
+        """Destination and rate slices for this row in the CSR arrays (empty if it is not there)."""
+        layer = self._layer
+        index = layer._row_index(self._key)
+        if index is None:
+            return layer._destinations[:0], layer._rates[:0]
+        start, stop = layer._indptr[index], layer._indptr[index + 1]
+        return layer._destinations[start:stop], layer._rates[start:stop]
+
+    def _find(self, destination):
+        """(True, rate) if destination has a rate in this row, otherwise (False, None)."""
+        row = self._layer._buffer.get(self._key)
+        if row is not None:
+            return (True, row[destination]) if destination in row else (False, None)
+        if not isinstance(destination, Integral) or destination < 0:
+            return False, None
+        destinations, rates = self._frozen()
+        index = int(np.searchsorted(destinations, destination))
+        if index < len(destinations) and destinations[index] == destination:
+            return True, float(rates[index])
+        return False, None
+
+    def __getitem__(self, destination):
+        return self._find(destination)[1] or 0.0
+
+    def __setitem__(self, destination, rate):
+        self._layer._row_buffer(self._key)[destination] = rate
+        return
+
+    def __delitem__(self, destination):
+        del self._layer._row_buffer(self._key)[destination]
+        return
+
+    def __contains__(self, destination):
+        return self._find(destination)[0]
+
+    def __iter__(self):
+        row = self._layer._buffer.get(self._key)
+        return iter(list(row) if row is not None else self._frozen()[0].tolist())
+
+    def __len__(self):
+        row = self._layer._buffer.get(self._key)
+        return len(row) if row is not None else len(self._frozen()[0])
+
+    def get(self, destination, default=None):
+        found, rate = self._find(destination)
+        return rate if found else default
+
+    def pop(self, destination, *default):
+        if destination not in self and default:
+            return default[0]
+        return self._layer._row_buffer(self._key).pop(destination)
+
+    def setdefault(self, destination, default=0.0):
+        found, rate = self._find(destination)
+        if found:
+            return rate
+        self[destination] = default
+        return default
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class Layer(MutableMapping):
     """
     The Layer object represents a mapping from source node (IDs) to destination node (IDs) for a particular
     age, gender, age+gender combination, or all users if no age or gender dependence. Users will not generally
     interact directly with Layer objects.
+
+    Rates are stored in compressed sparse row (CSR) form: sorted source node IDs, row pointers, and flat
+    destination ID (uint32) and rate (float64) arrays. Indexing with a source node ID returns a write-through
+    view of the outbound rates for that node; modified rows are held in a write buffer which is merged back
+    into the CSR arrays by freeze(), which runs automatically before any whole-layer query. Row views remain
+    valid (and writable) after the layer has been frozen.
     """
 
     def __init__(self):
 
-        super().__init__()
+        self._buffer = {}
+        self._nodes = np.zeros(0, dtype=np.uint32)
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._destinations = np.zeros(0, dtype=np.uint32)
+        self._rates = np.zeros(0, dtype=np.float64)
+
+        return
+
+    @classmethod
+    def from_arrays(cls, sources, destinations, rates, nodes=None) -> "Layer":
+        """Create a (frozen) layer from flat source, destination, and rate arrays
+
+        Args:
+            sources: source node ID for each rate
+            destinations: destination node ID for each rate
+            rates: migration rate for each source/destination pair
+            nodes: optional additional source node IDs which have no outbound rates
+
+        Returns:
+            (Layer): new layer; for repeated source/destination pairs the last rate is kept
+        """
+        layer = cls()
+        layer._set_arrays(np.asarray(sources, dtype=np.int64), np.asarray(destinations, dtype=np.int64),
+                          np.asarray(rates, dtype=np.float64),
+                          np.zeros(0, dtype=np.int64) if nodes is None else np.asarray(nodes, dtype=np.int64))
+        return layer
+
+    def _set_arrays(self, sources, destinations, rates, nodes) -> None:
+        if not (len(sources) == len(destinations) == len(rates)):
+            raise RuntimeError("Migration sources, destinations, and rates must all have the same length.")
+        # sort on source then destination (stable, so the last of any repeated pair is last in its run)
+        order = np.lexsort((destinations, sources))
+        sources, destinations, rates = sources[order], destinations[order], rates[order]
+        last = np.ones(len(sources), dtype=bool)
+        last[:-1] = (sources[1:] != sources[:-1]) | (destinations[1:] != destinations[:-1])
+        sources, destinations, rates = sources[last], destinations[last], rates[last]
+
+        node_ids = np.union1d(nodes, sources)
+        counts = np.bincount(np.searchsorted(node_ids, sources), minlength=len(node_ids))
+        self._nodes = node_ids.astype(np.uint32)
+        self._indptr = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        self._destinations = destinations.astype(np.uint32)
+        self._rates = rates
+        self._buffer = {}
 
         return
 
+    def freeze(self) -> "Layer":
+        """Merge rows in the write buffer into the CSR arrays
+
+        Returns:
+            (Layer): this layer
+        """
+        if not self._buffer:
+            return self
+
+        buffered = np.fromiter(self._buffer.keys(), dtype=np.int64, count=len(self._buffer))
+        sizes = np.fromiter(map(len, self._buffer.values()), dtype=np.int64, count=len(self._buffer))
+        total = int(sizes.sum())
+        destinations = np.fromiter(chain.from_iterable(self._buffer.values()), dtype=np.int64, count=total)
+        rates = np.fromiter(chain.from_iterable(row.values() for row in self._buffer.values()),
+                            dtype=np.float64, count=total)
+
+        # buffered rows replace their CSR rows entirely
+        kept = ~np.isin(self._nodes, buffered)
+        kept_entries = np.repeat(kept, np.diff(self._indptr))
+        self._set_arrays(np.concatenate((np.repeat(self._nodes.astype(np.int64), np.diff(self._indptr))[kept_entries],
+                                         np.repeat(buffered, sizes))),
+                         np.concatenate((self._destinations[kept_entries].astype(np.int64), destinations)),
+                         np.concatenate((self._rates[kept_entries], rates)),
+                         np.concatenate((self._nodes[kept].astype(np.int64), buffered)))
+
+        return self
+
+    @property
+    def nodes(self) -> np.ndarray:
+        """np.ndarray: sorted source node IDs (uint32) in this layer"""
+        return self.freeze()._nodes
+
+    @property
+    def indptr(self) -> np.ndarray:
+        """np.ndarray: CSR row pointers; rates for nodes[i] are at indptr[i]:indptr[i + 1]"""
+        return self.freeze()._indptr
+
+    @property
+    def destinations(self) -> np.ndarray:
+        """np.ndarray: destination node IDs (uint32), grouped by source node, ascending within each source"""
+        return self.freeze()._destinations
+
+    @property
+    def rates(self) -> np.ndarray:
+        """np.ndarray: rates (float64) matching destinations"""
+        return self.freeze()._rates
+
     @property
     def DatavalueCount(self) -> int:
         """Get (maximum) number of data values for any node in this layer
@@ -40,7 +219,7 @@ class Layer(dict):
             Maximum number of data values for any node in this layer
 
         """
-        count = max([len(entry) for entry in self.values()]) if len(self) else 0
+        count = int(np.diff(self.indptr).max()) if len(self) else 0
         return count
 
     @property
@@ -52,6 +231,21 @@ class Layer(dict):
         """
         return len(self)
 
+    def _row_index(self, key):
+        """Index of key in the CSR node array, or None if it is not there."""
+        if not isinstance(key, Integral) or key < 0:
+            return None
+        index = int(np.searchsorted(self._nodes, key))
+        return index if index < len(self._nodes) and self._nodes[index] == key else None
+
+    def _row_buffer(self, key) -> dict:
+        """Buffered (writable) rates for a source node, copied from the CSR arrays on first use."""
+        row = self._buffer.get(key)
+        if row is None:
+            destinations, rates = _LayerRow(self, key)._frozen()
+            row = self._buffer[key] = dict(zip(destinations.tolist(), rates.tolist()))
+        return row
+
     def __getitem__(self, key):
         """Allows indexing directly into this object with source node id
 
@@ -59,14 +253,43 @@ class Layer(dict):
             key (int): source node id
 
         Returns:
-            (dict): Dictionary of outbound rates for the given node id
+            (MutableMapping): Write-through view of outbound rates for the given node id
         """
+        if not isinstance(key, Integral):
+            raise RuntimeError(f"Migration node IDs must be integer values (key = {key}).")
         if key not in self:
-            if isinstance(key, Integral):
-                super().__setitem__(key, defaultdict(float))
-            else:
-                raise RuntimeError(f"Migration node IDs must be integer values (key = {key}).")
-        return super().__getitem__(key)
+            self._buffer[key] = {}
+        return _LayerRow(self, key)
+
+    def __setitem__(self, key, value):
+        if not isinstance(key, Integral):
+            raise RuntimeError(f"Migration node IDs must be integer values (key = {key}).")
+        self._buffer[key] = dict(value.items() if isinstance(value, Mapping) else value)
+        return
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.freeze()
+        index = self._row_index(key)
+        start, stop = self._indptr[index], self._indptr[index + 1]
+        self._nodes = np.delete(self._nodes, index)
+        self._indptr = np.concatenate((self._indptr[:index + 1], self._indptr[index + 2:] - (stop - start)))
+        self._destinations = np.concatenate((self._destinations[:start], self._destinations[stop:]))
+        self._rates = np.concatenate((self._rates[:start], self._rates[stop:]))
+        return
+
+    def __contains__(self, key):
+        return key in self._buffer or self._row_index(key) is not None
+
+    def __iter__(self):
+        return iter(self.nodes.tolist())
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
 
 
 _METADATA = "Metadata"
@@ -112,6 +335,8 @@ class VectorMigration(object):
     LOCAL_MIGRATION = 1
     REGIONAL_MIGRATION = 3
 
+    IDREF_LEGACY = "Legacy"
+
     def __init__(self):
 
         self._agesyears = []
@@ -259,10 +484,7 @@ class VectorMigration(object):
 
     @property
     def Nodes(self) -> list:
-        node_ids = set()
-        for layer in self._layers:
-            node_ids |= set(layer.keys())
-        node_ids = sorted(node_ids)
+        node_ids = np.unique(np.concatenate([layer.nodes for layer in self._layers])).tolist()
         return node_ids
 
     @property
@@ -272,14 +494,9 @@ class VectorMigration(object):
         return count
 
     def get_node_offsets(self, limit: int = 100) -> dict:
-        nodes = set()
-        for layer in self._layers:
-            nodes |= set(key for key in layer.keys())
+        nodes = self.Nodes
         count = min(self.DatavalueCount, limit)
-        # offsets = {}
-        # for index, node in enumerate(sorted(nodes)):
-        #     offsets[node] = index * 12 * count
-        offsets = {node: 12 * index * count for index, node in enumerate(sorted(nodes))}
+        offsets = dict(zip(nodes, (12 * count * np.arange(len(nodes))).tolist()))
         return offsets
 
     @property
@@ -392,13 +609,9 @@ class VectorMigration(object):
 
         actual_datavalue_count = min(self.DatavalueCount, value_limit)  # limited to 100 destinations
 
-        node_ids = set()
-        for layer in self._layers:
-            node_ids |= set(layer.keys())
-        node_ids = sorted(node_ids)
+        node_ids = self.Nodes
 
-        offsets = self.get_node_offsets(actual_datavalue_count)
-        node_offsets_string = ''.join([f"{node:08x}{offsets[node]:08x}" for node in sorted(offsets.keys())])
+        node_offsets_string = encode_node_offsets(node_ids, ENTRY_SIZE * actual_datavalue_count * np.arange(len(node_ids)))
 
         metadata = {
             _METADATA: {
@@ -420,34 +633,19 @@ class VectorMigration(object):
         with metafile.open("w") as handle:
             json.dump(metadata, handle, indent=4, separators=(",", ": "))
 
-        def key_func(k, d=None):
-            return d[k]
-
         # layers are in age bucket order by gender, e.g. male 0-5, 5-10, 10+, female 0-5, 5-10, 10+
         # see _index_for_gender_and_age()
         # "Writing binary data to '{binaryfile}'
         with binaryfile.open("wb") as file:
             for layer in self:
-                for node in node_ids:
-                    destinations = np.zeros(actual_datavalue_count, dtype=np.uint32)
-                    rates = np.zeros(actual_datavalue_count, dtype=np.float64)
-                    if node in layer:
-
-                        # Sort keys descending on rate and ascending on node ID.
-                        # That way if we are truncating the list, we include the "most important" nodes.
-                        keys = sorted(layer[node].keys())  # sorted ascending on node ID
-                        keys = sorted(keys, key=partial(key_func, d=layer[node]), reverse=True)  # descending on rate
-
-                        if len(keys) > actual_datavalue_count:
-                            keys = keys[0:actual_datavalue_count]
-                        # save rates in ascending order so small rates are not lost when looking at the cumulative sum
-                        keys = list(reversed(keys))
-                        destinations[0:len(keys)] = keys
-                        rates[0:len(keys)] = [layer[node][key] for key in keys]
-                    else:
-                        warn(f"No destination nodes found for node {node}", category=UserWarning)
-                    destinations.tofile(file)
-                    rates.tofile(file)
+                for node in np.setdiff1d(node_ids, layer.nodes).tolist():
+                    warn(f"No destination nodes found for node {node}", category=UserWarning)
+                # Keep the highest rates, ties on ascending node ID (CSR rows are in destination order), so if we
+                # are truncating the list we include the "most important" nodes. Save in the reverse order
+                # (ascending rate) so small rates are not lost when looking at the cumulative sum.
+                blocks = node_blocks(node_ids, np.repeat(layer.nodes, np.diff(layer.indptr)), layer.destinations,
+                                     layer.rates, actual_datavalue_count, reverse_ties=True)
+                blocks.tofile(file)
 
         return binaryfile
 
@@ -510,23 +708,13 @@ def from_file(binaryfile: Path, metafile: Path = None):
                                                                                                  _INTERPOLATIONTYPE,
                                                                                                  "PIECEWISE_CONSTANT")]
 
-    node_count = metadata[_NODECOUNT]
-    node_offsets = jason[_NODEOFFSETS]
-    if len(node_offsets) != 16 * node_count:
-        raise RuntimeError(f"Length of node offsets string {len(node_offsets)} != 16 * node count {node_count}.")
-    offsets = _parse_node_offsets(node_offsets, node_count)
-    datavalue_count = metadata[_DATAVALUECOUNT]
-    with binaryfile.open("rb") as file:
-        for gender in range(1 if migration.GenderDataType == VectorMigration.SAME_FOR_BOTH_GENDERS else 2):
-            for age in migration.AgesYears if migration.AgesYears else [0]:
-                layer = migration._layers[migration._index_for_gender_and_age(gender, age)]
-                for node, offset in offsets.items():
-                    file.seek(offset, SEEK_SET)
-                    destinations = np.fromfile(file, dtype=np.uint32, count=datavalue_count)
-                    rates = np.fromfile(file, dtype=np.float64, count=datavalue_count)
-                    for destination, rate in zip(destinations, rates):
-                        if rate > 0:
-                            layer[node][destination] = rate
+    # map the whole binary once; each layer is a dense (node_count, DatavalueCount) block in file order
+    reader = MigrationFile(binaryfile, metafile)
+    if reader.layer_count != len(migration._layers):
+        raise RuntimeError(f"Migration file '{binaryfile}' has {reader.layer_count} layers, "
+                           f"metadata describes {len(migration._layers)}.")
+    for index in range(reader.layer_count):
+        migration._layers[index] = Layer.from_arrays(*reader.edges(index))
 
     return migration
 
@@ -568,13 +756,9 @@ def _author() -> str:
 def _parse_node_offsets(string: str, count: int) -> dict:
     assert len(string) == 16 * count, f"Length of node offsets string {len(string)} != 16 * node count {count}."
 
-    offsets = {}
-    for index in range(count):
-        base = 16 * index
-        offset = base + 8
-        offsets[int(string[base:base + 8], 16)] = int(string[offset:offset + 8], 16)
+    node_ids, offsets = decode_node_offsets(string)
 
-    return offsets
+    return dict(zip(node_ids.tolist(), offsets.tolist()))
 
 
 def _try_parse_date(string: str) -> datetime:
@@ -615,68 +799,70 @@ def from_params(demographics_file_path: any = None, population: int = 1e6, num_n
     demographics file created from a few parameters, as opposed to one from real-world data.
     Note that the 'demographics_file_path" input param is not used at this time but in future
     will be exploited to ensure nodes, etc., match.
+
+    Nodes are placed at random on a periodic hexagonal unit cell. Each node (IDs 1 to num_nodes) gets rates to
+    its 30 nearest neighbours, found with a KD-tree over the cell and its eight periodic images:
+    rate = migration_factor * destination population / total population / distance.
     """
-    # ***** Write migration files *****
-    # NOTE: This goes straight from input 'data' -- parameters -- to output file.
-    # We really want to go from input parameters to standard data representation of migration data
-    # and then to file as a separate decoupled step.
     ucellb = np.array([[1.0, 0.0], [-0.5, 0.86603]])
     nlocs = np.random.rand(num_nodes, 2)
     nlocs[0, :] = 0.5
     nlocs = np.round(np.matmul(nlocs, ucellb), 4)
-    # Calculate inter-node distances on periodic grid
-    nlocs = np.tile(nlocs, (9, 1))
-    nlocs[0 * num_nodes:1 * num_nodes, :] += [0.0, 0.0]
-    nlocs[1 * num_nodes:2 * num_nodes, :] += [1.0, 0.0]
-    nlocs[2 * num_nodes:3 * num_nodes, :] += [-1.0, 0.0]
-    nlocs[3 * num_nodes:4 * num_nodes, :] += [0.0, 0.0]
-    nlocs[4 * num_nodes:5 * num_nodes, :] += [1.0, 0.0]
-    nlocs[5 * num_nodes:6 * num_nodes, :] += [-1.0, 0.0]
-    nlocs[6 * num_nodes:7 * num_nodes, :] += [0.0, 0.0]
-    nlocs[7 * num_nodes:8 * num_nodes, :] += [1.0, 0.0]
-    nlocs[8 * num_nodes:9 * num_nodes, :] += [-1.0, 0.0]
-    nlocs[0 * num_nodes:1 * num_nodes, :] += [0.0, 0.0]
-    nlocs[1 * num_nodes:2 * num_nodes, :] += [0.0, 0.0]
-    nlocs[2 * num_nodes:3 * num_nodes, :] += [0.0, 0.0]
-    nlocs[3 * num_nodes:4 * num_nodes, :] += [-0.5, 0.86603]
-    nlocs[4 * num_nodes:5 * num_nodes, :] += [-0.5, 0.86603]
-    nlocs[5 * num_nodes:6 * num_nodes, :] += [-0.5, 0.86603]
-    nlocs[6 * num_nodes:7 * num_nodes, :] += [0.5, -0.86603]
-    nlocs[7 * num_nodes:8 * num_nodes, :] += [0.5, -0.86603]
-    nlocs[8 * num_nodes:9 * num_nodes, :] += [0.5, -0.86603]
-    distgrid = spspd.squareform(spspd.pdist(nlocs))
-    nborlist = np.argsort(distgrid, axis=1)
-    npops = Demog.get_node_pops_from_params(population, num_nodes, fraction_rural)
-
+    # periodic images of the unit cell: every combination of -1, 0, +1 times each lattice vector
+    shifts = np.array([[0.0, 0.0], [1.0, 0.0], [-1.0, 0.0],
+                       [-0.5, 0.86603], [0.5, 0.86603], [-1.5, 0.86603],
+                       [0.5, -0.86603], [1.5, -0.86603], [-0.5, -0.86603]])
+    tiled = (nlocs[None, :, :] + shifts[:, None, :]).reshape(-1, 2)
+    # nearest neighbours of the nodes in the central cell (the first neighbour is the node itself)
+    neighbour_count = min(31, len(tiled))
+    distances, neighbours = cKDTree(tiled).query(nlocs, k=neighbour_count)
+    distances = distances.reshape(num_nodes, neighbour_count)[:, 1:]
+    neighbours = neighbours.reshape(num_nodes, neighbour_count)[:, 1:] % num_nodes
+
+    # coincident nodes (locations are rounded) have no defined rate
+    sources = np.broadcast_to(np.arange(1, num_nodes + 1)[:, None], neighbours.shape)
+    separated = distances > 0
+    sources, neighbours, distances = sources[separated], neighbours[separated], distances[separated]
+
+    npops = _node_pops_from_params(population, num_nodes, fraction_rural)
+    rates = migration_factor * npops[neighbours] / np.sum(npops) / distances
+
+    # with few nodes, several images of one node are neighbours; as before, the farthest image's rate is used
     migration = VectorMigration()
     migration.IdReference = id_ref
-
-    for source in range(num_nodes):
-        for index in range(1, 31):
-            if distgrid.shape[0] > index:
-                destination = int(np.mod(nborlist[source, index], num_nodes)) + 1
-
-                tnode = int(np.mod(nborlist[source, index], num_nodes))
-                idnode = nborlist[source, index]
-                rate = migration_factor * npops[tnode] / np.sum(npops) / distgrid[source, idnode]
-            else:
-                destination = 0
-                rate = 0.0
-
-            migration[source][destination] = rate
+    migration._layers[0] = Layer.from_arrays(sources, neighbours + 1, rates)
 
     migration.MigrationType = migration_type
     return migration
 
 
+def _node_pops_from_params(tot_pop: int, num_nodes: int, frac_rur: float) -> np.ndarray:
+    """Node populations for a synthetic grid: node 1 holds (1 - frac_rur) of the population and the rural
+    nodes share the rest with randomly drawn sizes."""
+    nsizes = np.exp(-np.log(np.random.rand(num_nodes - 1)))
+    nsizes = frac_rur * nsizes / np.sum(nsizes)
+    nsizes = np.minimum(nsizes, 100 / tot_pop)
+    nsizes = frac_rur * nsizes / np.sum(nsizes)
+    nsizes = np.insert(nsizes, 0, 1 - frac_rur)
+    return np.round(tot_pop * nsizes, 0).astype(int)
+
+
 # TODO: just use task to reload the demographics files into an object to use for this
 
 def from_demographics_and_gravity_params(demographics_object, gravity_params: list,
-                                         filename: str = None):
+                                         filename: str = None, value_limit: int = 100,
+                                         block_size: int = 512, max_distance_km: float = None,
+                                         k_nearest: int = None):
     """
     This function takes a demographics object, creates a vector migration file based on the populations and
     distances of nodes and saves to be used by the sim.
 
+    Rates are computed with the batched engine in [gravity](https://emod.idmod.org/emodpy-malaria/autoapi/emodpy_malaria/migration/gravity/):
+    distances are WGS84 ellipsoidal distances (as geographiclib's Geodesic.WGS84, and as
+    VectorMigrationData.from_gravity_model()) computed in NumPy blocks of source nodes, and only the
+    top **value_limit** destinations are kept for each source node, so memory is bounded by
+    **block_size** * number of nodes rather than the square of the number of nodes.
+
     Args:
         demographics_object (MalaraiDemographics): demographics object created by Demographics class (use Demographics.from_file()
             to load a demographics file you already have and pass in the returned object)
@@ -686,87 +872,43 @@ def from_demographics_and_gravity_params(demographics_object, gravity_params: li
             if rate >= 1, 1 is used.
         filename (str): name of migration file to be created and added to the experiment,
             Default: vector_migration.bin
+        value_limit (int): maximum number of destinations kept (and written) for each source node (default = 100)
+        block_size (int): number of source nodes whose rates are computed together in one NumPy block
+        max_distance_km (float): if given, only nodes within this distance (km) are considered as destinations
+        k_nearest (int): if given, only the k nearest nodes are considered as destinations of each node.
+            With either option candidate destinations are found with a KD-tree, so large grids are built in
+            O(N log N) rather than O(N^2)
 
     Returns:
         (VectorMigration): VectorMigration object
     """
-
-    def _compute_migration_rate(gravity_params, from_node_population, to_node_population, distance):
-        """
-        Utility function for computing migration rates using gravity model
-
-        Args:
-            gravity_params (list[float]): a list of four parameters that will affect the gravity model
-                gravity_params[0] denoted as g[0], etc, and they are used in the following way:
-                migration_rate = g[0] * (from_node_population^(g[1]-1)) * (to_node_population^g[2]) * (distance^g[3])
-                if migration_rate >= 1, 1 is used.
-            from_node_population (int): Initial_Population in the from_node
-            to_node_population (int): Initial_Population in the to_node
-            distance (float): distance, in kilometres, between two nodes
-
-        Returns:
-            (float): Rate of vector migration from from_node to to_node
-        """
-        # If home/dest node has 0 pop, assume this node is the regional work node-- no local migration allowed
-        if from_node_population == 0 or to_node_population == 0:
-            return 0
-        else:
-            migration_rate = gravity_params[0] * (from_node_population ** (gravity_params[1] - 1)) \
-                * (to_node_population ** gravity_params[2]) * (distance ** gravity_params[3])
-            final_rate = np.min([1., migration_rate])
-            return final_rate
-
-    def _compute_migration_dict(node_list: list, gravity_params: list, exclude_nodes: list = None):
-        """
-        Utility function for computing migration value map.
-
-        Args:
-            node_list (list): list of nodes as dictionaries created from the demographics object
-            gravity_params (list): a list of four parameters that will affect the gravity model
-                gravity_params[0] denoted as g[0], etc, and they are used in the following way:
-                rate = g[0] * (from_node_population^(g[1]-1)) * (to_node_population^g[2]) * (distance^g[3])
-                if rate >= 1, 1 is used.
-            exclude_nodes (list): a list of node ids for nodes you don't want any migration happening to or from.
-
-        Returns:
-            (VectorMigration): VectorMigration object based on demographics object that was passed in
-        """
-        excluded_nodes = set(exclude_nodes) if exclude_nodes else set()
-        v_migration = VectorMigration()
-        geodesic = Geodesic.WGS84
-
-        for source_node in node_list:
-            source_id = source_node["NodeID"]
-            src_lat = source_node["NodeAttributes"]["Latitude"]
-            src_long = source_node["NodeAttributes"]["Longitude"]
-            src_pop = source_node["NodeAttributes"]["InitialPopulation"]
-
-            if source_id in excluded_nodes:
-                continue
-            for destination_node in node_list:
-                if destination_node == source_node:
-                    continue
-                dest_id = destination_node["NodeID"]
-                if dest_id in excluded_nodes:
-                    continue
-                dst_lat = destination_node["NodeAttributes"]["Latitude"]
-                dst_long = destination_node["NodeAttributes"]["Longitude"]
-                dst_pop = destination_node["NodeAttributes"]["InitialPopulation"]
-
-                distance = geodesic.Inverse(src_lat, src_long, dst_lat, dst_long, Geodesic.DISTANCE)['s12'] / 1000  # km
-                rate = _compute_migration_rate(gravity_params, src_pop, dst_pop, distance)
-                v_migration[source_id][dest_id] = rate
-
-        return v_migration
-
-    nodes = [node.to_dict() for node in demographics_object.nodes]
-    v_migration = _compute_migration_dict(nodes, gravity_params)
+    if len(gravity_params) != 4:
+        raise ValueError(f"gravity_params must have exactly 4 values, got {len(gravity_params)}")
+
+    nodes = [node for node in demographics_object.nodes if node.id != 0]
+    # the legacy formula uses from_node_population^(g[1]-1)
+    params = [gravity_params[0], gravity_params[1] - 1, gravity_params[2], gravity_params[3]]
+    edges = gravity_edges(node_ids=[node.id for node in nodes],
+                          latitudes=[node.lat for node in nodes],
+                          longitudes=[node.lon for node in nodes],
+                          populations=[node.pop for node in nodes],
+                          gravity_params=params,
+                          value_limit=value_limit,
+                          block_size=block_size,
+                          max_distance_km=max_distance_km,
+                          k_nearest=k_nearest,
+                          ellipsoidal=True)
+
+    v_migration = VectorMigration()
+    v_migration._layers[0] = Layer.from_arrays(edges.sources, edges.destinations, edges.rates)
     v_migration.IdReference = demographics_object.idref
     v_migration.MigrationType = "LOCAL_MIGRATION"
     # save migration object to file
     if not filename:
         filename = "vector_migration.bin"
-    v_migration.to_file(Path(filename))
+    v_migration.to_file(Path(filename), value_limit=value_limit)
+
+    return v_migration
 
 
 # by gender, by age
@@ -811,10 +953,12 @@ def from_csv(filename_path: str, id_reference: str, migration_type: str = "LOCAL
         migration.Author = author
     with Path(filename_path).open("r") as csvfile:
         reader = csv.DictReader(csvfile)
-        csv_data_read = False
+        sources, destinations, rates = [], [], []
         for row in reader:
-            csv_data_read = True
-            migration[int(row['from_node'])][int(row['to_node'])] = float(row['rate'])
-        assert csv_data_read, "Please make sure you have column headers of 'from_node', 'to_node', 'rate' in your file.\n"
+            sources.append(int(row['from_node']))
+            destinations.append(int(row['to_node']))
+            rates.append(float(row['rate']))
+        assert sources, "Please make sure you have column headers of 'from_node', 'to_node', 'rate' in your file.\n"
+    migration._layers[0] = Layer.from_arrays(sources, destinations, rates)
 
     return migration
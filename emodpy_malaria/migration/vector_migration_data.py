@@ -1,11 +1,14 @@
-from collections import defaultdict
+from collections.abc import Mapping, MutableMapping
 from datetime import datetime
+import hashlib
+from itertools import chain
 import json
 import logging
 from pathlib import Path
 from typing import Union
 
 import numpy as np
+from scipy import sparse
 
 from emodpy.migration.migration_data import (  # noqa: F401
     MigrationData, MALE, FEMALE, SAME_FOR_BOTH_GENDERS, ONE_FOR_EACH_GENDER,
@@ -13,10 +16,17 @@ from emodpy.migration.migration_data import (  # noqa: F401
 )
 from emodpy.utils.emod_enum import MigrationType, InterpolationType
 
+from emodpy_malaria.migration.gravity import gravity_edges
+from emodpy_malaria.migration.migration_file import ENTRY_SIZE, MigrationFile, node_blocks
+from emodpy_malaria.utils.node_offsets import encode_node_offsets
+
 logger = logging.getLogger(__name__)
 
 VECTOR_MIGRATION_BY_GENETICS = "VECTOR_MIGRATION_BY_GENETICS"
 
+_PARQUET_METADATA_KEY = b"emodpy_malaria.vector_migration"
+_PARQUET_COLUMNS = ("layer", "from_node", "to_node", "rate")
+
 
 class VectorMigrationData(MigrationData):
     """Vector migration rate container.
@@ -47,14 +57,25 @@ class VectorMigrationData(MigrationData):
         """
         return self._allele_combinations
 
+    @property
+    def node_ids(self) -> list[int]:
+        """Sorted list of all unique node IDs (source and destination) across all layers."""
+        layers = {id(layer): layer for layer in self._layers}.values()
+        ids = [np.concatenate((sources, destinations)) for sources, destinations, _ in map(_layer_arrays, layers)]
+        return np.unique(np.concatenate(ids)).tolist() if ids else []
+
     @classmethod
     def from_gravity_model(cls, demographics: object,
                            gravity_params: list[float],
-                           female_multiplier: float = None) -> "VectorMigrationData":
+                           female_multiplier: float = None,
+                           max_distance_km: float = None,
+                           k_nearest: int = None) -> "VectorMigrationData":
         """Generate vector migration rates from a gravity model.
 
-        Uses node population and geodesic distance. Identical to human gravity model
-        but restricted to vector migration constraints (no age layers).
+        Uses node population and WGS84 ellipsoidal distance, like the human gravity model
+        but restricted to vector migration constraints (no age layers). Rates are computed
+        with NumPy in blocks of source nodes; with **female_multiplier** the female layer
+        reuses the male node pairs and only scales the rates.
 
         Args:
             demographics (object): Demographics object with .nodes and .idref
@@ -62,15 +83,32 @@ class VectorMigrationData(MigrationData):
                 rate = g0 * from_pop^g1 * to_pop^g2 * distance_km^g3, capped at 1.0
             female_multiplier (float): if provided, creates ONE_FOR_EACH_GENDER data where
                 female_rate = male_rate * female_multiplier
+            max_distance_km (float): if provided, only node pairs within this distance get a rate
+            k_nearest (int): if provided, only the k nearest nodes of each source node get a rate.
+                With either option candidates are found with a KD-tree (by great-circle distance),
+                so large grids are built in O(N log N) rather than O(N^2)
 
         Returns:
             VectorMigrationData
         """
-        base = MigrationData.from_gravity_model(demographics, gravity_params, female_multiplier)
+        if len(gravity_params) != 4:
+            raise ValueError(f"gravity_params must have exactly 4 values, got {len(gravity_params)}")
+        nodes = [n for n in demographics.nodes if n.id != 0]
+        if len(nodes) < 2:
+            raise ValueError(f"Need at least 2 non-default nodes for migration, got {len(nodes)}")
+
+        edges = gravity_edges(node_ids=[n.id for n in nodes], latitudes=[n.lat for n in nodes],
+                              longitudes=[n.lon for n in nodes], populations=[n.pop for n in nodes],
+                              gravity_params=gravity_params, max_distance_km=max_distance_km, k_nearest=k_nearest,
+                              ellipsoidal=True)
+
         data = cls()
-        data._idref = base._idref
-        data._gender_data_type = base._gender_data_type
-        data._layers = base._layers
+        data._idref = demographics.idref
+        male = _ArrayLayer(edges.sources, edges.destinations, edges.rates)
+        data._layers = [male]
+        if female_multiplier is not None:
+            data._gender_data_type = ONE_FOR_EACH_GENDER
+            data._layers.append(male.scaled(female_multiplier))
         return data
 
     @classmethod
@@ -87,22 +125,14 @@ class VectorMigrationData(MigrationData):
         Returns:
             VectorMigrationData
         """
-        for k, v in rates.items():
-            if k[0] == 0 or k[1] == 0:
-                raise ValueError("Migration to/from default node (ID=0) is not allowed.")
-            if v < 0 or v > 1.0:
-                raise ValueError(f"Rate must be in [0.0, 1.0], got {v} for pair {k}.")
+        _validate_rates(*_layer_arrays(rates))
 
         data = cls()
         data._idref = idref
         data._layers = [dict(rates)]
 
         if female_rates is not None:
-            for k, v in female_rates.items():
-                if k[0] == 0 or k[1] == 0:
-                    raise ValueError("Migration to/from default node (ID=0) is not allowed.")
-                if v < 0 or v > 1.0:
-                    raise ValueError(f"Rate must be in [0.0, 1.0], got {v} for pair {k}.")
+            _validate_rates(*_layer_arrays(female_rates))
             data._gender_data_type = ONE_FOR_EACH_GENDER
             data._layers = [dict(rates), dict(female_rates)]
 
@@ -116,6 +146,9 @@ class VectorMigrationData(MigrationData):
         against the allele combinations (most specific first) to select which rate layer
         to use.
 
+        Identical rate layers are detected by their digests (see layer_sharing()) and their blocks
+        are only built once when writing; each layer is still an independent dictionary.
+
         Args:
             allele_combos_rates (dict): dict mapping allele combination tuples to rate dicts.
                 Keys are tuples of allele pairs. The empty tuple ``()`` is the default
@@ -143,11 +176,7 @@ class VectorMigrationData(MigrationData):
         allele_combinations = []
         for key in sorted_keys:
             rate_dict = allele_combos_rates[key]
-            for k, v in rate_dict.items():
-                if k[0] == 0 or k[1] == 0:
-                    raise ValueError("Migration to/from default node (ID=0) is not allowed.")
-                if v < 0 or v > 1.0:
-                    raise ValueError(f"Rate must be in [0.0, 1.0], got {v} for pair {k}.")
+            _validate_rates(*_layer_arrays(rate_dict))
             layers.append(dict(rate_dict))
             allele_combinations.append([list(pair) for pair in key])
 
@@ -166,7 +195,8 @@ class VectorMigrationData(MigrationData):
         """Load vector migration data from an existing EMOD binary + JSON metadata file.
 
         Handles all three GenderDataType modes including VECTOR_MIGRATION_BY_GENETICS
-        with AlleleCombinations in metadata.
+        with AlleleCombinations in metadata. Layers with identical contents are converted once and copied,
+        so each layer is an independent dictionary.
 
         Args:
             binary_path (Union[str, Path]): path to the binary migration file
@@ -187,8 +217,6 @@ class VectorMigrationData(MigrationData):
             jason = json.load(f)
 
         metadata = jason["Metadata"]
-        node_count = metadata["NodeCount"]
-        datavalue_count = metadata["DatavalueCount"]
         gender_data_type = metadata.get("GenderDataType", SAME_FOR_BOTH_GENDERS)
         # For VECTOR_MIGRATION_BY_GENETICS, AgesYears stores rate layer indices for AlleleCombinations
         ages = metadata.get("AgesYears", [])
@@ -201,48 +229,7 @@ class VectorMigrationData(MigrationData):
                 "Vector migration does not support age-dependent rates."
             )
 
-        node_offsets_str = jason["NodeOffsets"]
-        offsets = {}
-        for i in range(node_count):
-            base = 16 * i
-            node_id = int(node_offsets_str[base:base + 8], 16)
-            offset = int(node_offsets_str[base + 8:base + 16], 16)
-            offsets[node_id] = offset
-
-        if gender_data_type == VECTOR_MIGRATION_BY_GENETICS:
-            num_genders = 1
-        elif gender_data_type == ONE_FOR_EACH_GENDER:
-            num_genders = 2
-        else:
-            num_genders = 1
-
-        num_ages = len(ages) if ages else 1
-        age_data_size = node_count * datavalue_count * 12
-        gender_data_size = num_ages * age_data_size
-
-        offsets.pop(0, None)
-
-        layers = []
-        with binary_path.open("rb") as f:
-            for gender in range(num_genders):
-                for age_idx in range(num_ages):
-                    layer = {}
-                    for node_id, node_offset in offsets.items():
-                        file_offset = gender * gender_data_size + age_idx * age_data_size + node_offset
-                        f.seek(file_offset)
-                        destinations = np.fromfile(f, dtype=np.uint32, count=datavalue_count)
-                        rates = np.fromfile(f, dtype=np.float64, count=datavalue_count)
-                        for dest, rate in zip(destinations, rates):
-                            if rate > 0 and dest > 0:
-                                layer[(node_id, int(dest))] = float(rate)
-                    layers.append(layer)
-
-        data = cls()
-        data._idref = idref
-        data._gender_data_type = gender_data_type
-        data._ages = ages
-        data._layers = layers
-
+        allele_combos = None
         if gender_data_type == VECTOR_MIGRATION_BY_GENETICS:
             allele_combos = metadata.get("AlleleCombinations", None)
             if allele_combos is None:
@@ -256,15 +243,268 @@ class VectorMigrationData(MigrationData):
                     f"{len(allele_combos)} entries. These must match (one age index per "
                     f"allele combination)."
                 )
+
+        # one bulk read of every layer; node 0 is never a valid source
+        reader = MigrationFile(binary_path, metafile)
+        layers = []
+        # layers with byte-identical blocks are converted once and copied
+        by_content = {}
+        for index in range(reader.layer_count):
+            content = hashlib.sha256(np.ascontiguousarray(reader.layer(index)).tobytes()).digest()
+            if content in by_content:
+                layers.append(dict(by_content[content]))
+                continue
+            sources, destinations, rates = reader.edges(index)
+            valid = sources != 0
+            by_content[content] = _layer_dict(sources[valid], destinations[valid], rates[valid])
+            layers.append(by_content[content])
+        if len(by_content) < len(layers):
+            logger.info(f"{binary_path.name}: {len(layers) - len(by_content)} of {len(layers)} rate layers "
+                        f"are identical to an earlier layer.")
+
+        data = cls()
+        data._idref = idref
+        data._gender_data_type = gender_data_type
+        data._ages = ages
+        data._layers = layers
+        if allele_combos is not None:
             data._allele_combinations = allele_combos
 
         return data
 
+    @classmethod
+    def from_scipy_sparse(cls, matrices, node_ids, idref: str = "",
+                          allele_combinations: list = None) -> "VectorMigrationData":
+        """Create vector migration data from sparse rate matrices.
+
+        Entry [i, j] of each matrix is the rate from node **node_ids[i]** to node **node_ids[j]**. Every stored
+        entry becomes a rate (including explicitly stored zeros), in row-major order.
+
+        The GenderDataType follows from the inputs:
+
+        - one matrix: SAME_FOR_BOTH_GENDERS
+        - two matrices (male, female): ONE_FOR_EACH_GENDER
+        - **allele_combinations** given: VECTOR_MIGRATION_BY_GENETICS, one matrix per allele combination
+
+        Args:
+            matrices: a square scipy.sparse matrix (or array), or a list of them
+            node_ids: node ID for each row/column index
+            idref (str): IdReference string
+            allele_combinations (list): allele combinations (lists of [allele1, allele2] pairs), one per
+                matrix; the first must be the empty default combination []
+
+        Returns:
+            VectorMigrationData
+        """
+        if sparse.issparse(matrices):
+            matrices = [matrices]
+        matrices = list(matrices)
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        if len(np.unique(node_ids)) != len(node_ids):
+            raise ValueError("node_ids must not contain duplicate IDs.")
+
+        if allele_combinations is not None:
+            allele_combinations = [[list(pair) for pair in combination] for combination in allele_combinations]
+            if len(allele_combinations) != len(matrices):
+                raise ValueError(f"Got {len(matrices)} matrices for {len(allele_combinations)} allele combinations.")
+            if not allele_combinations or allele_combinations[0] != []:
+                raise ValueError("The first allele combination must be the empty default combination [].")
+            gender_data_type = VECTOR_MIGRATION_BY_GENETICS
+        elif len(matrices) == 1:
+            gender_data_type = SAME_FOR_BOTH_GENDERS
+        elif len(matrices) == 2:
+            gender_data_type = ONE_FOR_EACH_GENDER
+        else:
+            raise ValueError(f"Expected 1 or 2 matrices without allele_combinations, got {len(matrices)}.")
+
+        layers = []
+        for matrix in matrices:
+            if matrix.shape != (len(node_ids), len(node_ids)):
+                raise ValueError(f"Matrix shape {matrix.shape} does not match {len(node_ids)} node IDs.")
+            matrix = sparse.csr_matrix(matrix)
+            matrix.sort_indices()
+            rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+            sources, destinations = node_ids[rows], node_ids[matrix.indices]
+            rates = np.asarray(matrix.data, dtype=np.float64)
+            _validate_rates(sources, destinations, rates)
+            layers.append(_layer_dict(sources, destinations, rates))
+
+        return cls._from_layers(layers, idref, gender_data_type, allele_combinations)
+
+    @classmethod
+    def from_parquet(cls, path: Union[str, Path]) -> "VectorMigrationData":
+        """Load vector migration data written by to_parquet(). Requires pyarrow.
+
+        Args:
+            path (Union[str, Path]): Parquet file
+
+        Returns:
+            VectorMigrationData
+        """
+        pq = _import_parquet()
+        table = pq.read_table(path)
+        schema_metadata = table.schema.metadata or {}
+        if _PARQUET_METADATA_KEY not in schema_metadata:
+            raise ValueError(f"'{path}' was not written by VectorMigrationData.to_parquet().")
+        metadata = json.loads(schema_metadata[_PARQUET_METADATA_KEY])
+
+        columns = {name: table.column(name).to_numpy() for name in _PARQUET_COLUMNS}
+        layer_count = metadata["LayerCount"]
+        layer_index = columns["layer"].astype(np.int64)
+        if len(layer_index) and (layer_index.min() < 0 or layer_index.max() >= layer_count):
+            raise ValueError(f"Layer indices in '{path}' must be in [0, {layer_count}).")
+        _validate_rates(columns["from_node"], columns["to_node"], columns["rate"])
+
+        # rows keep their order within each layer, which decides ties when writing migration files
+        order = np.argsort(layer_index, kind="stable")
+        bounds = np.searchsorted(layer_index[order], np.arange(layer_count + 1))
+        layers = []
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            rows = order[start:stop]
+            layers.append(_layer_dict(columns["from_node"][rows], columns["to_node"][rows], columns["rate"][rows]))
+
+        return cls._from_layers(layers, metadata["IdReference"], metadata["GenderDataType"],
+                                metadata.get("AlleleCombinations"))
+
+    @classmethod
+    def _from_layers(cls, layers: list[dict], idref: str, gender_data_type: str,
+                     allele_combinations: list = None) -> "VectorMigrationData":
+        data = cls()
+        data._idref = idref
+        data._gender_data_type = gender_data_type
+        if gender_data_type == VECTOR_MIGRATION_BY_GENETICS:
+            # AgesYears is repurposed to store rate layer indices for AlleleCombinations
+            data._ages = list(range(len(layers)))
+            data._allele_combinations = allele_combinations
+        data._layers = layers
+        return data
+
+    def to_scipy_sparse(self, node_ids=None) -> tuple[list, np.ndarray]:
+        """Rate layers as sparse matrices.
+
+        Args:
+            node_ids: node ID for each row/column index (default: every node in the data, sorted)
+
+        Returns:
+            (tuple[list, np.ndarray]): one scipy.sparse.csr_matrix per layer, and the node ID of each
+            row/column index
+        """
+        layer_arrays = [_layer_arrays(layer) for layer in self._layers]
+        if node_ids is None:
+            node_ids = np.unique(np.concatenate([np.concatenate((sources, destinations))
+                                                 for sources, destinations, _ in layer_arrays]))
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        if len(np.unique(node_ids)) != len(node_ids):
+            raise ValueError("node_ids must not contain duplicate IDs.")
+
+        order = np.argsort(node_ids)
+        matrices = []
+        for sources, destinations, rates in layer_arrays:
+            rows, columns = (_node_index(node_ids, order, ids) for ids in (sources, destinations))
+            matrix = sparse.csr_matrix((rates, (rows, columns)), shape=(len(node_ids), len(node_ids)))
+            matrices.append(matrix)
+        return matrices, node_ids
+
+    def to_parquet(self, path: Union[str, Path]) -> Path:
+        """Write all rate layers to one Parquet file. Requires pyarrow.
+
+        The file has one row per rate with columns "layer", "from_node", "to_node" and "rate", in layer and
+        insertion order. IdReference, GenderDataType and AlleleCombinations are stored in the file's schema
+        metadata so from_parquet() can restore them.
+
+        Args:
+            path (Union[str, Path]): output Parquet file
+
+        Returns:
+            Path to the Parquet file
+        """
+        pq = _import_parquet()
+        import pyarrow as pa
+
+        layer_arrays = [_layer_arrays(layer) for layer in self._layers]
+        layer_index = np.repeat(np.arange(len(layer_arrays), dtype=np.int32),
+                                [len(rates) for _, _, rates in layer_arrays])
+        sources, destinations, rates = (np.concatenate(values) for values in zip(*layer_arrays))
+        metadata = {
+            "IdReference": self._idref,
+            "GenderDataType": self._gender_data_type,
+            "AlleleCombinations": self._allele_combinations,
+            "LayerCount": len(layer_arrays),
+        }
+        table = pa.table({
+            "layer": layer_index,
+            "from_node": sources.astype(np.uint32),
+            "to_node": destinations.astype(np.uint32),
+            "rate": rates.astype(np.float64),
+        }).replace_schema_metadata({_PARQUET_METADATA_KEY: json.dumps(metadata)})
+
+        path = Path(path).absolute()
+        pq.write_table(table, path)
+        return path
+
     def apply_modifier(self, ages, modifier_fn):
         """Not supported for vector migration — vectors do not have age-dependent rates."""
         raise NotImplementedError("Vector migration does not support age-dependent rates. "
                                   "Use from_rates() or from_genetics() to set per-layer rates.")
 
+    def layer_digests(self) -> list[str]:
+        """Content digest of each rate layer.
+
+        Layers with equal digests have the same pairs and rates in the same insertion order, so they write
+        identical blocks to a migration file.
+
+        Returns:
+            (list[str]): hex SHA-256 digest per layer, in layer order
+        """
+        # shared layers are hashed once
+        by_object = {}
+        digests = []
+        for layer in self._layers:
+            if id(layer) not in by_object:
+                by_object[id(layer)] = _layer_digest(layer)
+            digests.append(by_object[id(layer)])
+        return digests
+
+    def layer_sharing(self) -> list[int]:
+        """Index of the first layer identical to each rate layer.
+
+        For example, [0, 1, 1, 0] means layer 2 duplicates layer 1 and layer 3 duplicates layer 0.
+
+        Returns:
+            (list[int]): one index per layer; equal to the layer's own index for unique layers
+        """
+        first = {}
+        return [first.setdefault(digest, index) for index, digest in enumerate(self.layer_digests())]
+
+    def digest(self, migration_type: Union[MigrationType, str] = MigrationType.LOCAL,
+               value_limit: int = 100) -> str:
+        """Content digest of the files to_migration_file() writes with the same options.
+
+        Covers the rate layers (in insertion order, which decides ties), IdReference, GenderDataType,
+        AlleleCombinations, author and write options, but not the creation date, so it can be used as an
+        [AssetCache](https://emod.idmod.org/emodpy-malaria/autoapi/emodpy_malaria/utils/asset_cache/) key.
+
+        Args:
+            migration_type (Union[MigrationType, str]): MigrationType enum or string. Default LOCAL.
+            value_limit (int): max destinations per source node (default 100)
+
+        Returns:
+            (str): hex SHA-256 digest
+        """
+        hasher = hashlib.sha256()
+        header = {
+            "IdReference": self._idref,
+            "GenderDataType": self._gender_data_type,
+            "AlleleCombinations": self._allele_combinations,
+            "Author": _author(),
+            "MigrationType": _MIGRATION_TYPE_STRINGS[_as_migration_type(migration_type)],
+            "ValueLimit": value_limit,
+        }
+        hasher.update(json.dumps(header, sort_keys=True).encode("utf-8"))
+        for layer_digest in self.layer_digests():
+            hasher.update(layer_digest.encode("ascii"))
+        return hasher.hexdigest()
+
     def to_migration_file(self, path: Union[str, Path],
                           migration_type: Union[MigrationType, str] = MigrationType.LOCAL,
                           interpolation_type: object = None,
@@ -286,40 +526,34 @@ class VectorMigrationData(MigrationData):
         Returns:
             Path to binary file
         """
-        if not isinstance(migration_type, MigrationType):
-            try:
-                migration_type = MigrationType(migration_type.upper())
-            except ValueError:
-                raise ValueError(f"Invalid migration_type '{migration_type}'. "
-                                 f"Valid options: {list(MigrationType)}")
+        migration_type = _as_migration_type(migration_type)
 
         path = Path(path).absolute()
         metafile = path.parent / (path.name + ".json")
 
-        if 0 in self.node_ids:
+        # shared layers are converted once
+        by_object = {}
+        for layer in self._layers:
+            if id(layer) not in by_object:
+                by_object[id(layer)] = _layer_arrays(layer)
+        layer_arrays = list(by_object.values())
+        if any((sources == 0).any() or (destinations == 0).any() for sources, destinations, _ in layer_arrays):
             raise ValueError("Migration data must not contain default node (ID=0). "
                              "Cannot write migration to/from the default node.")
 
         mig_type_str = _MIGRATION_TYPE_STRINGS[migration_type]
 
-        source_nodes = set()
-        for layer in self._layers:
-            source_nodes |= set(from_id for from_id, _ in layer)
-        source_nodes = sorted(source_nodes)
+        source_nodes = np.unique(np.concatenate([sources for sources, _, _ in layer_arrays]))
 
         max_dests = 0
-        for layer in self._layers:
-            dests_per_node = defaultdict(int)
-            for from_id, _ in layer:
-                dests_per_node[from_id] += 1
-            if dests_per_node:
-                max_dests = max(max_dests, max(dests_per_node.values()))
+        for sources, _, _ in layer_arrays:
+            if len(sources):
+                max_dests = max(max_dests, int(np.unique(sources, return_counts=True)[1].max()))
         actual_dvc = min(max_dests, value_limit)
         if actual_dvc == 0:
             actual_dvc = 1
 
-        offsets = {node: 12 * i * actual_dvc for i, node in enumerate(source_nodes)}
-        node_offsets_str = ''.join(f"{node:08x}{offsets[node]:08x}" for node in source_nodes)
+        node_offsets_str = encode_node_offsets(source_nodes, ENTRY_SIZE * actual_dvc * np.arange(len(source_nodes)))
 
         metadata = {
             "Metadata": {
@@ -358,26 +592,183 @@ class VectorMigrationData(MigrationData):
         with metafile.open("w") as f:
             json.dump(metadata, f, indent=4, separators=(",", ": "))
 
+        # keep the highest rates for each source node (ties in insertion order), written in ascending rate order.
+        # EMOD needs one full layer per allele combination, so duplicate layers are written again, but their
+        # blocks are only built once.
+        blocks = {}
+        digests = self.layer_digests()
         with path.open("wb") as f:
-            for layer in self._layers:
-                rates_by_source = defaultdict(list)
-                for (from_id, to_id), rate in layer.items():
-                    rates_by_source[from_id].append((to_id, rate))
-
-                for node in source_nodes:
-                    pairs = rates_by_source.get(node, [])
-                    pairs.sort(key=lambda x: x[1], reverse=True)
-                    if len(pairs) > actual_dvc:
-                        pairs = pairs[:actual_dvc]
-                    pairs.sort(key=lambda x: x[1])
-
-                    destinations = np.zeros(actual_dvc, dtype=np.uint32)
-                    rates = np.zeros(actual_dvc, dtype=np.float64)
-                    for i, (dest, rate) in enumerate(pairs):
-                        destinations[i] = dest
-                        rates[i] = rate
-
-                    destinations.tofile(f)
-                    rates.tofile(f)
+            for layer, layer_digest in zip(self._layers, digests):
+                if layer_digest not in blocks:
+                    blocks[layer_digest] = node_blocks(source_nodes, *by_object[id(layer)], actual_dvc)
+                blocks[layer_digest].tofile(f)
+        if len(blocks) < len(digests):
+            logger.info(f"{path.name}: {len(digests) - len(blocks)} of {len(digests)} rate layers "
+                        f"duplicate an earlier layer.")
 
         return path
+
+
+class _ArrayLayer(MutableMapping):
+    """A {(from, to): rate} layer backed by flat arrays until it is modified.
+
+    The writer and digests use the arrays directly. The dictionary of rates is only built on the first
+    mapping access, and any modification drops the arrays. The rates are held in a wrapped dict rather than
+    inherited from dict, so every modification goes through this class. Pairs must be unique.
+    """
+
+    __slots__ = ("_rates", "_arrays")
+
+    def __init__(self, sources: np.ndarray, destinations: np.ndarray, rates: np.ndarray):
+        self._rates = None
+        self._arrays = (np.asarray(sources, dtype=np.int64), np.asarray(destinations, dtype=np.int64),
+                        np.asarray(rates, dtype=np.float64))
+
+    @property
+    def arrays(self):
+        """tuple: (sources, destinations, rates) arrays, or None once the layer has been modified"""
+        return self._arrays
+
+    def scaled(self, multiplier: float) -> "_ArrayLayer":
+        """Layer with the same pairs (sharing the index arrays) and rates * multiplier, capped at 1.0."""
+        sources, destinations, rates = _layer_arrays(self)
+        return _ArrayLayer(sources, destinations, np.minimum(1.0, rates * multiplier))
+
+    def _dict(self) -> dict:
+        if self._rates is None:
+            sources, destinations, rates = self._arrays
+            self._rates = _layer_dict(sources, destinations, rates)
+        return self._rates
+
+    def _modify(self) -> dict:
+        rates = self._dict()
+        self._arrays = None
+        return rates
+
+    def __getitem__(self, key):
+        return self._dict()[key]
+
+    def __setitem__(self, key, value):
+        self._modify()[key] = value
+
+    def __delitem__(self, key):
+        del self._modify()[key]
+
+    def __iter__(self):
+        return iter(self._dict())
+
+    def __len__(self):
+        return len(self._arrays[2]) if self._rates is None else len(self._rates)
+
+    def __contains__(self, key):
+        return key in self._dict()
+
+    def keys(self):
+        return self._dict().keys()
+
+    def values(self):
+        return self._dict().values()
+
+    def items(self):
+        return self._dict().items()
+
+    def get(self, key, default=None):
+        return self._dict().get(key, default)
+
+    def clear(self):
+        self._modify().clear()
+
+    def pop(self, *args):
+        return self._modify().pop(*args)
+
+    def popitem(self):
+        return self._modify().popitem()
+
+    def setdefault(self, key, default=None):
+        return self._modify().setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        self._modify().update(*args, **kwargs)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __or__(self, other):
+        return self._dict() | dict(other) if isinstance(other, Mapping) else NotImplemented
+
+    def __eq__(self, other):
+        return self._dict() == dict(other) if isinstance(other, Mapping) else NotImplemented
+
+    def copy(self) -> dict:
+        return dict(self._dict())
+
+    def __repr__(self):
+        return repr(self._dict())
+
+    def __reduce__(self):
+        # pickle and copy as a plain dict
+        return dict, (self._dict(),)
+
+
+def _layer_arrays(layer: Mapping) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Flat (sources, destinations, rates) arrays, in insertion order, for a {(from, to): rate} layer."""
+    if getattr(layer, "arrays", None) is not None:
+        return layer.arrays
+    count = len(layer)
+    pairs = np.fromiter(chain.from_iterable(layer.keys()), dtype=np.int64, count=2 * count).reshape(count, 2)
+    rates = np.fromiter(layer.values(), dtype=np.float64, count=count)
+    return pairs[:, 0], pairs[:, 1], rates
+
+
+def _layer_dict(sources: np.ndarray, destinations: np.ndarray, rates: np.ndarray) -> dict:
+    """{(from, to): rate} layer from flat arrays, in array order (a repeated pair keeps its last rate)."""
+    return dict(zip(zip(np.asarray(sources).tolist(), np.asarray(destinations).tolist()),
+                    np.asarray(rates, dtype=np.float64).tolist()))
+
+
+def _validate_rates(sources: np.ndarray, destinations: np.ndarray, rates: np.ndarray) -> None:
+    """Raise ValueError for any pair to/from the default node (ID 0) or any rate outside [0.0, 1.0]."""
+    if np.any(sources == 0) or np.any(destinations == 0):
+        raise ValueError("Migration to/from default node (ID=0) is not allowed.")
+    invalid = np.flatnonzero(~((rates >= 0) & (rates <= 1.0)))
+    if len(invalid):
+        first = invalid[0]
+        raise ValueError(f"Rate must be in [0.0, 1.0], got {rates[first]} for pair "
+                         f"{(sources[first].item(), destinations[first].item())}.")
+
+
+def _node_index(node_ids: np.ndarray, order: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """Position of each of **ids** in **node_ids** (sorted by **order**); ValueError for IDs not in node_ids."""
+    positions = np.searchsorted(node_ids, ids, sorter=order)
+    found = positions < len(node_ids)
+    found[found] = node_ids[order[positions[found]]] == ids[found]
+    if not found.all():
+        raise ValueError(f"Node IDs {np.unique(ids[~found]).tolist()} are not in node_ids.")
+    return order[positions]
+
+
+def _import_parquet():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet support requires pyarrow: pip install emodpy-malaria[parquet]") from e
+    return pq
+
+
+def _layer_digest(layer: dict) -> str:
+    """Hex SHA-256 digest of a {(from, to): rate} layer's pairs and rates, in insertion order."""
+    hasher = hashlib.sha256()
+    for values in _layer_arrays(layer):
+        hasher.update(np.ascontiguousarray(values).tobytes())
+    return hasher.hexdigest()
+
+
+def _as_migration_type(migration_type: Union[MigrationType, str]) -> MigrationType:
+    if not isinstance(migration_type, MigrationType):
+        try:
+            migration_type = MigrationType(migration_type.upper())
+        except ValueError:
+            raise ValueError(f"Invalid migration_type '{migration_type}'. "
+                             f"Valid options: {list(MigrationType)}")
+    return migration_type
@@ -0,0 +1,177 @@
+"""Content-addressed cache for generated input files.
+
+Generated inputs such as migration binaries are often identical across every simulation of a sweep.
+An AssetCache stores each generated set of files under a digest of everything that determines their
+contents. A repeat build copies (or, optionally, hard-links) the stored files into place instead of
+regenerating them. Because the exact same bytes are reused (including JSON metadata whose DateCreated
+would otherwise change), platforms that identify assets by checksum do not upload them again.
+
+Hard-linked files share storage with the cache, so with ``hard_link=True`` they must be replaced rather
+than modified in place.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Union
+
+
+@dataclass
+class CacheStats:
+    """Hit/miss counts for an AssetCache.
+
+    Attributes:
+        hits (int): requests served from the cache
+        misses (int): requests whose files had to be generated
+    """
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def requests(self) -> int:
+        """int: total number of requests"""
+        return self.hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        """float: fraction of requests served from the cache (0.0 if there were none)"""
+        return self.hits / self.requests if self.requests else 0.0
+
+    def __str__(self) -> str:
+        return f"{self.hits} hits, {self.misses} misses ({self.hit_rate:.0%} hit rate)"
+
+
+def link_or_copy(source: Union[str, Path], destination: Union[str, Path], hard_link: bool = False) -> None:
+    """Put a copy of **source** at **destination**, optionally as a hard link.
+
+    Hard links fall back to a file copy when they are not supported (e.g., across file systems).
+
+    Args:
+        source (Union[str, Path]): existing file
+        destination (Union[str, Path]): path to create; an existing file there is replaced
+        hard_link (bool): try a hard link before copying
+    """
+    source, destination = Path(source), Path(destination)
+    if destination.exists():
+        if destination.samefile(source):
+            return
+        destination.unlink()
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    if hard_link:
+        try:
+            os.link(source, destination)
+            return
+        except OSError:
+            pass
+    shutil.copyfile(source, destination)
+
+
+class AssetCache:
+    """Cache of generated files keyed by a content digest.
+
+    Each entry is a directory, named by its digest, holding the files generated for it under canonical
+    names ("file0", "file1", ... in request order), so the same contents can be provided under any file
+    names. Entries are published atomically and never modified or removed afterwards (except by clear()),
+    so several processes (or threads sharing this object) can use one cache directory.
+    """
+
+    def __init__(self, directory: Union[str, Path] = None, hard_link: bool = False):
+        """Open (or create) a cache directory.
+
+        Args:
+            directory (Union[str, Path]): cache directory (default: "emodpy_malaria_asset_cache" in the
+                system temporary directory)
+            hard_link (bool): hard-link cached files into place instead of copying them; files provided this
+                way share storage with the cache and must not be rewritten in place
+        """
+        self._directory = Path(directory).absolute() if directory else Path(tempfile.gettempdir()) / "emodpy_malaria_asset_cache"
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._hard_link = hard_link
+        self._stats = CacheStats()
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self) -> Path:
+        """Path: cache directory"""
+        return self._directory
+
+    @property
+    def stats(self) -> CacheStats:
+        """CacheStats: hit/miss counts for requests made through this object"""
+        return self._stats
+
+    def _entry(self, digest: str) -> Path:
+        return self._directory / digest
+
+    @staticmethod
+    def _file_name(index: int) -> str:
+        return f"file{index}"
+
+    def contains(self, digest: str, count: int = 1) -> bool:
+        """Whether the cache has an entry for **digest** holding (at least) **count** files."""
+        entry = self._entry(digest)
+        return all((entry / self._file_name(index)).is_file() for index in range(count))
+
+    def _provide(self, digest: str, paths: list[Path]) -> bool:
+        """Copy (or link) the entry for **digest** to **paths**; False if the entry is missing or incomplete."""
+        if not self.contains(digest, len(paths)):
+            return False
+        try:
+            for index, path in enumerate(paths):
+                link_or_copy(self._entry(digest) / self._file_name(index), path, self._hard_link)
+        except FileNotFoundError:
+            # entry removed by clear() in another process
+            return False
+        return True
+
+    def get_or_create(self, digest: str, paths: list[Union[str, Path]], create: Callable[[], object]) -> bool:
+        """Put the files for **digest** at **paths**, generating them with **create** only on a cache miss.
+
+        Args:
+            digest (str): digest of everything that determines the contents of the files
+            paths (list[Union[str, Path]]): files to provide, always in the same order for a given digest
+            create (Callable[[], object]): writes all of **paths** when called
+
+        Returns:
+            (bool): True if the files came from the cache, False if they were generated
+        """
+        paths = [Path(path).absolute() for path in paths]
+        if len(set(paths)) != len(paths):
+            raise ValueError(f"Cached files must be distinct, got {[str(path) for path in paths]}.")
+
+        if self._provide(digest, paths):
+            with self._lock:
+                self._stats.hits += 1
+            return True
+
+        # don't let the writer truncate a file that is linked from the cache
+        for path in paths:
+            if path.exists():
+                path.unlink()
+        create()
+        missing = [str(path) for path in paths if not path.is_file()]
+        if missing:
+            raise FileNotFoundError(f"Cache entry {digest} was not created: {missing}")
+
+        staging = Path(tempfile.mkdtemp(dir=self._directory, prefix=".staging-"))
+        for index, path in enumerate(paths):
+            shutil.copyfile(path, staging / self._file_name(index))
+        try:
+            os.replace(staging, self._entry(digest))
+        except OSError:
+            # another process (or thread) published this entry first; it is left as it is
+            shutil.rmtree(staging, ignore_errors=True)
+        with self._lock:
+            self._stats.misses += 1
+        return False
+
+    def clear(self) -> None:
+        """Remove every entry from the cache directory and reset the statistics."""
+        with self._lock:
+            for entry in self._directory.iterdir():
+                if entry.is_dir():
+                    shutil.rmtree(entry, ignore_errors=True)
+            self._stats = CacheStats()
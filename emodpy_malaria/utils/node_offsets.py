@@ -0,0 +1,67 @@
+"""Encode and decode the ``NodeOffsets`` string of EMOD binary file metadata.
+
+Migration and weather ``.bin.json`` files locate each node's data with a ``NodeOffsets`` string holding
+16 hexadecimal characters per node: an 8-character node ID followed by an 8-character byte offset.
+The functions here convert between that string and NumPy arrays in bulk, working on the raw ASCII
+bytes instead of slicing and formatting one node at a time.
+"""
+
+import numpy as np
+
+# characters per node entry: 8 hex digits of node ID followed by 8 hex digits of offset
+ENTRY_LENGTH = 16
+_FIELD_LENGTH = 8
+
+_INVALID = 255
+_HEX_VALUES = np.full(256, _INVALID, dtype=np.uint8)
+for _value, _char in enumerate(b"0123456789abcdef"):
+    _HEX_VALUES[_char] = _value
+    _HEX_VALUES[ord(chr(_char).upper())] = _value
+
+_LOWER_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+_UPPER_DIGITS = np.frombuffer(b"0123456789ABCDEF", dtype=np.uint8)
+_SHIFTS = np.arange(4 * (_FIELD_LENGTH - 1), -1, -4, dtype=np.uint32)
+
+
+def decode_node_offsets(node_offsets: str) -> tuple[np.ndarray, np.ndarray]:
+    """Parse a ``NodeOffsets`` string.
+
+    Args:
+        node_offsets (str): 16 hexadecimal characters (either case) per node
+
+    Returns:
+        (tuple[np.ndarray, np.ndarray]): node IDs and byte offsets (both uint32), in string order
+    """
+    if len(node_offsets) % ENTRY_LENGTH:
+        raise ValueError(f"Length of node offsets string ({len(node_offsets)}) is not a multiple of {ENTRY_LENGTH}.")
+    try:
+        raw = np.frombuffer(node_offsets.encode("ascii"), dtype=np.uint8)
+    except UnicodeEncodeError:
+        raise ValueError("Node offsets string must only contain hexadecimal characters.")
+    digits = _HEX_VALUES[raw]
+    if np.any(digits == _INVALID):
+        raise ValueError("Node offsets string must only contain hexadecimal characters.")
+
+    # (nodes, [id, offset], digits) -> shift each digit into place and sum
+    fields = (digits.reshape(-1, 2, _FIELD_LENGTH).astype(np.uint32) << _SHIFTS).sum(axis=2, dtype=np.uint32)
+    return np.ascontiguousarray(fields[:, 0]), np.ascontiguousarray(fields[:, 1])
+
+
+def encode_node_offsets(node_ids, offsets, uppercase: bool = False) -> str:
+    """Build a ``NodeOffsets`` string.
+
+    Args:
+        node_ids: node ID for each entry
+        offsets: byte offset for each entry
+        uppercase (bool): use upper case hexadecimal digits (default lower case; EMOD accepts both)
+
+    Returns:
+        (str): 16 hexadecimal characters per node, in input order
+    """
+    fields = np.column_stack((np.asarray(node_ids, dtype=np.int64).ravel(), np.asarray(offsets, dtype=np.int64).ravel()))
+    if np.any(fields < 0) or np.any(fields > np.iinfo(np.uint32).max):
+        raise ValueError("Node IDs and offsets must fit in an unsigned 32-bit integer.")
+
+    digits = (fields.astype(np.uint32)[:, :, None] >> _SHIFTS) & 0xF
+    characters = (_UPPER_DIGITS if uppercase else _LOWER_DIGITS)[digits]
+    return characters.tobytes().decode("ascii")
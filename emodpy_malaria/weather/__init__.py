@@ -5,6 +5,7 @@ Main features:
 - Create EMOD weather files from CSV, DataFrame, or dictionary data.
 - Read existing EMOD weather files into Python objects.
 - Convert between EMOD binary weather format and tabular formats.
+- Extract node weather from gridded (lat/lon raster) data.
 - Configure EMOD climate model settings.
 """
 
@@ -17,6 +18,7 @@ from emodpy_malaria.weather.weather_variable import WeatherVariable
 from emodpy_malaria.weather.weather_metadata import WeatherAttributes, WeatherMetadata
 from emodpy_malaria.weather.weather_data import WeatherData, DataFrameInfo
 from emodpy_malaria.weather.weather_set import WeatherSet
+from emodpy_malaria.weather.weather_grid import WeatherGrid, read_grid
 from emodpy_malaria.weather.weather_config import set_climate_constant, set_climate_by_data
 
 __all__ = [
@@ -28,6 +30,8 @@ __all__ = [
     "WeatherData",
     "DataFrameInfo",
     "WeatherSet",
+    "WeatherGrid",
+    "read_grid",
     "set_climate_constant",
     "set_climate_by_data",
 ]
@@ -39,7 +43,8 @@ def csv_to_weather(csv_data: Union[str, Path, pd.DataFrame],
                    weather_columns: dict[WeatherVariable, str] = None,
                    attributes: WeatherAttributes = None,
                    weather_dir: Union[str, Path] = None,
-                   weather_file_names: dict[WeatherVariable, str] = None) -> WeatherSet:
+                   weather_file_names: dict[WeatherVariable, str] = None,
+                   chunk_size: int = None) -> WeatherSet:
     """Convert a CSV file or DataFrame to EMOD weather files.
 
     Args:
@@ -54,6 +59,8 @@ def csv_to_weather(csv_data: Union[str, Path, pd.DataFrame],
         weather_dir (Union[str, Path]): If specified, write ``.bin``/``.bin.json`` files here.
         weather_file_names (dict[WeatherVariable, str]): Optional ``{WeatherVariable: filename}``
             mapping. If omitted, conventional names are generated.
+        chunk_size (int): If set, stream a CSV file this many rows at a time instead of loading it whole,
+            for files larger than memory (see ``WeatherSet.from_csv()``). Ignored for DataFrames.
 
     Returns:
         [WeatherSet](https://emod.idmod.org/emodpy-malaria/autoapi/emodpy_malaria/weather/weather_set/) containing the parsed weather data.
@@ -66,7 +73,7 @@ def csv_to_weather(csv_data: Union[str, Path, pd.DataFrame],
     elif isinstance(csv_data, (str, Path)):
         ws = WeatherSet.from_csv(
             file_path=csv_data, node_column=node_column, step_column=step_column,
-            weather_columns=weather_columns, attributes=attributes,
+            weather_columns=weather_columns, attributes=attributes, chunk_size=chunk_size,
         )
     else:
         raise TypeError("csv_data must be a file path or a pandas DataFrame.")
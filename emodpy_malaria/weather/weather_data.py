@@ -11,17 +11,36 @@ binary file I/O, extending it with:
 column names when converting between tabular and binary formats.
 """
 
+import hashlib
+import json
 import numpy as np
 import pandas as pd
 
 from pathlib import Path
-from typing import Union
+from typing import Iterator, Union
 
 from emod_api.weather.weather import Weather as BaseWeather
 
-from emodpy_malaria.weather.weather_utils import hash_series, invert_dict, make_path
+from emodpy_malaria.utils.emod_enum import ClimateUpdateResolution
+from emodpy_malaria.weather.weather_utils import invert_dict, make_path
 from emodpy_malaria.weather.weather_variable import WeatherVariable
 from emodpy_malaria.weather.weather_metadata import WeatherMetadata, WeatherAttributes, SERIES_BYTE_VALUE_SIZE
+from emodpy_malaria.weather.weather_metadata import _META_DATE_CREATED
+
+RESAMPLE_METHODS = ("mean", "sum")
+PERTURBATION_METHODS = ("add", "scale")
+
+# days per step, as EMOD advances climate data at each update resolution
+_RESOLUTION_DAYS = {
+    ClimateUpdateResolution.CLIMATE_UPDATE_HOUR: 1 / 24,
+    ClimateUpdateResolution.CLIMATE_UPDATE_DAY: 1,
+    ClimateUpdateResolution.CLIMATE_UPDATE_WEEK: 7,
+    ClimateUpdateResolution.CLIMATE_UPDATE_MONTH: 30,
+    ClimateUpdateResolution.CLIMATE_UPDATE_YEAR: 365,
+}
+
+# duplicate series are checked against their first occurrence (and series are digested) this many bytes at a time
+_COMPARE_CHUNK_BYTES = 1 << 24
 
 
 class WeatherData:
@@ -142,33 +161,64 @@ class WeatherData:
         if np.any(np.isnan(series_values)):
             raise ValueError("Time series contains NaN values.")
 
+        node_ids = np.array(list(node_series), dtype=np.int64)
+        return cls._from_series_array(node_ids, series_values, same_nodes=same_nodes, attributes=attributes)
+
+    @classmethod
+    def _from_series_array(cls,
+                           node_ids: np.ndarray,
+                           series_values: np.ndarray,
+                           same_nodes: dict[int, list[int]] = None,
+                           attributes: WeatherAttributes = None) -> "WeatherData":
+        """Create from validated node IDs and a matching float32 ``(nodes, steps)`` array of series."""
         same_nodes = same_nodes or {}
 
-        node_series_hashes = {int(n): hash_series(s) for n, s in node_series.items()}
-        unique_nodes = {h: nn[0] for h, nn in invert_dict(node_series_hashes).items()}
-        unique_series = [node_series[n] for n in unique_nodes.values()]
+        first_rows, row_groups = _unique_rows(series_values)
+        first_order = np.argsort(first_rows)
+        series_index = np.empty(len(first_rows), dtype=np.int64)
+        series_index[first_order] = np.arange(len(first_rows))
+        data = series_values[first_rows[first_order]]
 
         offset_increment = series_values.shape[1] * SERIES_BYTE_VALUE_SIZE
-        node_offsets = {n: (i * offset_increment) for i, n in enumerate(unique_nodes.values())}
-        node_offsets.update({n: node_offsets[unique_nodes[h]] for n, h in node_series_hashes.items()})
+        offsets = series_index[row_groups] * offset_increment
 
         same_inverted = invert_dict(same_nodes, single_value=True)
-        node_offsets.update({same: node_offsets[unique] for same, unique in same_inverted.items()})
-        node_offsets = dict(sorted(node_offsets.items()))
+        if same_inverted:
+            position = dict(zip(node_ids.tolist(), range(len(node_ids))))
+            same_ids = np.fromiter(same_inverted.keys(), dtype=np.int64, count=len(same_inverted))
+            same_offsets = offsets[[position[int(n)] for n in same_inverted.values()]]
+            node_ids = np.concatenate((node_ids, same_ids))
+            offsets = np.concatenate((offsets, same_offsets))
+
+        # sorted by node ID; a node listed more than once keeps its last offset
+        _, last = np.unique(node_ids[::-1], return_index=True)
+        keep = len(node_ids) - 1 - last
+        node_offsets = dict(zip(node_ids[keep].tolist(), offsets[keep].tolist()))
 
-        data = np.array(unique_series, dtype=np.float32)
         wm = WeatherMetadata(node_ids=node_offsets, series_len=data.shape[1], attributes=attributes)
         return WeatherData(data=data, metadata=wm)
 
     def to_dict(self, only_unique_series: bool = False, copy_data: bool = True) -> dict[int, np.ndarray]:
         """Export as ``{node_id: series}`` dictionary."""
-        data_dict = {}
-        node_groups = self.metadata.offset_nodes.values()
+        node_ids, rows = self._node_rows(only_unique_series)
         series_list = np.copy(self._data) if copy_data else self._data
-        for ng, s in zip(node_groups, series_list):
-            nodes = ng[:1] if only_unique_series else ng
-            data_dict.update(dict(zip(nodes, [s] * len(nodes))))
-        return dict(sorted(data_dict.items()))
+        # nodes sharing a series share one row view, not a copy each
+        return dict(zip(node_ids.tolist(), map(series_list.__getitem__, rows.tolist())))
+
+    def _node_rows(self, only_unique_series: bool = False) -> tuple[np.ndarray, np.ndarray]:
+        """Sorted node IDs and the data row holding each node's series."""
+        node_offsets = self.metadata.node_offsets
+        node_ids = np.fromiter(node_offsets.keys(), dtype=np.int64, count=len(node_offsets))
+        offsets = np.fromiter(node_offsets.values(), dtype=np.int64, count=len(node_offsets))
+        order = np.argsort(node_ids)
+        node_ids, offsets = node_ids[order], offsets[order]
+
+        # data rows are stored in offset order
+        _, first_nodes, rows = np.unique(offsets, return_index=True, return_inverse=True)
+        if only_unique_series:
+            first_nodes = np.sort(first_nodes)
+            node_ids, rows = node_ids[first_nodes], rows[first_nodes]
+        return node_ids, rows
 
     @classmethod
     def from_csv(cls, file_path: Union[str, Path],
@@ -203,54 +253,350 @@ class WeatherData:
             if df[c].hasnans:
                 raise ValueError(f"Column {c!r} contains NaN values.")
 
-        df = df[[nc, sc, vc]].sort_values(by=[nc, sc])
-        df = df[[nc, vc]].set_index(nc)
-        node_series = df.groupby(nc).apply(lambda r: r.to_dict("records"), include_groups=False).to_dict()
-        node_series = {node: [list(d.values())[0] for d in rw] for node, rw in node_series.items()}
+        try:
+            values = df[vc].to_numpy(dtype=np.float32)
+        except (ValueError, TypeError):
+            raise ValueError("Time series contains values that cannot be converted to float32.")
 
-        return cls.from_dict(node_series=node_series, attributes=attributes)
+        # sort by node then step and reshape the value column straight into (nodes, steps)
+        nodes = df[nc].to_numpy()
+        order = np.lexsort((df[sc].to_numpy(), nodes))
+        node_ids, counts = np.unique(nodes[order], return_counts=True)
+        if np.any(counts != counts[0]):
+            raise ValueError("All time series must be non-empty lists of equal length.")
+        series = values[order].reshape(len(node_ids), counts[0])
+        if np.any(np.isinf(series)):
+            raise ValueError("Time series contains infinite values.")
+
+        return cls._from_series_array(node_ids.astype(np.int64), series, attributes=attributes)
 
     def to_dataframe(self, info: "DataFrameInfo" = None) -> pd.DataFrame:
         """Convert to a DataFrame with node, step, and value columns."""
         info = info or DataFrameInfo()
-        data_dict = self.to_dict(only_unique_series=info.only_unique_series)
-
-        actual_nodes = list(data_dict.keys())
-        sl = self.metadata.series_len
-        nodes = np.repeat(actual_nodes, sl)
-        steps = list(range(1, sl + 1)) * len(actual_nodes)
-        values = np.array(list(data_dict.values())).reshape(len(data_dict) * sl)
-
-        df = pd.DataFrame({
-            info.node_column: nodes,
-            info.step_column: steps,
-            info.value_column: values,
-        })
-        df[info.node_column] = df[info.node_column].astype(int)
-        df[info.step_column] = df[info.step_column].astype(int)
-        df[info.value_column] = df[info.value_column].astype(np.float32)
-        df.sort_values(by=[info.node_column, info.step_column], inplace=True)
-        return df
+        return pd.DataFrame(self._dataframe_columns(info))
+
+    def _dataframe_columns(self, info: "DataFrameInfo") -> dict[str, np.ndarray]:
+        """Node, step and value columns, ordered by node then step."""
+        node_ids, rows = self._node_rows(only_unique_series=info.only_unique_series)
+        series_len = self.metadata.series_len
+        return {
+            info.node_column: np.repeat(node_ids, series_len),
+            info.step_column: np.tile(np.arange(1, series_len + 1, dtype=np.int64), len(node_ids)),
+            info.value_column: np.asarray(self._data, dtype=np.float32)[rows].reshape(-1),
+        }
 
     @classmethod
-    def from_file(cls, file_path: Union[str, Path]) -> "WeatherData":
-        """Read from a ``.bin`` / ``.bin.json`` file pair."""
+    def from_file(cls, file_path: Union[str, Path], mmap: bool = False) -> "WeatherData":
+        """Read from a ``.bin`` / ``.bin.json`` file pair.
+
+        Args:
+            file_path (Union[str, Path]): Path to the ``.bin`` file; metadata is read from ``<file_path>.json``.
+            mmap (bool): Memory-map the ``.bin`` file read-only instead of reading it. ``data`` is then an
+                ``np.memmap`` and values are only read from disk when accessed, e.g. by ``select()``.
+        """
         file_path = str(file_path)
         wm = WeatherMetadata.from_file(f"{file_path}.json")
         if not Path(file_path).is_file():
             raise FileNotFoundError(f"Data file not found: {file_path}")
-        data = np.fromfile(file_path, dtype=np.float32)
-        if wm.total_value_count != len(data):
+        if mmap:
+            value_count = Path(file_path).stat().st_size // SERIES_BYTE_VALUE_SIZE
+        else:
+            data = np.fromfile(file_path, dtype=np.float32)
+            value_count = len(data)
+        if wm.total_value_count != value_count:
             raise ValueError(
-                f"Data length {len(data)} doesn't match metadata "
+                f"Data length {value_count} doesn't match metadata "
                 f"({wm.series_count} * {wm.series_len} = {wm.total_value_count})."
             )
+        if mmap:
+            data = np.memmap(file_path, dtype=np.float32, mode="r", shape=(value_count,))
+        return WeatherData(data=data, metadata=wm)
+
+    def select(self, nodes: list[int] = None, steps: slice = None) -> "WeatherData":
+        """Create a subset with only some nodes and/or time steps.
+
+        Only the series of the selected nodes, and only the selected steps of those, are read. On a
+        memory-mapped instance (see ``from_file()``) the rest of the file is never loaded, so a subset of a
+        large file can be written with ``to_file()`` without reading it all. Nodes sharing a series keep
+        sharing it.
+
+        Args:
+            nodes (list[int]): Node IDs to keep (default all).
+            steps (slice): Time step indices to keep, 0-based (default all).
+
+        Returns:
+            (WeatherData): New in-memory weather data with the same attributes.
+        """
+        node_offsets = self.metadata.node_offsets
+        if nodes is not None:
+            nodes = sorted({int(n) for n in nodes})
+            missing = [n for n in nodes if n not in node_offsets]
+            if not nodes or missing:
+                raise ValueError(f"Selected nodes must be a non-empty subset of the weather nodes. Missing: {missing[:5]}")
+            node_offsets = {n: node_offsets[n] for n in nodes}
+        steps = steps if steps is not None else slice(None)
+        series_len = len(range(self.metadata.series_len)[steps])
+        if series_len == 0:
+            raise ValueError(f"Time step selection {steps} is empty.")
+
+        # data rows are stored in offset order
+        all_offsets = np.unique(np.fromiter(self.metadata.node_offsets.values(), dtype=np.int64))
+        offsets = np.fromiter(node_offsets.values(), dtype=np.int64, count=len(node_offsets))
+        unique_offsets, series_index = np.unique(offsets, return_inverse=True)
+        data = self._data[np.searchsorted(all_offsets, unique_offsets), steps]
+
+        new_offsets = series_index * series_len * SERIES_BYTE_VALUE_SIZE
+        wm = WeatherMetadata(node_ids=dict(zip(node_offsets, new_offsets.tolist())), series_len=series_len,
+                             attributes=self.metadata.attributes)
         return WeatherData(data=data, metadata=wm)
 
+    def resample(self, resolution: ClimateUpdateResolution,
+                 how: str = "mean",
+                 from_resolution: ClimateUpdateResolution = None) -> "WeatherData":
+        """Aggregate the time series to a coarser update resolution.
+
+        Steps are grouped into consecutive blocks as long as one step of ***resolution***, measured the way
+        EMOD advances climate data (a week is 7 days, a month 30 days, a year 365 days), counted from the first
+        step. A trailing partial block is aggregated over the steps it has. Only the unique series are
+        aggregated, so nodes sharing a series keep sharing it.
+
+        Args:
+            resolution (ClimateUpdateResolution): Target resolution; one step must span a whole number of
+                source steps (e.g. hour or day to week, month or year).
+            how (str): ``"mean"`` or ``"sum"`` of the steps in each block.
+            from_resolution (ClimateUpdateResolution): Resolution of the current series (default the
+                metadata ``UpdateResolution``).
+
+        Returns:
+            (WeatherData): New weather data with ``UpdateResolution`` set to ***resolution***.
+        """
+        if how not in RESAMPLE_METHODS:
+            raise ValueError(f"Unknown aggregation {how!r}, expected one of {RESAMPLE_METHODS}.")
+        resolution = ClimateUpdateResolution(resolution)
+        block = _resolution_days(resolution) / _resolution_days(from_resolution or self.metadata.update_resolution)
+        if block < 1 or block != int(block):
+            raise ValueError(
+                f"Cannot resample to {resolution.value}, a step must span a whole number (at least 1) of "
+                f"current steps, not {block:g}.")
+
+        starts = np.arange(0, self.metadata.series_len, int(block))
+        values = np.add.reduceat(np.asarray(self._data, dtype=np.float64), starts, axis=1)
+        if how == "mean":
+            values /= np.diff(np.append(starts, self.metadata.series_len))
+
+        attributes = self.metadata.attributes
+        attributes.update_resolution = resolution.value
+        return self._with_series(values, attributes)
+
+    def climatology(self, steps_per_year: int = None) -> "WeatherData":
+        """Average a multi-year series into one year, step by step.
+
+        Args:
+            steps_per_year (int): Steps in one year of the series (default from the metadata
+                ``UpdateResolution`` when a year is a whole number of its steps: 8760 hours, 365 days or 1 year).
+
+        Returns:
+            (WeatherData): New weather data whose series are ***steps_per_year*** long.
+        """
+        if steps_per_year is None:
+            steps_per_year = _resolution_days(ClimateUpdateResolution.CLIMATE_UPDATE_YEAR) / \
+                _resolution_days(self.metadata.update_resolution)
+            if steps_per_year != int(steps_per_year):
+                raise ValueError(
+                    f"A year is not a whole number of {self.metadata.update_resolution} steps, steps_per_year "
+                    f"is required.")
+        steps_per_year = int(steps_per_year)
+        series_len = self.metadata.series_len
+        if steps_per_year <= 0 or series_len % steps_per_year != 0:
+            raise ValueError(
+                f"Time series length {series_len} is not a whole number of {steps_per_year}-step years.")
+
+        values = np.asarray(self._data, dtype=np.float64)
+        values = values.reshape(len(values), series_len // steps_per_year, steps_per_year).mean(axis=1)
+        return self._with_series(values, self.metadata.attributes)
+
+    def tile(self, series_len: int) -> "WeatherData":
+        """Repeat the time series end to end to a new length, e.g. a one-year climatology over a simulation.
+
+        Args:
+            series_len (int): Length of the new series; the last repetition is cut short as needed.
+
+        Returns:
+            (WeatherData): New weather data whose series are ***series_len*** long.
+        """
+        if not isinstance(series_len, int) or series_len <= 0:
+            raise ValueError("Weather time series length must be a positive integer.")
+        repeats = -(-series_len // self.metadata.series_len)
+        values = np.tile(self._data, (1, repeats))[:, :series_len]
+        return self._with_series(values, self.metadata.attributes)
+
+    def perturb(self, field: Union[float, np.ndarray],
+                how: str = "add",
+                window: int = None,
+                clip: tuple[float, float] = None) -> "WeatherData":
+        """Apply an additive or multiplicative perturbation field per node and time window.
+
+        The field is applied to the unique series only: nodes that share a series and get the same perturbation
+        keep sharing it, so a field without a node dimension keeps the series count unchanged.
+
+        Args:
+            field (Union[float, np.ndarray]): Perturbation, broadcastable to ``(nodes, windows)`` with nodes in
+                ascending node ID order: a scalar, ``(windows,)`` for all nodes, or ``(nodes, 1)`` / ``(nodes,
+                windows)`` per node.
+            how (str): ``"add"`` the field to the values or ``"scale"`` (multiply) them by it.
+            window (int): Time steps per window, counted from the first step; the last window may be shorter
+                (default one window over the whole series). E.g. 30 for EMOD months of daily data.
+            clip (tuple[float, float]): Optional ``(min, max)`` to clip perturbed values to (either may be None),
+                e.g. ``(0, None)`` for rainfall or ``(0, 1)`` for relative humidity.
+
+        Returns:
+            (WeatherData): New perturbed weather data with the same nodes and attributes.
+        """
+        node_ids, rows = self._node_rows()
+        window = self._perturbation_window(window)
+        field = _perturbation_field(field, len(node_ids), -(-self.metadata.series_len // window), "field")
+        return self._perturbed(node_ids, rows, field, how, window, clip)
+
+    def ensemble(self, members: int,
+                 field: Union[float, np.ndarray] = None,
+                 std: Union[float, np.ndarray] = 0.0,
+                 how: str = "add",
+                 window: int = None,
+                 clip: tuple[float, float] = None,
+                 seed: int = None) -> Iterator["WeatherData"]:
+        """Generate perturbed ensemble members one at a time, see ``perturb()``.
+
+        Each member is perturbed by ***field*** plus Gaussian noise with standard deviation ***std***, drawn
+        per window and, when ***field*** or ***std*** has a node dimension, per node. Noise without a node
+        dimension is the same for every node, which keeps shared series shared. Members are generated lazily,
+        so only one is held in memory at a time unless the caller keeps them.
+
+        Args:
+            members (int): Number of members.
+            field (Union[float, np.ndarray]): Perturbation shared by all members (default 0 to add, 1 to scale),
+                shaped as for ``perturb()``.
+            std (Union[float, np.ndarray]): Noise standard deviation, shaped as ***field***.
+            how (str): ``"add"`` or ``"scale"``.
+            window (int): Time steps per window, see ``perturb()``.
+            clip (tuple[float, float]): Optional ``(min, max)`` for perturbed values.
+            seed (int): Random seed; the same seed gives the same members.
+
+        Yields:
+            (WeatherData): One perturbed member at a time.
+        """
+        if not isinstance(members, int) or members <= 0:
+            raise ValueError("members must be a positive integer.")
+        if how not in PERTURBATION_METHODS:
+            raise ValueError(f"Unknown perturbation {how!r}, expected one of {PERTURBATION_METHODS}.")
+        node_ids, rows = self._node_rows()
+        window = self._perturbation_window(window)
+        window_count = -(-self.metadata.series_len // window)
+        field = _perturbation_field((0.0 if how == "add" else 1.0) if field is None else field,
+                                    len(node_ids), window_count, "field")
+        std = _perturbation_field(std, len(node_ids), window_count, "std")
+        if np.any(std < 0):
+            raise ValueError("std must not be negative.")
+        rng = np.random.default_rng(seed)
+        noise_shape = (max(len(field), len(std)), window_count)
+
+        def generate():
+            for _ in range(members):
+                member_field = field + rng.standard_normal(noise_shape) * std if np.any(std) else field
+                yield self._perturbed(node_ids, rows, member_field, how, window, clip)
+        # a nested generator, so the arguments are checked when ensemble() is called
+        return generate()
+
+    def ensemble_to_files(self, file_path: str, members: int, **kwargs) -> list[Path]:
+        """Write ensemble members to ``.bin`` / ``.bin.json`` files as they are generated, see ``ensemble()``.
+
+        Args:
+            file_path (str): Path template formatted with the 0-based ``member`` index, e.g.
+                ``"ensemble/airtemp_{member:03d}.bin"``.
+            members (int): Number of members.
+            **kwargs: ``field``, ``std``, ``how``, ``window``, ``clip`` and ``seed`` as for ``ensemble()``.
+
+        Returns:
+            (list[Path]): Paths of the ``.bin`` files written.
+        """
+        paths = [Path(str(file_path).format(member=i)) for i in range(members)]
+        if len(set(paths)) != len(paths):
+            raise ValueError(f"file_path {file_path!r} must contain a '{{member}}' field.")
+        for path, member in zip(paths, self.ensemble(members, **kwargs)):
+            member.to_file(path)
+        return paths
+
+    def _perturbation_window(self, window: int) -> int:
+        series_len = self.metadata.series_len
+        if window is None:
+            return series_len
+        if not isinstance(window, int) or window <= 0:
+            raise ValueError("window must be a positive integer.")
+        return min(window, series_len)
+
+    def _perturbed(self, node_ids: np.ndarray, rows: np.ndarray, field: np.ndarray,
+                   how: str, window: int, clip: tuple[float, float]) -> "WeatherData":
+        """Perturb each node's series by its row of ***field***, computing each distinct (series, field) pair once."""
+        if how not in PERTURBATION_METHODS:
+            raise ValueError(f"Unknown perturbation {how!r}, expected one of {PERTURBATION_METHODS}.")
+        if len(field) == 1:
+            # the same perturbation for every node: series stay shared as they are
+            data_rows, series_index = np.arange(len(self._data)), rows
+            field_rows = np.zeros(len(self._data), dtype=np.int64)
+        else:
+            keys = np.hstack((rows[:, None].astype(np.float64), field))
+            _, first_nodes, series_index = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+            data_rows, field_rows = rows[first_nodes], first_nodes
+
+        series_len = self.metadata.series_len
+        steps_field = np.repeat(field[field_rows], window, axis=1)[:, :series_len]
+        values = np.asarray(self._data[data_rows], dtype=np.float64)
+        values = values + steps_field if how == "add" else values * steps_field
+        if clip is not None:
+            values = np.clip(values, *clip)
+
+        offsets = series_index.ravel() * series_len * SERIES_BYTE_VALUE_SIZE
+        wm = WeatherMetadata(node_ids=dict(zip(node_ids.tolist(), offsets.tolist())), series_len=series_len,
+                             attributes=self.metadata.attributes)
+        return WeatherData(data=values, metadata=wm)
+
+    def _with_series(self, data: np.ndarray, attributes: WeatherAttributes) -> "WeatherData":
+        """Same nodes with new unique series, one per current data row."""
+        node_offsets = self.metadata.node_offsets
+        offsets = np.fromiter(node_offsets.values(), dtype=np.int64, count=len(node_offsets))
+        # data rows are stored in offset order
+        _, rows = np.unique(offsets, return_inverse=True)
+        new_offsets = rows * data.shape[1] * SERIES_BYTE_VALUE_SIZE
+        wm = WeatherMetadata(node_ids=dict(zip(node_offsets, new_offsets.tolist())), series_len=data.shape[1],
+                             attributes=attributes)
+        return WeatherData(data=data, metadata=wm)
+
+    def digest(self) -> str:
+        """Content digest of the files ``to_file()`` writes.
+
+        Covers the unique series, node offsets and metadata attributes, but not the creation date, so it can be
+        used as an [AssetCache](https://emod.idmod.org/emodpy-malaria/autoapi/emodpy_malaria/utils/asset_cache/) key.
+        Memory-mapped data is read in chunks.
+
+        Returns:
+            (str): hex SHA-256 digest
+        """
+        hasher = hashlib.sha256()
+        attributes = {k: v for k, v in self.metadata.attributes_dict.items() if k != _META_DATE_CREATED}
+        hasher.update(json.dumps(attributes, sort_keys=True, default=str).encode("utf-8"))
+        node_offsets = sorted(self.metadata.node_offsets.items())
+        hasher.update(np.array(node_offsets, dtype=np.int64).tobytes())
+        rows = max(1, _COMPARE_CHUNK_BYTES // max(1, self._data[0].nbytes))
+        for start in range(0, len(self._data), rows):
+            hasher.update(np.ascontiguousarray(self._data[start:start + rows], dtype=np.float32))
+        return hasher.hexdigest()
+
     def to_file(self, file_path: Union[str, Path]) -> None:
         """Write ``.bin`` and ``.bin.json`` files."""
         file_path = str(file_path)
         self.validate()
+        mapped_file = getattr(self._data, "filename", None)
+        if mapped_file and Path(mapped_file).resolve() == Path(file_path).resolve():
+            raise ValueError(f"Cannot overwrite {file_path}, it is memory-mapped by this weather data.")
         make_path(Path(file_path).parent)
         self._ensure_data_type(self._data)
         with open(file_path, "wb") as bf:
@@ -261,9 +607,55 @@ class WeatherData:
     def _ensure_data_type(cls, data) -> np.ndarray:
         if data is None or not hasattr(data, "__len__") or len(data) == 0:
             raise ValueError("Data must be a non-empty iterable.")
+        if isinstance(data, np.memmap) and data.dtype == np.float32:
+            # keep memory-mapped data on disk
+            return data
         return np.array(data, dtype=np.float32)
 
 
+def _perturbation_field(field: Union[float, np.ndarray], node_count: int, window_count: int, name: str) -> np.ndarray:
+    """Field as a float64 ``(1 or node_count, window_count)`` array."""
+    field = np.asarray(field, dtype=np.float64)
+    if field.ndim < 2:
+        field = field.reshape(1, -1)
+    if field.ndim != 2 or field.shape[0] not in (1, node_count) or field.shape[1] not in (1, window_count):
+        raise ValueError(f"{name} of shape {field.shape} must broadcast to (nodes, windows) = ({node_count}, {window_count}).")
+    if not np.all(np.isfinite(field)):
+        raise ValueError(f"{name} contains NaN or infinite values.")
+    return np.ascontiguousarray(np.broadcast_to(field, (field.shape[0], window_count)))
+
+
+def _resolution_days(resolution: Union[ClimateUpdateResolution, str]) -> float:
+    try:
+        return _RESOLUTION_DAYS[ClimateUpdateResolution(resolution)]
+    except ValueError:
+        raise ValueError(
+            f"Unknown update resolution {resolution!r}, set it in the metadata or pass a ClimateUpdateResolution.")
+
+
+def _unique_rows(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Find byte-identical rows of a 2-D array.
+
+    Rows are grouped by digest and every duplicate is compared with its group's first row, so digest collisions
+    fall back to an exact comparison instead of merging different series.
+
+    Returns:
+        (tuple[np.ndarray, np.ndarray]): index of the first row of each group, and the group of each row
+    """
+    digests = np.fromiter((hash(row.tobytes()) for row in values), dtype=np.int64, count=len(values))
+    _, first_rows, row_groups = np.unique(digests, return_index=True, return_inverse=True)
+    representatives = first_rows[row_groups]
+    duplicates = np.flatnonzero(representatives != np.arange(len(values)))
+    words = values.view(np.uint32)
+    chunk = max(1, _COMPARE_CHUNK_BYTES // max(1, words[0].nbytes))
+    for start in range(0, len(duplicates), chunk):
+        rows = duplicates[start:start + chunk]
+        if not np.array_equal(words[rows], words[representatives[rows]]):
+            _, first_rows, row_groups = np.unique(words, axis=0, return_index=True, return_inverse=True)
+            break
+    return first_rows, row_groups.ravel()
+
+
 class DataFrameInfo:
     """Column name configuration for weather DataFrames."""
 
@@ -0,0 +1,286 @@
+"""Extraction of node weather time series from gridded (raster) weather data.
+
+[WeatherGrid](https://emod.idmod.org/emodpy-malaria/autoapi/emodpy_malaria/weather/weather_grid/) maps nodes onto a
+regular latitude/longitude grid once, by nearest cell or bilinear weights, and then turns ``(time, lat, lon)``
+arrays into [WeatherData](https://emod.idmod.org/emodpy-malaria/autoapi/emodpy_malaria/weather/weather_data/) with a
+single gather per variable. Nodes that map to the same cell(s) share one series in the weather files.
+
+Grids can be read from ``.npz`` files or, with ``netCDF4`` installed, from NetCDF (``.nc``) files.
+"""
+
+import numpy as np
+
+from pathlib import Path
+from typing import Union
+
+from emodpy_malaria.weather.weather_variable import WeatherVariable
+from emodpy_malaria.weather.weather_metadata import WeatherAttributes
+from emodpy_malaria.weather.weather_data import WeatherData
+from emodpy_malaria.weather.weather_set import WeatherSet
+
+GRID_METHODS = ("nearest", "bilinear")
+
+
+class WeatherGrid:
+    """Node to grid cell index for extracting node weather from ``(time, lat, lon)`` arrays."""
+
+    def __init__(self,
+                 lats: Union[np.ndarray, list[float]],
+                 lons: Union[np.ndarray, list[float]],
+                 node_ids: Union[np.ndarray, list[int]],
+                 node_lats: Union[np.ndarray, list[float]],
+                 node_lons: Union[np.ndarray, list[float]],
+                 method: str = "nearest"):
+        """Build the node to cell index.
+
+        Args:
+            lats (Union[np.ndarray, list[float]]): Grid cell center latitudes, ascending or descending.
+            lons (Union[np.ndarray, list[float]]): Grid cell center longitudes, ascending or descending. Node
+                longitudes are shifted by 360 degrees when that places them on a 0-360 (or -180-180) grid. A grid
+                spanning all 360 degrees is periodic, so nodes near its seam use the cells on both sides.
+            node_ids (Union[np.ndarray, list[int]]): Node IDs.
+            node_lats (Union[np.ndarray, list[float]]): Latitude of each node.
+            node_lons (Union[np.ndarray, list[float]]): Longitude of each node.
+            method (str): ``"nearest"`` takes the series of the cell whose center is closest along each axis (nodes
+                may be up to half a cell outside the grid); ``"bilinear"`` interpolates the four surrounding
+                cell centers (nodes must lie within the grid).
+        """
+        if method not in GRID_METHODS:
+            raise ValueError(f"Unknown grid method {method!r}, expected one of {GRID_METHODS}.")
+        lats, lons = (np.asarray(c, dtype=np.float64) for c in (lats, lons))
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        node_lats, node_lons = (np.asarray(c, dtype=np.float64) for c in (node_lats, node_lons))
+        if lats.ndim != 1 or lons.ndim != 1 or len(lats) == 0 or len(lons) == 0:
+            raise ValueError("Grid latitudes and longitudes must be non-empty 1-D arrays.")
+        if len(node_ids) == 0 or not (node_ids.shape == node_lats.shape == node_lons.shape):
+            raise ValueError("node_ids, node_lats and node_lons must be non-empty and of equal length.")
+        if len(np.unique(node_ids)) != len(node_ids):
+            raise ValueError("node_ids must be unique.")
+
+        lat_cells, lat_weights = _axis_stencil(lats, node_lats, method, "latitude")
+        lon_cells, lon_weights = _axis_stencil(lons, node_lons, method, "longitude", period=360.0)
+
+        # every combination of the latitude and longitude stencils, as flat (lat, lon) cell indices
+        cells = (lat_cells[:, :, None] * len(lons) + lon_cells[:, None, :]).reshape(len(node_ids), -1)
+        weights = (lat_weights[:, :, None] * lon_weights[:, None, :]).reshape(len(node_ids), -1)
+        # cells without weight point at the heaviest cell, so missing values there cannot leak in
+        heaviest = cells[np.arange(len(cells)), weights.argmax(axis=1)]
+        cells = np.where(weights > 0, cells, heaviest[:, None])
+
+        # one series per distinct stencil; the other nodes with that stencil share it
+        stencils = np.hstack((cells, weights.view(np.int64)))
+        _, first_nodes, stencil_index = np.unique(stencils, axis=0, return_index=True, return_inverse=True)
+        first_ids = node_ids[first_nodes]
+        same_nodes = {}
+        for node_id, first_id in zip(node_ids.tolist(), first_ids[stencil_index.ravel()].tolist()):
+            if node_id != first_id:
+                same_nodes.setdefault(first_id, []).append(node_id)
+
+        self._shape = (len(lats), len(lons))
+        self._method = method
+        self._node_ids = node_ids
+        self._cells = cells
+        self._weights = weights
+        self._stencil_ids = first_ids
+        self._stencil_cells = cells[first_nodes]
+        self._stencil_weights = weights[first_nodes]
+        self._same_nodes = same_nodes
+
+    @classmethod
+    def from_demographics(cls, demographics,
+                          lats: Union[np.ndarray, list[float]],
+                          lons: Union[np.ndarray, list[float]],
+                          method: str = "nearest") -> "WeatherGrid":
+        """Build the index for the nodes of a demographics object, using their latitude and longitude.
+
+        Args:
+            demographics (MalariaDemographics): Demographics whose nodes (excluding the default node) are indexed.
+            lats (Union[np.ndarray, list[float]]): Grid cell center latitudes.
+            lons (Union[np.ndarray, list[float]]): Grid cell center longitudes.
+            method (str): ``"nearest"`` or ``"bilinear"``, see ``WeatherGrid()``.
+        """
+        nodes = [n for n in demographics.nodes if n.id != 0]
+        return cls(lats=lats, lons=lons,
+                   node_ids=[n.id for n in nodes],
+                   node_lats=[n.lat for n in nodes],
+                   node_lons=[n.lon for n in nodes],
+                   method=method)
+
+    @property
+    def method(self) -> str:
+        return self._method
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self._shape
+
+    @property
+    def node_ids(self) -> list[int]:
+        return self._node_ids.tolist()
+
+    @property
+    def node_cells(self) -> dict[int, tuple[int, int]]:
+        """``{node_id: (lat_index, lon_index)}`` of the cell each node takes most of its values from."""
+        heaviest = self._cells[np.arange(len(self._cells)), self._weights.argmax(axis=1)]
+        lat_index, lon_index = np.unravel_index(heaviest, self._shape)
+        return dict(zip(self._node_ids.tolist(), zip(lat_index.tolist(), lon_index.tolist())))
+
+    def extract(self, values: np.ndarray, attributes: WeatherAttributes = None) -> "WeatherData":
+        """Extract the node time series of one weather variable.
+
+        Nodes using the same cell(s) with the same weights get one shared series.
+
+        Args:
+            values (np.ndarray): Grid values shaped ``(time, lat, lon)``; may be memory-mapped.
+            attributes (WeatherAttributes): Optional metadata attributes.
+
+        Returns:
+            (WeatherData): Weather data for the indexed nodes.
+        """
+        values = np.asarray(values)
+        if values.ndim != 3 or values.shape[1:] != self._shape or values.shape[0] == 0:
+            raise ValueError(f"Grid values must be shaped (time, {self._shape[0]}, {self._shape[1]}), "
+                             f"got {values.shape}.")
+
+        flat = values.reshape(len(values), -1)
+        if self._stencil_cells.shape[1] == 1:
+            series = flat[:, self._stencil_cells[:, 0]]
+        else:
+            series = np.einsum("tsk,sk->ts", flat[:, self._stencil_cells], self._stencil_weights)
+        series = np.ascontiguousarray(series.T, dtype=np.float32)
+        if not np.all(np.isfinite(series)):
+            bad = self._stencil_ids[~np.isfinite(series).all(axis=1)]
+            raise ValueError(f"Grid values at the cells of nodes {bad[:5].tolist()} contain NaN or infinite values.")
+        return WeatherData._from_series_array(self._stencil_ids, series, same_nodes=self._same_nodes,
+                                              attributes=attributes)
+
+    def extract_set(self, grids: dict[WeatherVariable, np.ndarray],
+                    attributes: WeatherAttributes = None) -> "WeatherSet":
+        """Extract the node time series of several weather variables, see ``extract()``.
+
+        Args:
+            grids (dict[WeatherVariable, np.ndarray]): ``(time, lat, lon)`` values of each weather variable.
+            attributes (WeatherAttributes): Optional metadata attributes.
+        """
+        WeatherVariable.validate_types(grids)
+        if not grids:
+            raise ValueError("At least one weather variable grid is required.")
+        ws = WeatherSet()
+        for v, values in grids.items():
+            ws[v] = self.extract(values, attributes=attributes)
+        ws.validate()
+        return ws
+
+
+def read_grid(file_path: Union[str, Path],
+              variables: dict[WeatherVariable, str],
+              lat_name: str = "lat",
+              lon_name: str = "lon") -> tuple[np.ndarray, np.ndarray, dict[WeatherVariable, np.ndarray]]:
+    """Read grid coordinates and ``(time, lat, lon)`` weather variable arrays from a local file.
+
+    Args:
+        file_path (Union[str, Path]): ``.npz`` file, or ``.nc`` NetCDF file (requires ``netCDF4``). NetCDF
+            masked (fill) values are read as NaN.
+        variables (dict[WeatherVariable, str]): ``{WeatherVariable: array_name}`` of the arrays to read.
+        lat_name (str): Name of the latitude coordinate array.
+        lon_name (str): Name of the longitude coordinate array.
+
+    Returns:
+        (tuple[np.ndarray, np.ndarray, dict[WeatherVariable, np.ndarray]]): latitudes, longitudes, and the
+        float32 values of each weather variable
+    """
+    WeatherVariable.validate_types(variables, str)
+    if not variables:
+        raise ValueError("At least one weather variable name is required.")
+    file_path = Path(file_path)
+    if not file_path.is_file():
+        raise FileNotFoundError(f"Grid file not found: {file_path}")
+
+    names = [lat_name, lon_name, *variables.values()]
+    if file_path.suffix == ".npz":
+        with np.load(file_path) as npz:
+            missing = [n for n in names if n not in npz.files]
+            if missing:
+                raise ValueError(f"Arrays {missing} not found in {file_path}.")
+            arrays = {n: npz[n] for n in names}
+    elif file_path.suffix == ".nc":
+        netcdf = _import_netcdf()
+        with netcdf.Dataset(file_path) as ds:
+            missing = [n for n in names if n not in ds.variables]
+            if missing:
+                raise ValueError(f"Variables {missing} not found in {file_path}.")
+            arrays = {n: np.ma.filled(ds.variables[n][:].astype(np.float64), np.nan) for n in names}
+    else:
+        raise ValueError(f"Unsupported grid file type {file_path.suffix!r}, expected .npz or .nc.")
+
+    lats, lons = arrays[lat_name], arrays[lon_name]
+    grids = {v: np.asarray(arrays[n], dtype=np.float32) for v, n in variables.items()}
+    for v, values in grids.items():
+        if values.ndim != 3 or values.shape[1:] != (lats.size, lons.size):
+            raise ValueError(f"{v.name} values must be shaped (time, {lats.size}, {lons.size}), got {values.shape}.")
+    return lats, lons, grids
+
+
+def _axis_stencil(coords: np.ndarray, positions: np.ndarray, method: str, axis_name: str,
+                  period: float = None) -> tuple[np.ndarray, np.ndarray]:
+    """Cell indices and weights along one grid axis: one cell for nearest, the two neighbours for bilinear.
+
+    With a **period** (360 for longitudes), positions are shifted by whole periods onto the grid, and a grid whose
+    gap across the seam is no wider than its widest cell spacing wraps around.
+    """
+    order = np.argsort(coords, kind="stable")
+    sorted_coords = coords[order]
+    if len(sorted_coords) > 1 and np.any(np.diff(sorted_coords) == 0):
+        raise ValueError(f"Grid {axis_name}s must be distinct.")
+
+    periodic = (period is not None and len(sorted_coords) > 1
+                and 0 < sorted_coords[0] + period - sorted_coords[-1] <= np.diff(sorted_coords).max() * (1 + 1e-9))
+    if periodic:
+        # continue the grid past the seam with its first cell
+        positions = sorted_coords[0] + np.mod(positions - sorted_coords[0], period)
+        sorted_coords = np.append(sorted_coords, sorted_coords[0] + period)
+        order = np.append(order, order[0])
+        low, high = sorted_coords[0], sorted_coords[-1]
+    elif len(sorted_coords) == 1:
+        if method == "bilinear":
+            raise ValueError(f"Bilinear interpolation needs at least two grid {axis_name}s.")
+        low, high = sorted_coords[0], sorted_coords[0]
+    elif method == "nearest":
+        low = sorted_coords[0] - (sorted_coords[1] - sorted_coords[0]) / 2
+        high = sorted_coords[-1] + (sorted_coords[-1] - sorted_coords[-2]) / 2
+    else:
+        low, high = sorted_coords[0], sorted_coords[-1]
+    if period is not None and not periodic:
+        positions = _wrap_positions(positions, low, high, period)
+    outside = ~((positions >= low) & (positions <= high))
+    if len(sorted_coords) > 1 and np.any(outside):
+        raise ValueError(f"Node {axis_name}s {positions[outside][:5].tolist()} are outside the grid [{low}, {high}].")
+
+    # fractional index of each position between the sorted cell centers
+    fraction_index = np.interp(positions, sorted_coords, np.arange(len(sorted_coords), dtype=np.float64))
+    if method == "nearest":
+        cells = np.rint(fraction_index).astype(np.int64)[:, None]
+        weights = np.ones(cells.shape, dtype=np.float64)
+    else:
+        low_index = np.minimum(np.floor(fraction_index).astype(np.int64), len(sorted_coords) - 2)
+        high_weight = fraction_index - low_index
+        cells = np.stack((low_index, low_index + 1), axis=1)
+        weights = np.stack((1 - high_weight, high_weight), axis=1)
+    return order[cells], weights
+
+
+def _wrap_positions(positions: np.ndarray, low: float, high: float, period: float) -> np.ndarray:
+    """Shift positions by one period where that moves them from outside into [low, high]."""
+    for shift in (period, -period):
+        shifted = positions + shift
+        move = ((positions < low) | (positions > high)) & (shifted >= low) & (shifted <= high)
+        positions = np.where(move, shifted, positions)
+    return positions
+
+
+def _import_netcdf():
+    try:
+        import netCDF4
+    except ImportError as e:
+        raise ImportError("NetCDF support requires netCDF4: pip install emodpy-malaria[netcdf]") from e
+    return netCDF4
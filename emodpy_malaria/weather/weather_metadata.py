@@ -1,7 +1,7 @@
 """Weather metadata classes for EMOD ``.bin.json`` files.
 
 Wraps [Metadata](https://emod.idmod.org/emod-api/autoapi/emod_api/weather/weather/) (``BaseMetadata``) for core
-node-offset computation and ``.bin.json`` parsing, and extends it with:
+node-offset computation, and extends it with:
 
 * [WeatherAttributes](https://emod.idmod.org/emodpy-malaria/autoapi/emodpy_malaria/weather/weather_metadata/) — rich metadata (provenance, spatial resolution,
   lat/lon bounds, schema version, etc.).
@@ -18,6 +18,7 @@ from typing import Union
 
 from emod_api.weather.weather import Metadata as BaseMetadata
 
+from emodpy_malaria.utils.node_offsets import decode_node_offsets, encode_node_offsets
 from emodpy_malaria.weather.weather_utils import invert_dict, make_path, save_json, validate_str_value
 
 SERIES_BYTE_VALUE_SIZE = 4
@@ -432,33 +433,26 @@ class WeatherMetadata(WeatherAttributes):
     def from_file(cls, file_path: Union[str, Path]) -> "WeatherMetadata":
         """Read a ``.bin.json`` file.
 
-        Uses [Metadata.from_file()](https://emod.idmod.org/emod-api/autoapi/emod_api/weather/weather/) for core
-        parsing (node offsets, datavalue count), then augments with any
-        additional attributes present in the file.
+        Node offsets are read as stored, so files with shared offsets (deduplicated
+        time series) keep them. Any additional attributes present in the file are kept.
         """
-        base = BaseMetadata.from_file(str(file_path))
-
         with open(str(file_path), "rb") as f:
             content = json.load(f)
-        raw_meta = content.get("Metadata", {})
+        raw_meta = content["Metadata"]
+        node_ids, offsets = decode_node_offsets(content["NodeOffsets"])
 
         return WeatherMetadata(
-            node_ids=dict(base.nodes),
-            series_len=base.datavalue_count,
+            node_ids=dict(sorted(zip(node_ids.tolist(), offsets.tolist()))),
+            series_len=raw_meta["DatavalueCount"],
             attributes=raw_meta,
         )
 
     @staticmethod
     def _convert_offset_str_to_dict(offset_str: str) -> dict[int, int]:
-        entry_count = len(offset_str) // 16
-        node_offsets = {}
-        for i in range(entry_count):
-            idx = i * 16
-            entry = offset_str[idx: idx + 16]
-            node_offsets[int(entry[:8], 16)] = int(entry[8:16], 16)
-        return node_offsets
+        node_ids, offsets = decode_node_offsets(offset_str)
+        return dict(zip(node_ids.tolist(), offsets.tolist()))
 
     @staticmethod
     def _convert_offset_dict_to_str(node_offsets: dict[int, int]) -> str:
-        return "".join(f"{node_id:08x}{offset:08x}"
-                       for node_id, offset in node_offsets.items())
+        return encode_node_offsets(np.fromiter(node_offsets.keys(), dtype=np.int64, count=len(node_offsets)),
+                                   np.fromiter(node_offsets.values(), dtype=np.int64, count=len(node_offsets)))
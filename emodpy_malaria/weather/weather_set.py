@@ -6,16 +6,26 @@ four EMOD weather file pairs at once, or convert to/from a single CSV or
 DataFrame containing all variables.
 """
 
+import numpy as np
 import pandas as pd
 
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Union
+from typing import Callable, Optional, Union
 
+from emodpy_malaria.utils.asset_cache import AssetCache
+from emodpy_malaria.utils.emod_enum import ClimateUpdateResolution
 from emodpy_malaria.weather.weather_utils import make_path
 from emodpy_malaria.weather.weather_variable import WeatherVariable
 from emodpy_malaria.weather.weather_metadata import WeatherAttributes
 from emodpy_malaria.weather.weather_data import WeatherData, DataFrameInfo
 
+# variables resampled by summing their steps; others are averaged
+RESAMPLE_AGGREGATIONS = {
+    WeatherVariable.RAINFALL: "sum",
+}
+
 
 class WeatherSet:
     """A set of weather files for all (or a subset of) EMOD weather variables."""
@@ -154,7 +164,8 @@ class WeatherSet:
                  step_column: str = None,
                  weather_columns: dict[WeatherVariable, str] = None,
                  attributes: WeatherAttributes = None,
-                 notes: str = None) -> "WeatherSet":
+                 notes: str = None,
+                 chunk_size: int = None) -> "WeatherSet":
         """Create from a CSV file containing all weather variables.
 
         Args:
@@ -166,9 +177,17 @@ class WeatherSet:
             notes (str): Free-text note stored in the weather file metadata.
                 Use this to record where the original data came from and
                 how it was processed.
+            chunk_size (int): If set, stream the CSV this many rows at a time instead of loading it
+                whole. Each variable's values go straight into one ``(nodes, steps)`` float32 array, so
+                files larger than memory can be converted. Every node must have exactly one row per step.
         """
         if not Path(file_path).is_file():
             raise FileNotFoundError(f"CSV file not found: {file_path}")
+        if chunk_size is not None:
+            return cls._from_csv_chunks(
+                file_path=file_path, node_column=node_column, step_column=step_column,
+                weather_columns=weather_columns, attributes=attributes, notes=notes, chunk_size=chunk_size,
+            )
         return cls._from_csv_data(
             data_csv=str(file_path), node_column=node_column, step_column=step_column,
             weather_columns=weather_columns, attributes=attributes, notes=notes,
@@ -197,6 +216,66 @@ class WeatherSet:
         ws.validate()
         return ws
 
+    @classmethod
+    def _from_csv_chunks(cls,
+                         file_path: Union[str, Path],
+                         node_column: str = None,
+                         step_column: str = None,
+                         weather_columns: dict[WeatherVariable, str] = None,
+                         attributes: WeatherAttributes = None,
+                         notes: str = None,
+                         chunk_size: int = 1_000_000) -> "WeatherSet":
+        if int(chunk_size) != chunk_size or chunk_size < 1:
+            raise ValueError(f"chunk_size must be a positive integer, got {chunk_size}.")
+        infos, weather_columns = cls._init_dataframe_info_dict(node_column, step_column, weather_columns)
+        attributes = attributes or WeatherAttributes()
+        if notes is not None:
+            attributes.notes = notes
+        info = next(iter(infos.values()))
+        nc, sc = info.node_column, info.step_column
+        value_columns = {v: i.value_column for v, i in infos.items()}
+
+        # first pass: node and step IDs size the output arrays
+        node_ids = step_ids = np.zeros(0)
+        for chunk in pd.read_csv(file_path, usecols=[nc, sc], chunksize=chunk_size):
+            _check_csv_chunk(chunk, [nc, sc])
+            node_ids = np.union1d(node_ids, chunk[nc].to_numpy())
+            step_ids = np.union1d(step_ids, chunk[sc].to_numpy())
+        if len(node_ids) == 0:
+            raise ValueError(f"CSV file {file_path} has no data rows.")
+
+        # second pass: route each value to its (node, step) cell
+        shape = (len(node_ids), len(step_ids))
+        series = {v: np.empty(shape, dtype=np.float32) for v in value_columns}
+        filled = np.zeros(shape, dtype=bool)
+        for chunk in pd.read_csv(file_path, usecols=[nc, sc, *value_columns.values()], chunksize=chunk_size):
+            _check_csv_chunk(chunk, [nc, sc, *value_columns.values()])
+            cells = (np.searchsorted(node_ids, chunk[nc].to_numpy()) * shape[1]
+                     + np.searchsorted(step_ids, chunk[sc].to_numpy()))
+            if np.any(filled.flat[cells]) or len(np.unique(cells)) != len(cells):
+                raise ValueError(f"CSV file {file_path} has more than one row for a node and step.")
+            filled.flat[cells] = True
+            for v, column in value_columns.items():
+                try:
+                    values = chunk[column].to_numpy(dtype=np.float32)
+                except (ValueError, TypeError):
+                    raise ValueError(f"Column {column!r} contains values that cannot be converted to float32.")
+                if np.any(np.isinf(values)):
+                    raise ValueError(f"Column {column!r} contains infinite values.")
+                series[v].flat[cells] = values
+        missing = filled.size - np.count_nonzero(filled)
+        if missing:
+            raise ValueError(f"CSV file {file_path} is missing {missing} node/step values; "
+                             f"every node needs one row per step.")
+        del filled
+
+        ws = WeatherSet(weather_columns=weather_columns)
+        node_ids = node_ids.astype(np.int64)
+        for v in value_columns:
+            ws[v] = WeatherData._from_series_array(node_ids, series.pop(v), attributes=attributes)
+        ws.validate()
+        return ws
+
     def to_dataframe(self,
                      node_column: str = None,
                      step_column: str = None,
@@ -209,14 +288,16 @@ class WeatherSet:
 
         infos, weather_columns = self._init_dataframe_info_dict(node_column, step_column, weather_columns)
         self._weather_columns = weather_columns
-        df = None
-        for v in infos:
-            df2 = self[v].to_dataframe(infos[v])
-            if df is None:
-                df = df2
+        columns = {}
+        for v, info in infos.items():
+            data_columns = self[v]._dataframe_columns(info)
+            if not columns:
+                columns = data_columns
+            elif not np.array_equal(columns[info.node_column], data_columns[info.node_column]):
+                raise ValueError(f"Nodes of {v} don't match nodes of {next(iter(infos))}.")
             else:
-                df[infos[v].value_column] = df2[infos[v].value_column]
-        return df
+                columns[info.value_column] = data_columns[info.value_column]
+        return pd.DataFrame(columns)
 
     def to_csv(self, file_path: Union[str, Path],
                node_column: str = None,
@@ -231,45 +312,109 @@ class WeatherSet:
     # Binary file I/O
     # ------------------------------------------------------------------ #
 
-    def _load(self) -> "WeatherSet":
+    def _load(self, mmap: bool = False, max_workers: int = None) -> "WeatherSet":
         if not self.dir_path or not Path(self.dir_path).is_dir():
             raise ValueError("A valid directory is required.")
         if not self.file_names:
             raise ValueError("File names dictionary is required.")
-        for v, n in self.file_names.items():
-            bin_path = self._weather_file_path(n)
-            self[v] = WeatherData.from_file(bin_path)
+        bin_paths = {v: self._weather_file_path(n) for v, n in self.file_names.items()}
+        loaded = _map_variables(lambda bin_path: WeatherData.from_file(bin_path, mmap=mmap), bin_paths, max_workers)
+        for v, wd in loaded.items():
+            self[v] = wd
         self.validate()
         return self
 
-    def _save(self) -> None:
+    def _save(self, max_workers: int = None, cache: Optional[AssetCache] = None) -> None:
         if not self._dir_path:
             raise ValueError("Directory is required.")
         if not self._file_names:
             raise ValueError("File names are required.")
         make_path(self._dir_path)
-        for v, wd in self._weather_dict.items():
-            bin_path = self._weather_file_path(self._file_names[v])
-            wd.to_file(bin_path)
+        writes = {v: (wd, Path(self._weather_file_path(self._file_names[v])).absolute())
+                  for v, wd in self._weather_dict.items()}
+        if cache is None:
+            _map_variables(lambda write: write[0].to_file(write[1]), writes, max_workers)
+        else:
+            _map_variables(lambda write: cache.get_or_create(write[0].digest(),
+                                                             [write[1], write[1].parent / (write[1].name + ".json")],
+                                                             partial(write[0].to_file, write[1])),
+                           writes, max_workers)
 
     @classmethod
     def from_files(cls, dir_path: Union[str, Path],
                    prefix: str = "",
-                   file_names: dict[WeatherVariable, str] = None) -> "WeatherSet":
-        """Load from existing ``.bin`` / ``.bin.json`` file pairs in a directory."""
+                   file_names: dict[WeatherVariable, str] = None,
+                   mmap: bool = False,
+                   max_workers: int = None) -> "WeatherSet":
+        """Load from existing ``.bin`` / ``.bin.json`` file pairs in a directory.
+
+        With ***mmap***, the ``.bin`` files are memory-mapped instead of read (see ``WeatherData.from_file()``).
+        Variables are read concurrently on up to ***max_workers*** threads (default one per variable; 1 reads
+        them one after another).
+        """
         WeatherVariable.validate_types(file_names, [str, Path])
         file_names = file_names or cls.select_weather_files(dir_path=dir_path, prefix=prefix)
         ws = WeatherSet(dir_path=dir_path, file_names=file_names)
-        ws._load()
+        ws._load(mmap=mmap, max_workers=max_workers)
+        return ws
+
+    def select(self, nodes: list[int] = None, steps: slice = None) -> "WeatherSet":
+        """Create a subset of every weather variable with only some nodes and/or time steps.
+
+        See ``WeatherData.select()``.
+        """
+        ws = WeatherSet(weather_columns=dict(self._weather_columns))
+        for v, wd in self.items():
+            ws[v] = wd.select(nodes=nodes, steps=steps)
+        ws.validate()
+        return ws
+
+    def resample(self, resolution: ClimateUpdateResolution,
+                 how: dict[WeatherVariable, str] = None,
+                 from_resolution: ClimateUpdateResolution = None) -> "WeatherSet":
+        """Aggregate every weather variable to a coarser update resolution.
+
+        See ``WeatherData.resample()``. Rainfall is summed and other variables averaged unless ***how***
+        gives the aggregation (``"mean"`` or ``"sum"``) for a variable.
+        """
+        WeatherVariable.validate_types(how, str)
+        how = {**RESAMPLE_AGGREGATIONS, **(how or {})}
+        ws = WeatherSet(weather_columns=dict(self._weather_columns))
+        for v, wd in self.items():
+            ws[v] = wd.resample(resolution, how=how.get(v, "mean"), from_resolution=from_resolution)
+        ws.validate()
+        return ws
+
+    def climatology(self, steps_per_year: int = None) -> "WeatherSet":
+        """Average every weather variable into one year. See ``WeatherData.climatology()``."""
+        ws = WeatherSet(weather_columns=dict(self._weather_columns))
+        for v, wd in self.items():
+            ws[v] = wd.climatology(steps_per_year=steps_per_year)
+        ws.validate()
+        return ws
+
+    def tile(self, series_len: int) -> "WeatherSet":
+        """Repeat every weather variable to a new series length. See ``WeatherData.tile()``."""
+        ws = WeatherSet(weather_columns=dict(self._weather_columns))
+        for v, wd in self.items():
+            ws[v] = wd.tile(series_len)
+        ws.validate()
         return ws
 
     def to_files(self, dir_path: Union[str, Path],
-                 file_names: dict[WeatherVariable, str] = None) -> None:
-        """Write all ``.bin`` / ``.bin.json`` file pairs to a directory."""
+                 file_names: dict[WeatherVariable, str] = None,
+                 max_workers: int = None,
+                 cache: Optional[AssetCache] = None) -> None:
+        """Write all ``.bin`` / ``.bin.json`` file pairs to a directory.
+
+        Variables are written concurrently on up to ***max_workers*** threads (default one per variable; 1
+        writes them one after another). With a ***cache***, each variable's file pair is keyed by its
+        ``WeatherData.digest()`` and copied from the cache when the same data was written before.
+        """
         file_names = file_names or self.make_file_paths()
         self._dir_path = Path(dir_path)
         self._file_names = file_names
-        self._save()
+        self._save(max_workers=max_workers, cache=cache)
 
     # ------------------------------------------------------------------ #
     # Helpers
@@ -400,3 +545,25 @@ class WeatherSet:
                         f"{'data' if in_data else 'columns'} but not "
                         f"{'columns' if in_data else 'data'}."
                     )
+
+
+def _check_csv_chunk(chunk: pd.DataFrame, columns: list[str]) -> None:
+    for c in columns:
+        if chunk[c].hasnans:
+            raise ValueError(f"Column {c!r} contains NaN values.")
+
+
+def _map_variables(function: Callable, arguments: dict, max_workers: int = None) -> dict:
+    """Call ***function*** on each value of ***arguments*** and return the results under the same keys.
+
+    Calls run on a thread pool of up to ***max_workers*** threads (default one per argument). File I/O and
+    the NumPy work in reading, validating and writing weather data release the GIL. The first exception
+    raised by any call is re-raised.
+    """
+    if max_workers is not None and (int(max_workers) != max_workers or max_workers < 1):
+        raise ValueError(f"max_workers must be a positive integer, got {max_workers}.")
+    if max_workers == 1 or len(arguments) < 2:
+        return {key: function(argument) for key, argument in arguments.items()}
+    with ThreadPoolExecutor(max_workers=min(max_workers or len(arguments), len(arguments))) as executor:
+        futures = {key: executor.submit(function, argument) for key, argument in arguments.items()}
+        return {key: future.result() for key, future in futures.items()}
@@ -49,6 +49,7 @@ def build_demographics():
     from emodpy_malaria.utils.distributions import UniformDistribution
     from emodpy_malaria.utils.emod_enum import BirthRateDependence
     from emodpy_malaria.migration import VectorMigrationData
+    from emodpy_malaria.utils.asset_cache import AssetCache
 
     nodes = [
         Node(lat=-2.0, lon=32.0, pop=5000, forced_id=1, name="Village_A"),
@@ -68,10 +69,12 @@ def build_demographics():
                                                 idref="vector_migration_sweep")
 
     # x_vector_migration is swept per-simulation via sweep_x_vector_migration;
-    # the migration file content is the same for all sweep values
+    # the migration file content is the same for all sweep values, so repeat builds
+    # reuse the cached file instead of writing it again
     demog.add_vector_migration(
         data=vector_mig,
         species="gambiae",
+        cache=AssetCache(manifest.migration_cache_dir),
     )
 
     return demog
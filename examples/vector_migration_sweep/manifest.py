@@ -4,6 +4,7 @@ schema_file = "download/schema.json"
 eradication_path = "download/Eradication"
 assets_input_dir = "Assets"
 plugins_folder = "download/reporter_plugins"
+migration_cache_dir = "migration_cache"  # reused across builds, see build_demographics()
 
 plat_name = "Container"
 job_dir = "../example_jobs"
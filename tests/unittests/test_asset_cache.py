@@ -0,0 +1,136 @@
+import pytest
+
+from emod_api.demographics.node import Node
+
+from emodpy_malaria.demographics.malaria_demographics import MalariaDemographics
+from emodpy_malaria.migration import VectorMigrationData
+from emodpy_malaria.utils.asset_cache import AssetCache, link_or_copy
+
+
+def _writer(paths, calls, content="data"):
+    def create():
+        calls.append(1)
+        for path in paths:
+            path.write_text(f"{content} {path.name}")
+    return create
+
+
+@pytest.mark.unit
+class TestAssetCache:
+
+    def test_miss_then_hit(self, tmp_path):
+        cache = AssetCache(tmp_path / "cache")
+        paths = [tmp_path / "out" / "a.bin", tmp_path / "out" / "a.bin.json"]
+        paths[0].parent.mkdir()
+        calls = []
+        assert not cache.get_or_create("abc", paths, _writer(paths, calls))
+        for path in paths:
+            path.unlink()
+        assert cache.get_or_create("abc", paths, _writer(paths, calls))
+        assert len(calls) == 1
+        assert paths[1].read_text() == "data a.bin.json"
+        assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+        assert cache.stats.hit_rate == 0.5
+
+    def test_hit_into_new_location(self, tmp_path):
+        cache = AssetCache(tmp_path / "cache", hard_link=False)
+        first = [tmp_path / "first.bin"]
+        second = [tmp_path / "sub" / "first.bin"]
+        cache.get_or_create("abc", first, _writer(first, []))
+        assert cache.get_or_create("abc", second, _writer(second, [], content="other"))
+        assert second[0].read_text() == "data first.bin"
+
+    def test_miss_does_not_modify_cached_file(self, tmp_path):
+        cache = AssetCache(tmp_path / "cache")
+        paths = [tmp_path / "a.bin"]
+        cache.get_or_create("one", paths, _writer(paths, []))
+        cache.get_or_create("one", paths, _writer(paths, []))
+        cache.get_or_create("two", paths, _writer(paths, [], content="changed"))
+        assert paths[0].read_text() == "changed a.bin"
+        assert (cache.directory / "one" / "file0").read_text() == "data a.bin"
+
+    def test_same_contents_under_other_names_hit(self, tmp_path):
+        cache = AssetCache(tmp_path / "cache")
+        calls = []
+        for _ in range(3):
+            for name in ("gambiae", "funestus"):
+                paths = [tmp_path / f"{name}.bin", tmp_path / f"{name}.bin.json"]
+                cache.get_or_create("abc", paths, _writer(paths, calls))
+        assert (cache.stats.hits, cache.stats.misses) == (5, 1)
+        assert (tmp_path / "funestus.bin").read_text() == "data gambiae.bin"
+
+    def test_rewriting_provided_file_does_not_modify_cache(self, tmp_path):
+        cache = AssetCache(tmp_path / "cache")
+        paths = [tmp_path / "a.bin"]
+        cache.get_or_create("abc", paths, _writer(paths, []))
+        assert cache.get_or_create("abc", paths, _writer(paths, []))
+        paths[0].write_text("overwritten")
+        assert cache.get_or_create("abc", paths, _writer(paths, []))
+        assert paths[0].read_text() == "data a.bin"
+
+    def test_existing_entry_is_kept(self, tmp_path):
+        cache = AssetCache(tmp_path / "cache")
+        one = [tmp_path / "a.bin"]
+        two = [tmp_path / "b.bin", tmp_path / "b.bin.json"]
+        cache.get_or_create("abc", one, _writer(one, []))
+        assert not cache.get_or_create("abc", two, _writer(two, []))
+        assert cache.get_or_create("abc", one, _writer(one, []))
+
+    def test_relative_directory_survives_chdir(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        cache = AssetCache("cache")
+        (tmp_path / "sim").mkdir()
+        monkeypatch.chdir(tmp_path / "sim")
+        paths = [tmp_path / "sim" / "a.bin"]
+        cache.get_or_create("abc", paths, _writer(paths, []))
+        assert (tmp_path / "cache" / "abc" / "file0").is_file()
+
+    def test_missing_output_raises(self, tmp_path):
+        cache = AssetCache(tmp_path / "cache")
+        with pytest.raises(FileNotFoundError):
+            cache.get_or_create("abc", [tmp_path / "never.bin"], lambda: None)
+
+    def test_clear(self, tmp_path):
+        cache = AssetCache(tmp_path / "cache")
+        paths = [tmp_path / "a.bin"]
+        cache.get_or_create("abc", paths, _writer(paths, []))
+        cache.clear()
+        assert not cache.contains("abc")
+        assert cache.stats.requests == 0
+
+    def test_link_or_copy_replaces_destination(self, tmp_path):
+        source = tmp_path / "source.txt"
+        destination = tmp_path / "destination.txt"
+        source.write_text("new")
+        destination.write_text("old")
+        link_or_copy(source, destination)
+        assert destination.read_text() == "new"
+
+
+@pytest.mark.unit
+class TestVectorMigrationCache:
+
+    _RATES = {(1, 2): 0.01, (2, 1): 0.02}
+
+    def test_digest_depends_on_contents_and_options(self):
+        data = VectorMigrationData.from_rates(self._RATES, idref="test")
+        same = VectorMigrationData.from_rates(dict(self._RATES), idref="test")
+        assert data.digest() == same.digest()
+        assert data.digest() != VectorMigrationData.from_rates({(1, 2): 0.01, (2, 1): 0.03}, idref="test").digest()
+        assert data.digest() != VectorMigrationData.from_rates(self._RATES, idref="other").digest()
+        assert data.digest() != data.digest(migration_type="regional")
+        assert data.digest() != data.digest(value_limit=1)
+
+    def test_add_vector_migration_reuses_cached_file(self, tmp_path):
+        nodes = [Node(lat=0, lon=0, pop=100, forced_id=1), Node(lat=1, lon=1, pop=100, forced_id=2)]
+        cache = AssetCache(tmp_path / "cache")
+        path = tmp_path / "vector_migration.bin"
+        contents = []
+        for _ in range(3):
+            demog = MalariaDemographics(nodes=nodes, idref="test")
+            data = VectorMigrationData.from_rates(self._RATES, idref="test")
+            demog.add_vector_migration(data, species="gambiae", filename=str(path), cache=cache)
+            assert demog.migration_files == [path.absolute()]
+            contents.append(path.with_name(path.name + ".json").read_text())
+        assert (cache.stats.hits, cache.stats.misses) == (2, 1)
+        assert contents[0] == contents[2]
@@ -1,3 +1,4 @@
+import tempfile
 import unittest
 import warnings
 from pathlib import Path
@@ -493,6 +494,78 @@ class TestAddVectorMigration(unittest.TestCase):
         self.assertEqual(imp.keywords["x_vector_migration"], 0.5)
 
 
+@pytest.mark.unit
+class TestAddVectorMigrations(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp_dir = Path(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_writes_each_species_and_registers_in_order(self):
+        demog = _make_demographics_with_idref(n_nodes=3)
+        species_data = {
+            "gambiae": _make_vector_migration_data([1, 2], idref="test_idref"),
+            "arabiensis": [7.5e-6, 0.3, 0.6, -1.1],
+            "funestus": dict(gravity_params=[7.5e-6, 0.3, 0.6, -1.1], female_multiplier=0.5),
+        }
+        filenames = {species: str(self.tmp_dir / f"{species}.bin") for species in species_data}
+        demog.add_vector_migrations(species_data, filenames=filenames, x_vector_migration={"funestus": 0.5},
+                                    max_workers=2)
+        self.assertEqual(demog.migration_files, [Path(filenames[species]) for species in species_data])
+        implicits = demog.implicits[-3:]
+        self.assertEqual([imp.keywords["species"] for imp in implicits], list(species_data))
+        self.assertEqual([imp.keywords["filename"] for imp in implicits], [f"{s}.bin" for s in species_data])
+        self.assertNotIn("x_vector_migration", implicits[0].keywords)
+        self.assertEqual(implicits[2].keywords["x_vector_migration"], 0.5)
+        funestus = VectorMigrationData.from_migration_file(filenames["funestus"])
+        self.assertEqual(funestus.num_layers, 2)
+        self.assertEqual(funestus.node_ids, [1, 2, 3])
+
+    def test_matches_single_species_calls(self):
+        params = [7.5e-6, 0.3, 0.6, -1.1]
+        batch = _make_demographics_with_idref(n_nodes=4)
+        batch.add_vector_migrations({"gambiae": params, "funestus": params},
+                                    filenames={"gambiae": str(self.tmp_dir / "a.bin"),
+                                               "funestus": str(self.tmp_dir / "b.bin")})
+        single = _make_demographics_with_idref(n_nodes=4)
+        single.add_vector_migration(VectorMigrationData.from_gravity_model(single, params), species="gambiae",
+                                    filename=str(self.tmp_dir / "c.bin"))
+        self.assertEqual((self.tmp_dir / "a.bin").read_bytes(), (self.tmp_dir / "c.bin").read_bytes())
+        self.assertEqual((self.tmp_dir / "b.bin").read_bytes(), (self.tmp_dir / "c.bin").read_bytes())
+
+    def test_unknown_node_ids_raise_before_registering(self):
+        demog = _make_demographics_with_idref(n_nodes=2)
+        initial_implicits = len(demog.implicits)
+        species_data = {"gambiae": _make_vector_migration_data([1, 2]),
+                        "funestus": _make_vector_migration_data([1, 2, 99])}
+        with self.assertRaises(ValueError) as ctx:
+            demog.add_vector_migrations(species_data, filenames={s: str(self.tmp_dir / f"{s}.bin")
+                                                                 for s in species_data})
+        self.assertIn("99", str(ctx.exception))
+        self.assertEqual(len(demog.implicits), initial_implicits)
+        self.assertEqual(list(self.tmp_dir.glob("*.bin*")), [])
+
+    def test_failed_build_writes_no_files(self):
+        demog = _make_demographics_with_idref(n_nodes=2)
+        species_data = {"gambiae": _make_vector_migration_data([1, 2]), "funestus": [7.5e-6, 0.3]}
+        with self.assertRaises(ValueError):
+            demog.add_vector_migrations(species_data, filenames={s: str(self.tmp_dir / f"{s}.bin")
+                                                                 for s in species_data})
+        self.assertEqual(list(self.tmp_dir.glob("*.bin*")), [])
+
+    def test_rejects_shared_filename_and_empty_input(self):
+        demog = _make_demographics_with_idref()
+        data = _make_vector_migration_data([1, 2])
+        with self.assertRaises(ValueError):
+            demog.add_vector_migrations({"gambiae": data, "funestus": data},
+                                        filenames={"gambiae": "same.bin", "funestus": "same.bin"})
+        with self.assertRaises(ValueError):
+            demog.add_vector_migrations({})
+
+
 @pytest.mark.unit
 class TestAddWeather(unittest.TestCase):
 
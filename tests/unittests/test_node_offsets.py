@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from emodpy_malaria.utils.node_offsets import decode_node_offsets, encode_node_offsets
+
+
+@pytest.mark.unit
+class TestNodeOffsets:
+
+    def test_encode(self):
+        assert encode_node_offsets([1, 0xABCDEF01], [0, 24]) == "0000000100000000abcdef0100000018"
+        assert encode_node_offsets([255], [12], uppercase=True) == "000000FF0000000C"
+
+    def test_decode(self):
+        node_ids, offsets = decode_node_offsets("0000000100000000ABCDEF0100000018")
+        assert node_ids.tolist() == [1, 0xABCDEF01]
+        assert offsets.tolist() == [0, 24]
+        assert node_ids.dtype == np.uint32
+
+    def test_roundtrip_matches_string_formatting(self):
+        rng = np.random.default_rng(3)
+        node_ids = rng.integers(1, 2**32, size=1000)
+        offsets = rng.integers(0, 2**32, size=1000)
+        encoded = encode_node_offsets(node_ids, offsets)
+        assert encoded == "".join(f"{n:08x}{o:08x}" for n, o in zip(node_ids.tolist(), offsets.tolist()))
+        decoded_ids, decoded_offsets = decode_node_offsets(encoded)
+        np.testing.assert_array_equal(decoded_ids, node_ids)
+        np.testing.assert_array_equal(decoded_offsets, offsets)
+
+    def test_empty(self):
+        assert encode_node_offsets([], []) == ""
+        node_ids, offsets = decode_node_offsets("")
+        assert len(node_ids) == len(offsets) == 0
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            decode_node_offsets("0000000100000")
+        with pytest.raises(ValueError):
+            decode_node_offsets("000000010000000g")
+        with pytest.raises(ValueError):
+            encode_node_offsets([2**32], [0])
+        with pytest.raises(ValueError):
+            encode_node_offsets([1], [-12])
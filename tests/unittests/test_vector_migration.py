@@ -1,13 +1,14 @@
 import json
 import tempfile
 import unittest
+import unittest.mock
 from pathlib import Path
 
 import numpy as np
 import pytest
 
 from emodpy_malaria.migration import VectorMigrationData, VECTOR_MIGRATION_BY_GENETICS
-from emodpy.migration.migration_data import SAME_FOR_BOTH_GENDERS, ONE_FOR_EACH_GENDER
+from emodpy.migration.migration_data import MALE, FEMALE, SAME_FOR_BOTH_GENDERS, ONE_FOR_EACH_GENDER
 from emodpy.utils.emod_enum import MigrationType, InterpolationType
 
 
@@ -343,6 +344,148 @@ class TestRoundTripGenetics(unittest.TestCase):
         self.assertEqual(meta["Metadata"]["AlleleCombinations"][1], [["a1", "X"]])
 
 
+@pytest.mark.unit
+class TestSharedGeneticsLayers(unittest.TestCase):
+
+    _SHARED = {
+        (): {(1, 2): 0.01, (2, 1): 0.01},
+        (("a1", "X"),): {(1, 2): 0.05, (2, 1): 0.05},
+        (("a1", "a1"),): {(1, 2): 0.01, (2, 1): 0.01},
+        (("a1", "a0"), ("b0", "b1")): {(1, 2): 0.05, (2, 1): 0.05},
+    }
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_identical_layers_are_detected_but_independent(self):
+        data = VectorMigrationData.from_genetics(self._SHARED)
+        self.assertEqual(data.layer_sharing(), [0, 1, 0, 1])
+        data.get_layer(0, 2)[(1, 2)] = 0.02
+        self.assertEqual(data.get_layer(0, 0)[(1, 2)], 0.01)
+        self.assertEqual(data.layer_sharing(), [0, 1, 2, 1])
+
+    def test_layer_digests(self):
+        data = VectorMigrationData.from_genetics(self._SHARED)
+        digests = data.layer_digests()
+        self.assertEqual(len(set(digests)), 2)
+        self.assertEqual(digests[0], digests[2])
+        # insertion order decides ties in the file, so it is part of the digest
+        reordered = VectorMigrationData.from_rates({(2, 1): 0.01, (1, 2): 0.01})
+        self.assertNotEqual(reordered.layer_digests()[0], digests[0])
+
+    def test_roundtrip_writes_every_layer_and_converts_duplicates_once(self):
+        data = VectorMigrationData.from_genetics(self._SHARED)
+        path = Path(self._tmp.name) / "mig.bin"
+        with self.assertLogs("emodpy_malaria.migration.vector_migration_data", level="INFO"):
+            data.to_migration_file(path)
+        # EMOD has no way to point two allele combinations at one layer
+        self.assertEqual(path.stat().st_size, 4 * 2 * 12)
+        with self.assertLogs("emodpy_malaria.migration.vector_migration_data", level="INFO"):
+            reloaded = VectorMigrationData.from_migration_file(path)
+        self.assertEqual(reloaded.layer_sharing(), [0, 1, 0, 1])
+        self.assertIsNot(reloaded.get_layer(0, 3), reloaded.get_layer(0, 1))
+        self.assertEqual(reloaded.get_layer(0, 1), {(1, 2): 0.05, (2, 1): 0.05})
+
+    def test_identical_gender_layers_read_independently(self):
+        rates = {(1, 2): 0.01, (2, 1): 0.02}
+        path = Path(self._tmp.name) / "mig.bin"
+        VectorMigrationData.from_rates(rates, female_rates=dict(rates)).to_migration_file(path)
+        reloaded = VectorMigrationData.from_migration_file(path)
+        reloaded.get_layer(FEMALE)[(1, 2)] = 0.5
+        self.assertEqual(reloaded.get_layer(MALE), rates)
+
+    def test_shared_layers_write_same_file_as_copies(self):
+        shared = VectorMigrationData.from_genetics(self._SHARED)
+        copies = VectorMigrationData.from_genetics(self._SHARED)
+        copies._layers = [dict(layer) for layer in copies._layers]
+        shared_path = Path(self._tmp.name) / "shared.bin"
+        copies_path = Path(self._tmp.name) / "copies.bin"
+        shared.to_migration_file(shared_path)
+        copies.to_migration_file(copies_path)
+        self.assertEqual(shared_path.read_bytes(), copies_path.read_bytes())
+
+
+@pytest.mark.unit
+class TestSparseInterchange(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_to_scipy_sparse(self):
+        data = VectorMigrationData.from_rates(_RATES_3NODE)
+        (matrix,), node_ids = data.to_scipy_sparse()
+        self.assertEqual(node_ids.tolist(), [1, 2, 3])
+        self.assertEqual(matrix.shape, (3, 3))
+        self.assertAlmostEqual(matrix[0, 2], 0.005)
+        self.assertEqual(matrix.nnz, 6)
+
+    def test_to_scipy_sparse_explicit_index(self):
+        data = VectorMigrationData.from_rates({(1, 2): 0.01})
+        (matrix,), node_ids = data.to_scipy_sparse(node_ids=[7, 2, 1])
+        self.assertEqual(node_ids.tolist(), [7, 2, 1])
+        self.assertAlmostEqual(matrix[2, 1], 0.01)
+        with self.assertRaises(ValueError):
+            data.to_scipy_sparse(node_ids=[1, 3])
+
+    def test_from_scipy_sparse_gender_modes(self):
+        from scipy import sparse
+        matrix = sparse.csr_matrix(np.array([[0.0, 0.1], [0.2, 0.0]]))
+        same = VectorMigrationData.from_scipy_sparse(matrix, [10, 20], idref="test")
+        self.assertEqual(same.gender_data_type, SAME_FOR_BOTH_GENDERS)
+        self.assertEqual(same.get_layer(0), {(10, 20): 0.1, (20, 10): 0.2})
+        self.assertEqual(same.idref, "test")
+        both = VectorMigrationData.from_scipy_sparse([matrix, matrix * 2], [10, 20])
+        self.assertEqual(both.gender_data_type, ONE_FOR_EACH_GENDER)
+        self.assertAlmostEqual(both.get_layer(1)[(20, 10)], 0.4)
+        with self.assertRaises(ValueError):
+            VectorMigrationData.from_scipy_sparse([matrix] * 3, [10, 20])
+
+    def test_from_scipy_sparse_genetics_roundtrip(self):
+        data = VectorMigrationData.from_genetics(_GENETICS)
+        matrices, node_ids = data.to_scipy_sparse()
+        rebuilt = VectorMigrationData.from_scipy_sparse(matrices, node_ids, allele_combinations=data.allele_combinations)
+        self.assertEqual(rebuilt.gender_data_type, VECTOR_MIGRATION_BY_GENETICS)
+        self.assertEqual(rebuilt.ages, [0, 1, 2])
+        for index in range(3):
+            self.assertEqual(rebuilt.get_layer(0, index), data.get_layer(0, index))
+        with self.assertRaises(ValueError):
+            VectorMigrationData.from_scipy_sparse(matrices, node_ids, allele_combinations=[[["a1", "X"]], [], []])
+
+    def test_from_scipy_sparse_validates_rates(self):
+        from scipy import sparse
+        with self.assertRaises(ValueError):
+            VectorMigrationData.from_scipy_sparse(sparse.csr_matrix(np.array([[0.0, 1.5], [0.0, 0.0]])), [1, 2])
+        with self.assertRaises(ValueError):
+            VectorMigrationData.from_scipy_sparse(sparse.csr_matrix(np.array([[0.0, 0.5], [0.0, 0.0]])), [0, 2])
+
+    def test_vectorized_validation_reports_pair(self):
+        with self.assertRaisesRegex(ValueError, r"got -0.1 for pair \(2, 1\)"):
+            VectorMigrationData.from_rates({(1, 2): 0.1, (2, 1): -0.1})
+
+    def test_parquet_roundtrip(self):
+        pytest.importorskip("pyarrow")
+        data = VectorMigrationData.from_genetics(_GENETICS, idref="test")
+        path = data.to_parquet(Path(self._tmp.name) / "rates.parquet")
+        reloaded = VectorMigrationData.from_parquet(path)
+        self.assertEqual(reloaded.idref, "test")
+        self.assertEqual(reloaded.gender_data_type, VECTOR_MIGRATION_BY_GENETICS)
+        self.assertEqual(reloaded.allele_combinations, data.allele_combinations)
+        for index in range(3):
+            self.assertEqual(list(reloaded.get_layer(0, index).items()), list(data.get_layer(0, index).items()))
+
+    def test_parquet_requires_pyarrow(self):
+        data = VectorMigrationData.from_rates(_RATES_3NODE)
+        with unittest.mock.patch.dict("sys.modules", {"pyarrow": None, "pyarrow.parquet": None}):
+            with self.assertRaises(ImportError):
+                data.to_parquet(Path(self._tmp.name) / "rates.parquet")
+
+
 # ---------------------------------------------------------------------------
 # from_migration_file error cases
 # ---------------------------------------------------------------------------
@@ -496,3 +639,728 @@ class TestFromGravityModel(unittest.TestCase):
             demog, gravity_params=[7.5e-6, 0.3, 0.6, -1.1])
         with self.assertRaises(NotImplementedError):
             data.apply_modifier(ages=[0, 15], modifier_fn=lambda r, a, g: r)
+
+    def test_matches_geodesic_gravity_model(self):
+        from emodpy.migration.migration_data import MigrationData
+        demog = self._make_demographics()
+        params = [7.5e-6, 0.3, 0.6, -1.1]
+        data = VectorMigrationData.from_gravity_model(demog, gravity_params=params, female_multiplier=0.5)
+        expected = MigrationData.from_gravity_model(demog, gravity_params=params, female_multiplier=0.5)
+        for index in range(2):
+            layer, expected_layer = data.get_layer(index), expected.get_layer(index)
+            self.assertEqual(list(layer), list(expected_layer))
+            for pair, rate in expected_layer.items():
+                self.assertAlmostEqual(layer[pair] / rate, 1.0, places=4)
+
+    def test_gender_layers_share_pairs(self):
+        demog = self._make_demographics()
+        data = VectorMigrationData.from_gravity_model(
+            demog, gravity_params=[7.5e-6, 0.3, 0.6, -1.1], female_multiplier=0.5)
+        male, female = data.get_layer(0), data.get_layer(1)
+        self.assertIs(male.arrays[0], female.arrays[0])
+        self.assertIs(male.arrays[1], female.arrays[1])
+        # writing and hashing use the arrays; no {(from, to): rate} dict is built
+        with tempfile.TemporaryDirectory() as tmp:
+            data.to_migration_file(Path(tmp) / "mig.bin")
+        data.digest()
+        self.assertEqual(len(male), 6)
+        self.assertIsNone(male._rates)
+        self.assertIsNone(female._rates)
+        self.assertEqual(list(male), list(female))
+
+    def test_modified_layer_writes_new_rates(self):
+        demog = self._make_demographics()
+        data = VectorMigrationData.from_gravity_model(
+            demog, gravity_params=[7.5e-6, 0.3, 0.6, -1.1], female_multiplier=0.5)
+        data.get_layer(1)[(1, 2)] = 0.25
+        with tempfile.TemporaryDirectory() as tmp:
+            reloaded = _write_and_reload(data, tmp)
+        self.assertEqual(reloaded.get_layer(1)[(1, 2)], 0.25)
+        self.assertEqual(reloaded.get_layer(0), data.get_layer(0))
+
+    def test_any_modification_drops_arrays(self):
+        import copy
+        demog = self._make_demographics()
+        data = VectorMigrationData.from_gravity_model(
+            demog, gravity_params=[7.5e-6, 0.3, 0.6, -1.1], female_multiplier=0.5)
+        male, female = data.get_layer(0), data.get_layer(1)
+        copied = copy.copy(male)
+        copied[(1, 2)] = 0.5
+        self.assertNotEqual(male[(1, 2)], 0.5)
+        male |= {(1, 2): 0.25}
+        female.update({(1, 3): 0.125})
+        self.assertEqual(male.scaled(2.0)[(1, 2)], 0.5)
+        with tempfile.TemporaryDirectory() as tmp:
+            reloaded = _write_and_reload(data, tmp)
+        self.assertEqual(reloaded.get_layer(0)[(1, 2)], 0.25)
+        self.assertEqual(reloaded.get_layer(1)[(1, 3)], 0.125)
+        self.assertEqual(reloaded.get_layer(1), female)
+
+
+# ---------------------------------------------------------------------------
+# gravity engine
+# ---------------------------------------------------------------------------
+
+def _grid_nodes(count=40, seed=0):
+    rng = np.random.default_rng(seed)
+    return (np.arange(1, count + 1),
+            rng.uniform(-3.0, -2.0, count),
+            rng.uniform(32.0, 33.0, count),
+            rng.integers(100, 5000, count))
+
+
+@pytest.mark.unit
+class TestGravityEngine(unittest.TestCase):
+
+    def test_haversine_known_distance(self):
+        from emodpy_malaria.migration.gravity import haversine_km
+        # one degree of longitude on the equator
+        self.assertAlmostEqual(float(haversine_km(0.0, 0.0, 0.0, 1.0)), 111.195, places=2)
+
+    def test_value_limit_keeps_highest_rates(self):
+        from emodpy_malaria.migration.gravity import gravity_edges
+        ids, lats, lons, pops = _grid_nodes()
+        params = [7.5e-6, 0.3, 0.6, -1.1]
+        full = gravity_edges(ids, lats, lons, pops, params)
+        limited = gravity_edges(ids, lats, lons, pops, params, value_limit=5)
+        self.assertEqual(len(limited.rates), 5 * len(ids))
+        for source in ids:
+            expected = np.sort(full.rates[full.sources == source])[-5:]
+            actual = np.sort(limited.rates[limited.sources == source])
+            np.testing.assert_allclose(actual, expected)
+
+    def test_no_value_limit_keeps_every_pair(self):
+        from emodpy_malaria.migration.gravity import gravity_edges, haversine_km
+        ids, lats, lons, pops = _grid_nodes(count=12)
+        pops[3] = 0
+        params = [7.5e-6, 0.3, 0.6, -1.1]
+        edges = gravity_edges(ids, lats, lons, pops, params, block_size=5)
+        expected = [(ids[i], ids[j]) for i in range(12) for j in range(12) if i != j and pops[i] and pops[j]]
+        self.assertEqual(list(zip(edges.sources.tolist(), edges.destinations.tolist())), expected)
+        i, j = 0, 5
+        rate = 7.5e-6 * pops[i] ** 0.3 * pops[j] ** 0.6 * float(haversine_km(lats[i], lons[i], lats[j], lons[j])) ** -1.1
+        self.assertAlmostEqual(edges.rates[(edges.sources == ids[i]) & (edges.destinations == ids[j])][0], rate)
+        unlimited = gravity_edges(ids, lats, lons, pops, params, value_limit=11)
+        np.testing.assert_array_equal(unlimited.destinations, edges.destinations)
+
+    def test_block_size_does_not_change_result(self):
+        from emodpy_malaria.migration.gravity import gravity_edges
+        ids, lats, lons, pops = _grid_nodes()
+        params = [7.5e-6, 0.3, 0.6, -1.1]
+        a = gravity_edges(ids, lats, lons, pops, params, value_limit=7, block_size=3)
+        b = gravity_edges(ids, lats, lons, pops, params, value_limit=7, block_size=1000)
+        np.testing.assert_array_equal(a.sources, b.sources)
+        np.testing.assert_array_equal(a.destinations, b.destinations)
+        np.testing.assert_allclose(a.rates, b.rates)
+
+    def test_value_limit_ties_keep_lowest_node_ids(self):
+        from emodpy_malaria.migration.gravity import gravity_edges
+        # four destinations at the same distance and population from node 50
+        ids, lats, lons = [50, 40, 10, 30, 20], [0.0, 1.0, 0.0, -1.0, 0.0], [0.0, 0.0, 1.0, 0.0, -1.0]
+        params = [1e-3, 1.0, 1.0, -1.0]
+        for options in ({"block_size": 1}, {"block_size": 1000}, {"k_nearest": 4}):
+            edges = gravity_edges(ids, lats, lons, [100] * 5, params, value_limit=2, **options)
+            self.assertEqual(edges.destinations[edges.sources == 50].tolist(), [10, 20])
+
+    def test_zero_population_and_self_excluded(self):
+        from emodpy_malaria.migration.gravity import gravity_edges
+        edges = gravity_edges([1, 2, 3], [0.0, 0.1, 0.2], [0.0, 0.1, 0.2], [100, 0, 100], [1.0, 1.0, 1.0, -1.0])
+        pairs = set(zip(edges.sources.tolist(), edges.destinations.tolist()))
+        self.assertEqual(pairs, {(1, 3), (3, 1)})
+        self.assertTrue(np.all(edges.rates <= 1.0))
+
+    def test_unbounded_candidates_match_dense(self):
+        from emodpy_malaria.migration.gravity import gravity_edges
+        ids, lats, lons, pops = _grid_nodes()
+        params = [7.5e-6, 0.3, 0.6, -1.1]
+        dense = gravity_edges(ids, lats, lons, pops, params, value_limit=6)
+        for options in ({"max_distance_km": 1e4}, {"k_nearest": len(ids)}):
+            sparse = gravity_edges(ids, lats, lons, pops, params, value_limit=6, **options)
+            np.testing.assert_array_equal(sparse.sources, dense.sources)
+            np.testing.assert_array_equal(sparse.destinations, dense.destinations)
+            np.testing.assert_allclose(sparse.rates, dense.rates)
+
+    def test_distance_cutoff_and_k_nearest(self):
+        from emodpy_malaria.migration.gravity import gravity_edges, haversine_km
+        ids, lats, lons, pops = _grid_nodes()
+        params = [7.5e-6, 0.3, 0.6, -1.1]
+        dense = gravity_edges(ids, lats, lons, pops, params)
+        distance = haversine_km(lats[dense.sources - 1], lons[dense.sources - 1],
+                                lats[dense.destinations - 1], lons[dense.destinations - 1])
+        near = gravity_edges(ids, lats, lons, pops, params, max_distance_km=30.0)
+        self.assertEqual(set(zip(near.sources.tolist(), near.destinations.tolist())),
+                         set(zip(dense.sources[distance <= 30.0].tolist(), dense.destinations[distance <= 30.0].tolist())))
+        nearest = gravity_edges(ids, lats, lons, pops, params, k_nearest=3)
+        self.assertEqual(np.bincount(nearest.sources).max(), 3)
+        for source in ids[:5]:
+            expected = ids[np.argsort(haversine_km(lats[source - 1], lons[source - 1], lats, lons))[1:4]]
+            self.assertEqual(set(nearest.destinations[nearest.sources == source].tolist()), set(expected.tolist()))
+
+    def test_from_gravity_model_k_nearest(self):
+        from emod_api.demographics.node import Node
+        from emodpy_malaria.demographics.malaria_demographics import MalariaDemographics
+        ids, lats, lons, pops = _grid_nodes(count=12)
+        nodes = [Node(lat=float(la), lon=float(lo), pop=int(p), forced_id=int(i))
+                 for i, la, lo, p in zip(ids, lats, lons, pops)]
+        demog = MalariaDemographics(nodes=nodes, idref="grav_test")
+        data = VectorMigrationData.from_gravity_model(demog, [7.5e-6, 0.3, 0.6, -1.1], female_multiplier=2.0,
+                                                      k_nearest=2)
+        self.assertEqual(data.num_layers, 2)
+        self.assertEqual(len(data._layers[0]), 24)
+        for pair, rate in data._layers[0].items():
+            self.assertAlmostEqual(data._layers[1][pair], min(1.0, 2.0 * rate))
+
+    def test_invalid_gravity_params_raises(self):
+        from emodpy_malaria.migration.gravity import gravity_edges
+        with self.assertRaises(ValueError):
+            gravity_edges([1, 2], [0, 1], [0, 1], [1, 1], [1.0, 1.0])
+
+    def test_from_demographics_and_gravity_params_writes_top_k(self):
+        from emod_api.demographics.node import Node
+        from emodpy_malaria.demographics.malaria_demographics import MalariaDemographics
+        from emodpy_malaria.migration.vector_migration import from_demographics_and_gravity_params
+        ids, lats, lons, pops = _grid_nodes(count=12)
+        nodes = [Node(lat=float(la), lon=float(lo), pop=int(p), forced_id=int(i))
+                 for i, la, lo, p in zip(ids, lats, lons, pops)]
+        demog = MalariaDemographics(nodes=nodes, idref="grav_test")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "vector_migration.bin"
+            migration = from_demographics_and_gravity_params(demog, [7.5e-6, 0.3, 0.6, -1.1],
+                                                             filename=str(path), value_limit=4)
+            meta = json.loads(Path(str(path) + ".json").read_text())
+        self.assertEqual(migration.NodeCount, 12)
+        self.assertEqual(meta["Metadata"]["DatavalueCount"], 4)
+        self.assertEqual(meta["Metadata"]["IdReference"], "grav_test")
+
+    def test_gravity_builders_use_ellipsoidal_distance(self):
+        from emod_api.demographics.node import Node
+        from geographiclib.geodesic import Geodesic
+        from emodpy_malaria.demographics.malaria_demographics import MalariaDemographics
+        from emodpy_malaria.migration.vector_migration import from_demographics_and_gravity_params
+        ids, lats, lons, pops = _grid_nodes(count=6)
+        nodes = [Node(lat=float(la), lon=float(lo), pop=int(p), forced_id=int(i))
+                 for i, la, lo, p in zip(ids, lats, lons, pops)]
+        demog = MalariaDemographics(nodes=nodes, idref="grav_test")
+        params = [7.5e-6, 1.3, 0.6, -1.1]
+        with tempfile.TemporaryDirectory() as tmp:
+            migration = from_demographics_and_gravity_params(demog, params, filename=str(Path(tmp) / "v.bin"))
+        data = VectorMigrationData.from_gravity_model(demog, [7.5e-6, 0.3, 0.6, -1.1])
+        for (source, destination), rate in data.get_layer(0).items():
+            self.assertAlmostEqual(migration[source][destination] / rate, 1.0, places=12)
+        distance = Geodesic.WGS84.Inverse(lats[0], lons[0], lats[1], lons[1])["s12"] / 1000
+        expected = 7.5e-6 * pops[0] ** 0.3 * pops[1] ** 0.6 * distance ** -1.1
+        # haversine distances differ by more than 1e-3 here
+        self.assertAlmostEqual(migration[ids[0]][ids[1]] / expected, 1.0, places=5)
+
+
+# ---------------------------------------------------------------------------
+# bulk migration file reader
+# ---------------------------------------------------------------------------
+
+@pytest.mark.unit
+class TestMigrationFile(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp_dir = self._tmp.name
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_dense_arrays_match_rates(self):
+        from emodpy_malaria.migration import MigrationFile
+        path = Path(self.tmp_dir) / "vector_mig.bin"
+        VectorMigrationData.from_rates(_RATES_3NODE, idref="test").to_migration_file(path)
+        for memory_map in (True, False):
+            reader = MigrationFile(path, memory_map=memory_map)
+            self.assertEqual(reader.layer_count, 1)
+            self.assertEqual(reader.destinations(0).shape, (3, reader.datavalue_count))
+            sources, destinations, rates = reader.edges(0)
+            self.assertEqual(dict(zip(zip(sources.tolist(), destinations.tolist()), rates.tolist())), _RATES_3NODE)
+
+    def test_genetics_layers(self):
+        from emodpy_malaria.migration import MigrationFile
+        path = Path(self.tmp_dir) / "vector_mig.bin"
+        VectorMigrationData.from_genetics(_GENETICS, idref="test").to_migration_file(path)
+        reader = MigrationFile(path)
+        self.assertEqual(reader.layer_count, 3)
+        for index, rates in enumerate(_GENETICS.values()):
+            sources, destinations, values = reader.edges(index)
+            self.assertEqual(dict(zip(zip(sources.tolist(), destinations.tolist()), values.tolist())), rates)
+        with self.assertRaises(IndexError):
+            reader.layer(3)
+
+    def test_node_edges_reads_selected_nodes(self):
+        from emodpy_malaria.migration import MigrationFile
+        path = Path(self.tmp_dir) / "vector_mig.bin"
+        VectorMigrationData.from_rates(_RATES_3NODE, idref="test").to_migration_file(path)
+        reader = MigrationFile(path)
+        sources, destinations, rates = reader.node_edges(0, [3, 7, 1])
+        self.assertEqual(sources.tolist(), [3, 3, 1, 1])
+        self.assertEqual(dict(zip(zip(sources.tolist(), destinations.tolist()), rates.tolist())),
+                         {k: v for k, v in _RATES_3NODE.items() if k[0] in (1, 3)})
+
+    def test_truncated_binary_raises(self):
+        from emodpy_malaria.migration import MigrationFile
+        path = Path(self.tmp_dir) / "vector_mig.bin"
+        VectorMigrationData.from_rates(_RATES_3NODE, idref="test").to_migration_file(path)
+        path.write_bytes(path.read_bytes()[:-12])
+        with self.assertRaises(ValueError):
+            MigrationFile(path)
+
+    def test_legacy_from_file_reads_each_gender_layer(self):
+        from emodpy_malaria.migration.vector_migration import VectorMigration, from_file
+        migration = VectorMigration()
+        migration.GenderDataType = VectorMigration.ONE_FOR_EACH_GENDER
+        migration[1, 0][2] = 0.1
+        migration[2, 0][1] = 0.2
+        migration[1, 1][2] = 0.3
+        migration[2, 1][1] = 0.4
+        path = Path(self.tmp_dir) / "legacy.bin"
+        migration.to_file(path)
+        metafile = Path(str(path) + ".json")
+        meta = json.loads(metafile.read_text())
+        meta["Metadata"]["GenderDataType"] = "ONE_FOR_EACH_GENDER"
+        metafile.write_text(json.dumps(meta))
+        reloaded = from_file(path)
+        self.assertEqual(reloaded.IdReference, migration.IdReference)
+        self.assertEqual(reloaded._layers[0][1][2], 0.1)
+        self.assertEqual(reloaded._layers[1][1][2], 0.3)
+        self.assertEqual(reloaded._layers[1][2][1], 0.4)
+
+
+@pytest.mark.unit
+class TestMigrationDiff(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp_dir = Path(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _write(self, name, rates, **kwargs):
+        path = self.tmp_dir / name
+        VectorMigrationData.from_rates(rates, idref="test", **kwargs).to_migration_file(path)
+        return path
+
+    def test_identical_files(self):
+        from emodpy_malaria.migration import diff_migration_files
+        first = self._write("a.bin", _RATES_3NODE)
+        second = self._write("b.bin", _RATES_3NODE)
+        diff = diff_migration_files(first, second)
+        self.assertTrue(diff.identical)
+        self.assertEqual(str(diff), "Layer 0: 0 added, 0 removed, 0 changed (max |delta| 0)")
+
+    def test_added_removed_changed(self):
+        from emodpy_malaria.migration import diff_migration_files, iter_edge_changes
+        new_rates = dict(_RATES_3NODE)
+        del new_rates[(3, 2)]
+        new_rates[(1, 2)] = 0.02
+        new_rates[(2, 3)] = 0.008 + 1e-9
+        new_rates[(4, 1)] = 0.5
+        first = self._write("a.bin", _RATES_3NODE)
+        second = self._write("b.bin", new_rates)
+        for chunk_size in (1, 2, 100):
+            diff = diff_migration_files(first, second, tolerance=1e-6, chunk_size=chunk_size)
+            layer = diff.layers[0]
+            self.assertEqual((layer.added, layer.removed, layer.changed), (1, 1, 1))
+            self.assertAlmostEqual(layer.max_delta, 0.01)
+            self.assertEqual(diff.nodes_added.tolist(), [4])
+            self.assertEqual(diff.metadata["NodeCount"], (3, 4))
+        changes = list(iter_edge_changes(first, second, tolerance=1e-6))
+        self.assertEqual(len(changes), 1)
+        edges = {(s, d): (o, n) for s, d, o, n in zip(*(a.tolist() for a in changes[0][1:]))}
+        self.assertEqual(edges[(1, 2)], (0.01, 0.02))
+        self.assertTrue(np.isnan(edges[(4, 1)][0]))
+        self.assertTrue(np.isnan(edges[(3, 2)][1]))
+
+    def test_layers_compared_by_index(self):
+        from emodpy_malaria.migration import diff_migration_files
+        first = self._write("a.bin", _RATES_3NODE)
+        second = self._write("b.bin", _RATES_3NODE, female_rates={(1, 2): 0.1})
+        diff = diff_migration_files(first, second)
+        self.assertEqual(len(diff.layers), 2)
+        self.assertTrue(diff.layers[0].identical)
+        self.assertEqual(diff.layers[1].added, 1)
+        self.assertIn("GenderDataType", diff.metadata)
+
+    def test_merge_by_edge(self):
+        from emodpy_malaria.migration import merge_migration_files
+        base = self._write("base.bin", _RATES_3NODE)
+        overlay = self._write("overlay.bin", {(1, 2): 0.5, (4, 1): 0.25})
+        output = merge_migration_files(base, overlay, self.tmp_dir / "merged.bin", chunk_size=2)
+        merged = VectorMigrationData.from_migration_file(output).get_layer(0)
+        expected = dict(_RATES_3NODE)
+        expected.update({(1, 2): 0.5, (4, 1): 0.25})
+        self.assertEqual(merged, expected)
+
+    def test_merge_by_node(self):
+        from emodpy_malaria.migration import merge_migration_files
+        base = self._write("base.bin", _RATES_3NODE)
+        overlay = self._write("overlay.bin", {(1, 2): 0.5})
+        output = merge_migration_files(base, overlay, self.tmp_dir / "merged.bin", by="node")
+        merged = VectorMigrationData.from_migration_file(output).get_layer(0)
+        expected = {k: v for k, v in _RATES_3NODE.items() if k[0] != 1}
+        expected[(1, 2)] = 0.5
+        self.assertEqual(merged, expected)
+
+    def test_merge_value_limit_and_incompatible_files(self):
+        from emodpy_malaria.migration import MigrationFile, merge_migration_files
+        base = self._write("base.bin", _RATES_3NODE)
+        overlay = self._write("overlay.bin", {(1, 4): 0.5})
+        output = merge_migration_files(base, overlay, self.tmp_dir / "merged.bin", value_limit=2)
+        reader = MigrationFile(output)
+        self.assertEqual(reader.datavalue_count, 2)
+        sources, destinations, _ = reader.node_edges(0, [1])
+        self.assertEqual(sorted(destinations.tolist()), [2, 4])
+        genders = self._write("genders.bin", _RATES_3NODE, female_rates=_RATES_3NODE)
+        with self.assertRaises(ValueError):
+            merge_migration_files(base, genders, self.tmp_dir / "bad.bin")
+
+
+@pytest.mark.unit
+class TestMigrationOps(unittest.TestCase):
+
+    def test_chain_is_lazy_and_leaves_input_unchanged(self):
+        from emodpy_malaria.migration import MigrationOps
+        data = VectorMigrationData.from_rates(_RATES_3NODE, idref="test")
+        ops = MigrationOps(data).scale(0.5, sources=[1]).scale(200.0, sources=[3], destinations={2})
+        self.assertIn("scale(0.5) -> scale(200.0)", repr(ops))
+        result = ops.evaluate()
+        self.assertEqual(data.get_layer(0), _RATES_3NODE)
+        expected = dict(_RATES_3NODE)
+        expected.update({(1, 2): 0.005, (1, 3): 0.0025, (3, 2): 1.0})
+        self.assertEqual(result.get_layer(0), expected)
+        self.assertEqual(result.idref, "test")
+        self.assertEqual(list(result.get_layer(0)), list(_RATES_3NODE))
+
+    def test_normalize_and_cap_rows(self):
+        from emodpy_malaria.migration import MigrationOps
+        data = VectorMigrationData.from_rates({(1, 2): 0.2, (1, 3): 0.6, (2, 1): 0.1, (3, 1): 0.0})
+        normalized = MigrationOps(data).normalize(0.5).evaluate().get_layer(0)
+        self.assertAlmostEqual(normalized[(1, 2)], 0.125)
+        self.assertAlmostEqual(normalized[(1, 3)], 0.375)
+        self.assertAlmostEqual(normalized[(2, 1)], 0.5)
+        self.assertEqual(normalized[(3, 1)], 0.0)
+        capped = MigrationOps(data).cap(0.4, sources=[1, 2]).evaluate().get_layer(0)
+        self.assertAlmostEqual(capped[(1, 2)], 0.1)
+        self.assertAlmostEqual(capped[(1, 3)], 0.3)
+        self.assertEqual(capped[(2, 1)], 0.1)
+        with self.assertRaises(ValueError):
+            MigrationOps(data).normalize(1.5)
+
+    def test_mask_threshold_and_top_k(self):
+        from emodpy_malaria.migration import MigrationOps
+        rates = {(1, 2): 0.1, (1, 3): 0.3, (1, 4): 0.1, (1, 5): 0.2, (2, 1): 0.05, (3, 1): 0.01}
+        data = VectorMigrationData.from_rates(rates)
+        masked = MigrationOps(data).mask(destinations=[1]).evaluate().get_layer(0)
+        self.assertEqual(masked, {(2, 1): 0.05, (3, 1): 0.01})
+        dropped = MigrationOps(data).mask(sources=[1], invert=True).evaluate().get_layer(0)
+        self.assertEqual(dropped, masked)
+        self.assertEqual(MigrationOps(data).threshold(0.1).evaluate().get_layer(0),
+                         {(1, 2): 0.1, (1, 3): 0.3, (1, 4): 0.1, (1, 5): 0.2})
+        top = MigrationOps(data).top_k(3).evaluate().get_layer(0)
+        # (1, 2) and (1, 4) tie; the earlier edge is kept and insertion order is preserved
+        self.assertEqual(list(top.items()), [((1, 2), 0.1), ((1, 3), 0.3), ((1, 5), 0.2),
+                                             ((2, 1), 0.05), ((3, 1), 0.01)])
+        with self.assertRaises(ValueError):
+            MigrationOps(data).top_k(0)
+
+    def test_combine(self):
+        from emodpy_malaria.migration import MigrationOps
+        data = VectorMigrationData.from_rates(_RATES_3NODE, idref="test", female_rates={(1, 2): 0.9})
+        other = VectorMigrationData.from_rates({(1, 2): 0.2, (4, 1): 0.3}, idref="test")
+        added = MigrationOps(data).combine(other).evaluate()
+        self.assertAlmostEqual(added.get_layer(0)[(1, 2)], 0.21)
+        self.assertEqual(added.get_layer(0)[(4, 1)], 0.3)
+        self.assertEqual(list(added.get_layer(0))[-1], (4, 1))
+        self.assertEqual(added.get_layer(1), {(1, 2): 1.0, (4, 1): 0.3})
+        replaced = MigrationOps(data).combine(MigrationOps(other).scale(0.5), how="replace", layers=[1]).evaluate()
+        self.assertEqual(replaced.get_layer(0), _RATES_3NODE)
+        self.assertEqual(replaced.get_layer(1), {(1, 2): 0.1, (4, 1): 0.15})
+        self.assertEqual(MigrationOps(data).combine(other, how="max").evaluate().get_layer(1)[(1, 2)], 0.9)
+        with self.assertRaises(ValueError):
+            MigrationOps(data).combine(VectorMigrationData.from_rates(_RATES_3NODE, idref="other"))
+        with self.assertRaises(ValueError):
+            MigrationOps(data).combine(other, how="min")
+
+    def test_genetics_layers_stay_independent_and_write(self):
+        from emodpy_malaria.migration import MigrationOps
+        rates = dict(_GENETICS)
+        rates[(("b1", "b1"),)] = _GENETICS[()]
+        data = VectorMigrationData.from_genetics(rates, idref="test")
+        # layer 2 duplicates layer 0
+        result = MigrationOps(data).threshold(0.02).scale(4.0, layers=[1]).evaluate()
+        self.assertIsNot(result.get_layer(0, 2), result.get_layer(0, 0))
+        self.assertEqual(result.get_layer(0, 2), result.get_layer(0, 0))
+        self.assertEqual(result.get_layer(0, 0), {})
+        self.assertEqual(result.get_layer(0, 1), {(1, 2): 0.2, (2, 1): 0.2})
+        self.assertEqual(result.get_layer(0, 3), {(1, 2): 0.1, (2, 1): 0.1})
+        self.assertEqual(result.allele_combinations, data.allele_combinations)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            reloaded = _write_and_reload(result, tmp_dir)
+        self.assertEqual(reloaded.layer_sharing(), [0, 1, 0, 3])
+        self.assertAlmostEqual(reloaded.get_layer(0, 1)[(1, 2)], 0.2)
+
+    def test_legacy_vector_migration(self):
+        from emodpy_malaria.migration import MigrationOps
+        from emodpy_malaria.migration.vector_migration import VectorMigration
+        migration = VectorMigration()
+        migration.IdReference = "test"
+        migration[1][2] = 0.1
+        migration[1][3] = 0.3
+        migration[2][1] = 0.2
+        result = MigrationOps(migration).normalize().top_k(1).evaluate()
+        self.assertIsInstance(result, VectorMigration)
+        self.assertEqual(result.IdReference, "test")
+        self.assertEqual(dict(result[1]), {3: 0.75})
+        self.assertEqual(dict(result[2]), {1: 1.0})
+        self.assertEqual(dict(migration[1]), {2: 0.1, 3: 0.3})
+        with self.assertRaises(TypeError):
+            MigrationOps(_RATES_3NODE)
+
+
+# ---------------------------------------------------------------------------
+# CSR-backed VectorMigration layers
+# ---------------------------------------------------------------------------
+
+@pytest.mark.unit
+class TestSparseLayer(unittest.TestCase):
+
+    def test_write_buffer_freezes_into_csr(self):
+        from emodpy_malaria.migration.vector_migration import Layer
+        layer = Layer()
+        layer[3][1] = 0.3
+        layer[1][2] = 0.1
+        layer[1][3] = 0.2
+        np.testing.assert_array_equal(layer.nodes, [1, 3])
+        np.testing.assert_array_equal(layer.indptr, [0, 2, 3])
+        np.testing.assert_array_equal(layer.destinations, [2, 3, 1])
+        np.testing.assert_allclose(layer.rates, [0.1, 0.2, 0.3])
+        self.assertEqual(layer.DatavalueCount, 2)
+        self.assertEqual(layer.NodeCount, 2)
+
+    def test_indexing_frozen_row_updates_it(self):
+        from emodpy_malaria.migration.vector_migration import Layer
+        layer = Layer.from_arrays([1, 1, 2], [2, 3, 1], [0.1, 0.2, 0.3])
+        layer[1][2] = 0.5
+        layer[1][4] = 0.6
+        self.assertEqual(dict(layer[1]), {2: 0.5, 3: 0.2, 4: 0.6})
+        self.assertEqual(layer.DatavalueCount, 3)
+        self.assertEqual(len(layer.rates), 4)
+
+    def test_row_writes_after_whole_layer_query_persist(self):
+        from emodpy_malaria.migration.vector_migration import Layer
+        layer = Layer()
+        row = layer[1]
+        row[2] = 0.1
+        self.assertEqual(layer.NodeCount, 1)
+        row[3] = 0.2
+        row[2] += 0.1
+        np.testing.assert_array_equal(layer.destinations, [2, 3])
+        np.testing.assert_allclose(layer.rates, [0.2, 0.2])
+        self.assertEqual(row[7], 0.0)
+        self.assertNotIn(7, row)
+        self.assertEqual(row, {2: 0.2, 3: 0.2})
+
+    def test_items_does_not_buffer_rows(self):
+        from emodpy_malaria.migration.vector_migration import Layer
+        layer = Layer.from_arrays([1, 1, 2], [2, 3, 1], [0.1, 0.2, 0.3])
+        rows = {source: dict(row) for source, row in layer.items()}
+        self.assertEqual(rows, {1: {2: 0.1, 3: 0.2}, 2: {1: 0.3}})
+        self.assertEqual(layer._buffer, {})
+
+    def test_mutable_mapping_api(self):
+        from emodpy_malaria.migration.vector_migration import Layer
+        layer = Layer.from_arrays([1, 1, 2], [2, 3, 1], [0.1, 0.2, 0.3])
+        layer.update({3: {1: 0.4}})
+        del layer[1]
+        self.assertEqual(list(layer), [2, 3])
+        self.assertEqual(layer[3].pop(1), 0.4)
+        self.assertEqual(layer.DatavalueCount, 1)
+
+    def test_from_arrays_keeps_last_repeated_pair(self):
+        from emodpy_malaria.migration.vector_migration import Layer
+        layer = Layer.from_arrays([2, 1, 2], [1, 2, 1], [0.1, 0.2, 0.3], nodes=[5])
+        self.assertEqual(list(layer), [1, 2, 5])
+        self.assertEqual(layer[2][1], 0.3)
+        self.assertNotIn(4, layer)
+        self.assertIn(5, layer)
+
+    def test_non_integer_node_id_raises(self):
+        from emodpy_malaria.migration.vector_migration import Layer
+        with self.assertRaises(RuntimeError):
+            Layer()["a"]
+
+    def test_migration_properties(self):
+        from emodpy_malaria.migration.vector_migration import VectorMigration
+        migration = VectorMigration()
+        migration[4][1] = 0.1
+        migration[2][1] = 0.1
+        migration[2][4] = 0.2
+        self.assertEqual(migration.Nodes, [2, 4])
+        self.assertEqual(migration.NodeCount, 2)
+        self.assertEqual(migration.DatavalueCount, 2)
+        self.assertEqual(migration.get_node_offsets(), {2: 0, 4: 24})
+
+
+# ---------------------------------------------------------------------------
+# vectorized top-k block writer
+# ---------------------------------------------------------------------------
+
+def _reference_blocks(node_ids, sources, destinations, rates, count, reverse_ties):
+    """Per-node Python version of the writer ordering rules."""
+    expected = []
+    for node in node_ids:
+        pairs = [(d, r) for s, d, r in zip(sources, destinations, rates) if s == node]
+        pairs = sorted(pairs, key=lambda x: x[1], reverse=True)[:count]
+        pairs = list(reversed(pairs)) if reverse_ties else sorted(pairs, key=lambda x: x[1])
+        pairs += [(0, 0.0)] * (count - len(pairs))
+        expected.append(pairs)
+    return expected
+
+
+@pytest.mark.unit
+class TestNodeBlocks(unittest.TestCase):
+
+    def _check(self, sources, destinations, rates, count):
+        from emodpy_malaria.migration.migration_file import node_blocks
+        node_ids = sorted(set(sources) | {99})
+        for reverse_ties in (False, True):
+            blocks = node_blocks(node_ids, sources, destinations, rates, count, reverse_ties=reverse_ties)
+            actual = [list(zip(row["destinations"].tolist(), row["rates"].tolist())) for row in blocks]
+            self.assertEqual(actual, _reference_blocks(node_ids, sources, destinations, rates, count, reverse_ties))
+
+    def test_matches_reference_with_ties(self):
+        rng = np.random.default_rng(3)
+        sources = rng.integers(1, 20, 300).tolist()
+        destinations = rng.integers(1, 50, 300).tolist()
+        rates = rng.choice([0.1, 0.2, 0.3], 300).tolist()
+        self._check(sources, destinations, rates, 4)
+
+    def test_matches_reference_with_one_long_row(self):
+        rng = np.random.default_rng(4)
+        sources = [1] * 500 + rng.integers(2, 40, 60).tolist()
+        destinations = rng.integers(1, 1000, 560).tolist()
+        rates = rng.choice([0.1, 0.2, 0.5], 560).tolist()
+        self._check(sources, destinations, rates, 6)
+
+    def test_legacy_writer_ties_on_ascending_id(self):
+        from emodpy_malaria.migration.vector_migration import VectorMigration
+        migration = VectorMigration()
+        for destination in (5, 2, 4, 3):
+            migration[1][destination] = 0.1
+        migration[2][1] = 0.2
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "legacy.bin"
+            migration.to_file(path, value_limit=3)
+            data = np.fromfile(path, dtype=np.dtype([("destinations", "<u4", (3,)), ("rates", "<f8", (3,))]))
+        self.assertEqual(data["destinations"][0].tolist(), [4, 3, 2])
+        self.assertEqual(data["destinations"][1].tolist(), [1, 0, 0])
+
+
+# ---------------------------------------------------------------------------
+# streaming CSV to binary converter
+# ---------------------------------------------------------------------------
+
+@pytest.mark.unit
+class TestCsvToBinConverter(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp_dir = Path(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _write_csv(self, lines):
+        path = self.tmp_dir / "migration.csv"
+        path.write_text("\n".join(lines) + "\n")
+        return path
+
+    def test_no_headers_keeps_first_row(self):
+        from emodpy_malaria.migration import MigrationFile
+        from emodpy_malaria.migration.migration_scripts.convert_csv_to_bin_vector_migration import convert_csv_to_bin
+        path = self._write_csv(["2,1,0.1", "1,2,0.2", "1,3,0.3", "2,3,0.4"])
+        metadata = convert_csv_to_bin(path, id_ref="test")
+        reader = MigrationFile(metadata.filename_out)
+        self.assertEqual(reader.node_ids.tolist(), [2, 1])
+        self.assertEqual(reader.datavalue_count, 2)
+        self.assertEqual(reader.destinations(0).tolist(), [[1, 3], [2, 3]])
+        self.assertEqual(reader.rates(0).tolist(), [[0.1, 0.4], [0.2, 0.3]])
+
+    def test_chunk_size_does_not_change_output(self):
+        from emodpy_malaria.migration.migration_scripts.convert_csv_to_bin_vector_migration import convert_csv_to_bin
+        lines = ["FromNodeID,ToNodeID,RateMales,RateFemales"]
+        lines += [f"{s},{d},{s / 100},{d / 100}" for d in range(1, 9) for s in (3, 1, 2) if s != d]
+        path = self._write_csv(lines)
+        small = convert_csv_to_bin(path, self.tmp_dir / "small.bin", chunk_size=2)
+        large = convert_csv_to_bin(path, self.tmp_dir / "large.bin")
+        self.assertEqual(small.gender_data_type.value, "ONE_FOR_EACH_GENDER")
+        self.assertEqual(small.offset_str, large.offset_str)
+        self.assertEqual((self.tmp_dir / "small.bin").read_bytes(), (self.tmp_dir / "large.bin").read_bytes())
+
+    def test_allele_combination_headers(self):
+        from emodpy_malaria.migration import MigrationFile
+        from emodpy_malaria.migration.migration_scripts.convert_csv_to_bin_vector_migration import convert_csv_to_bin
+        path = self._write_csv(['FromNodeID,ToNodeID,[],"[[""a1"", ""a1""]]"', "1,2,0.1,0.5", "2,1,0.2,0.6"])
+        metadata = convert_csv_to_bin(path, id_ref="test")
+        reader = MigrationFile(metadata.filename_out)
+        self.assertEqual(reader.metadata["AlleleCombinations"], [[], [["a1", "a1"]]])
+        self.assertEqual(reader.layer_count, 2)
+        self.assertEqual(reader.rates(1).ravel().tolist(), [0.5, 0.6])
+
+    def test_repeated_destination_raises(self):
+        from emodpy_malaria.migration.migration_scripts.convert_csv_to_bin_vector_migration import convert_csv_to_bin
+        path = self._write_csv(["1,2,0.1", "2,1,0.2", "1,2,0.3"])
+        with self.assertRaises(ValueError):
+            convert_csv_to_bin(path, chunk_size=1)
+        self.assertFalse((self.tmp_dir / "migration.bin").exists())
+
+    def test_txt_to_bin_records_migration_type(self):
+        from emodpy_malaria.migration.migration_scripts.convert_txt_to_bin import convert_txt_to_bin
+        path = self._write_csv(["1,2,0.1", "2,1,0.2", "2,3,0.3"])
+        out = self.tmp_dir / "regional.bin"
+        convert_txt_to_bin(path, out, "REGIONAL_MIGRATION", "test")
+        meta = json.loads(Path(str(out) + ".json").read_text())
+        self.assertEqual(meta["Metadata"]["MigrationType"], "REGIONAL_MIGRATION")
+        self.assertEqual(meta["Metadata"]["DatavalueCount"], 2)
+        with self.assertRaises(ValueError):
+            convert_txt_to_bin(path, out, "NOT_A_TYPE", "test")
+
+
+# ---------------------------------------------------------------------------
+# synthetic from_params migration
+# ---------------------------------------------------------------------------
+
+@pytest.mark.unit
+class TestFromParams(unittest.TestCase):
+
+    def test_thirty_neighbours_per_node(self):
+        from emodpy_malaria.migration.vector_migration import from_params
+        np.random.seed(1)
+        migration = from_params(num_nodes=50, id_ref="params_test")
+        self.assertEqual(migration.Nodes, list(range(1, 51)))
+        self.assertEqual(migration.DatavalueCount, 30)
+        self.assertEqual(migration.IdReference, "params_test")
+        layer = migration._layers[0]
+        self.assertTrue(np.all(layer.rates > 0))
+        self.assertTrue(np.all((layer.destinations >= 1) & (layer.destinations <= 50)))
+        self.assertNotIn(1, layer[1])
+
+    def test_rates_scale_with_migration_factor(self):
+        from emodpy_malaria.migration.vector_migration import from_params
+        np.random.seed(2)
+        single = from_params(num_nodes=20)
+        np.random.seed(2)
+        double = from_params(num_nodes=20, migration_factor=2.0)
+        np.testing.assert_allclose(double._layers[0].rates, 2.0 * single._layers[0].rates)
+
+    def test_node_pops_from_params(self):
+        from emodpy_malaria.migration.vector_migration import _node_pops_from_params
+        np.random.seed(3)
+        npops = _node_pops_from_params(1e6, 10, 0.3)
+        self.assertEqual(len(npops), 10)
+        self.assertEqual(npops[0], 700000)
+        self.assertAlmostEqual(npops.sum(), 1e6, delta=10)
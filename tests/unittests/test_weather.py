@@ -9,6 +9,7 @@ from emodpy_malaria.weather.weather_variable import WeatherVariable
 from emodpy_malaria.weather.weather_metadata import WeatherAttributes, WeatherMetadata
 from emodpy_malaria.weather.weather_data import WeatherData, DataFrameInfo
 from emodpy_malaria.weather.weather_set import WeatherSet
+from emodpy_malaria.weather.weather_grid import WeatherGrid, read_grid
 from emodpy_malaria.weather import csv_to_weather, weather_to_csv
 from emodpy_malaria.weather.weather_config import set_climate_constant, set_climate_by_data
 from emodpy_malaria.utils.emod_enum import ClimateUpdateResolution
@@ -185,6 +186,25 @@ class TestWeatherData:
         assert wd.metadata.series_count == 2  # only 2 unique series stored
         assert wd.metadata.node_count == 3
 
+    def test_from_dict_unique_series_order_and_same_nodes(self):
+        a, b = [1.0, 2.0], [3.0, 4.0]
+        wd = WeatherData.from_dict({5: b, 2: a, 9: b, 1: a}, same_nodes={9: [7]})
+        np.testing.assert_array_equal(wd.data, [b, a])
+        assert wd.metadata.node_offsets == {1: 8, 2: 8, 5: 0, 7: 0, 9: 0}
+        unique = wd.to_dict(only_unique_series=True)
+        assert list(unique) == [1, 5]
+        shared = wd.to_dict(copy_data=False)
+        assert shared[5].base is wd.data and shared[7].base is wd.data
+
+    def test_from_dict_digest_collision_keeps_series_apart(self, monkeypatch):
+        import emodpy_malaria.weather.weather_data as weather_data
+        monkeypatch.setattr(weather_data, "hash", lambda _: 0, raising=False)
+        ns = {1: [1.0, 2.0], 2: [1.0, 2.0], 3: [-0.0, 2.0], 4: [0.0, 2.0]}
+        wd = WeatherData.from_dict(ns)
+        assert wd.metadata.series_count == 3
+        series = wd.to_dict()
+        assert np.signbit(series[3][0]) and not np.signbit(series[4][0])
+
     def test_from_dict_nan_rejected(self):
         ns = {1: [1.0, float("nan"), 3.0]}
         with pytest.raises(ValueError, match="NaN"):
@@ -210,6 +230,141 @@ class TestWeatherData:
         wd2 = WeatherData.from_file(path)
         assert wd == wd2
 
+    def test_file_roundtrip_shared_offsets(self, tmp_path):
+        shared = np.array([1.0, 2.0, 3.0], dtype=np.float32)
+        ns = {1: shared, 2: np.array([4.0, 5.0, 6.0], dtype=np.float32), 3: shared}
+        wd = WeatherData.from_dict(ns)
+        path = tmp_path / "test_weather.bin"
+        wd.to_file(path)
+        wd2 = WeatherData.from_file(path)
+        assert wd2.metadata.node_offsets == wd.metadata.node_offsets
+        assert wd2.metadata.series_count == 2
+        np.testing.assert_array_equal(wd2.to_dict()[3], shared)
+
+    def test_resample_keeps_shared_series(self):
+        ns = {1: np.arange(17, dtype=np.float32), 2: np.ones(17, dtype=np.float32)}
+        ns[3] = ns[1]
+        wd = WeatherData.from_dict(ns, attributes=WeatherAttributes(update_freq="CLIMATE_UPDATE_DAY"))
+        weekly = wd.resample(ClimateUpdateResolution.CLIMATE_UPDATE_WEEK)
+        assert weekly.metadata.update_resolution == "CLIMATE_UPDATE_WEEK"
+        assert weekly.metadata.series_len == 3
+        assert weekly.metadata.series_count == 2
+        np.testing.assert_array_equal(weekly.to_dict()[3], [3, 10, 15])
+        summed = wd.resample(ClimateUpdateResolution.CLIMATE_UPDATE_WEEK, how="sum")
+        np.testing.assert_array_equal(summed.to_dict()[2], [7, 7, 3])
+
+    def test_resample_resolutions(self):
+        wd = WeatherData.from_dict({1: np.arange(48, dtype=np.float32)})
+        with pytest.raises(ValueError, match="update resolution"):
+            wd.resample(ClimateUpdateResolution.CLIMATE_UPDATE_DAY)
+        daily = wd.resample(ClimateUpdateResolution.CLIMATE_UPDATE_DAY,
+                            from_resolution=ClimateUpdateResolution.CLIMATE_UPDATE_HOUR)
+        np.testing.assert_array_equal(daily.data, [[11.5, 35.5]])
+        with pytest.raises(ValueError, match="whole number"):
+            daily.resample(ClimateUpdateResolution.CLIMATE_UPDATE_HOUR)
+        with pytest.raises(ValueError, match="whole number"):
+            daily.resample(ClimateUpdateResolution.CLIMATE_UPDATE_WEEK).resample(
+                ClimateUpdateResolution.CLIMATE_UPDATE_MONTH)
+        with pytest.raises(ValueError, match="aggregation"):
+            daily.resample(ClimateUpdateResolution.CLIMATE_UPDATE_WEEK, how="median")
+
+    def test_climatology_and_tile(self):
+        years = np.stack([np.arange(365), np.arange(365) + 2]).reshape(-1).astype(np.float32)
+        wd = WeatherData.from_dict({1: years, 2: years}, attributes=WeatherAttributes(update_freq="CLIMATE_UPDATE_DAY"))
+        climate = wd.climatology()
+        assert climate.metadata.series_count == 1
+        np.testing.assert_array_equal(climate.to_dict()[2], np.arange(365) + 1)
+        tiled = climate.tile(800)
+        assert tiled.metadata.series_len == 800
+        np.testing.assert_array_equal(tiled.to_dict()[1][365:375], np.arange(10) + 1)
+        with pytest.raises(ValueError, match="steps_per_year"):
+            wd.resample(ClimateUpdateResolution.CLIMATE_UPDATE_MONTH).climatology()
+        with pytest.raises(ValueError, match="whole number"):
+            wd.climatology(steps_per_year=200)
+
+    def test_perturb_windows_and_nodes(self):
+        ns = {1: np.arange(10, dtype=np.float32), 3: np.ones(10, dtype=np.float32)}
+        ns[2] = ns[1]
+        wd = WeatherData.from_dict(ns)
+        shifted = wd.perturb([1.0, -1.0], window=5)
+        assert shifted.metadata.series_count == 2
+        np.testing.assert_array_equal(shifted.to_dict()[2], [1, 2, 3, 4, 5, 4, 5, 6, 7, 8])
+        scaled = wd.perturb(np.array([[2.0], [3.0], [2.0]]), how="scale", clip=(None, 20))
+        assert scaled.metadata.series_count == 3
+        np.testing.assert_array_equal(scaled.to_dict()[1], np.minimum(np.arange(10) * 2, 20))
+        np.testing.assert_array_equal(scaled.to_dict()[2], np.minimum(np.arange(10) * 3, 20))
+        with pytest.raises(ValueError, match="broadcast"):
+            wd.perturb([1.0, 2.0], window=4)
+        with pytest.raises(ValueError, match="perturbation"):
+            wd.perturb(1.0, how="power")
+
+    def test_ensemble_members(self, tmp_path):
+        ns = _make_node_series(2, 12)
+        ns[3] = ns[1]
+        wd = WeatherData.from_dict(ns)
+        members = list(wd.ensemble(3, std=0.5, window=6, seed=11))
+        assert [m.metadata.series_count for m in members] == [2, 2, 2]
+        assert not np.array_equal(members[0].data, members[1].data)
+        again = list(wd.ensemble(3, std=0.5, window=6, seed=11))
+        assert all(m == n for m, n in zip(members, again))
+        per_node = next(wd.ensemble(1, field=1.0, std=np.full((3, 1), 0.5), how="scale", seed=11))
+        assert per_node.metadata.series_count == 3
+        with pytest.raises(ValueError, match="std"):
+            wd.ensemble(2, std=-1.0)
+
+        paths = wd.ensemble_to_files(str(tmp_path / "airtemp_{member:02d}.bin"), 2, std=0.5, window=6, seed=11)
+        assert [p.name for p in paths] == ["airtemp_00.bin", "airtemp_01.bin"]
+        assert WeatherData.from_file(paths[1]) == members[1]
+
+    def test_digest(self, tmp_path):
+        ns = _make_node_series(3, 30)
+        wd = WeatherData.from_dict(ns, attributes=WeatherAttributes(reference="Test"))
+        path = tmp_path / "test_weather.bin"
+        wd.to_file(path)
+        digest = wd.digest()
+        assert WeatherData.from_file(path, mmap=True).digest() == digest
+        wd.metadata.date_created = "2001-01-01"
+        assert wd.digest() == digest
+        assert WeatherData.from_dict(ns, attributes=WeatherAttributes(reference="Other")).digest() != digest
+        assert WeatherData.from_dict(ns, same_nodes={1: [4]}, attributes=WeatherAttributes(reference="Test")).digest() != digest
+        ns[2] = ns[2] + 1
+        assert WeatherData.from_dict(ns, attributes=WeatherAttributes(reference="Test")).digest() != digest
+
+    def test_file_memory_mapped(self, tmp_path):
+        ns = _make_node_series(3, 30)
+        ns[4] = ns[2]
+        wd = WeatherData.from_dict(ns)
+        path = tmp_path / "test_weather.bin"
+        wd.to_file(path)
+        mapped = WeatherData.from_file(path, mmap=True)
+        assert isinstance(mapped.data, np.memmap)
+        assert mapped == wd
+        with pytest.raises(ValueError, match="memory-mapped"):
+            mapped.to_file(path)
+        mapped.to_file(tmp_path / "copy.bin")
+        assert WeatherData.from_file(tmp_path / "copy.bin") == wd
+
+    def test_select_nodes_and_steps(self, tmp_path):
+        ns = _make_node_series(3, 30)
+        ns[4] = ns[2]
+        path = tmp_path / "test_weather.bin"
+        WeatherData.from_dict(ns, attributes=WeatherAttributes(reference="Test")).to_file(path)
+        subset = WeatherData.from_file(path, mmap=True).select(nodes=[4, 2, 3], steps=slice(5, 15))
+        assert not isinstance(subset.data, np.memmap)
+        assert subset.metadata.nodes == [2, 3, 4]
+        assert subset.metadata.series_len == 10
+        assert subset.metadata.series_count == 2
+        assert subset.metadata.id_reference == "Test"
+        for node_id, series in subset.to_dict().items():
+            np.testing.assert_array_equal(series, ns[node_id][5:15])
+
+        subset.to_file(tmp_path / "subset.bin")
+        assert WeatherData.from_file(tmp_path / "subset.bin") == subset
+        with pytest.raises(ValueError):
+            subset.select(nodes=[1])
+        with pytest.raises(ValueError):
+            subset.select(steps=slice(20, 30))
+
     def test_from_dataframe(self):
         df = pd.DataFrame({
             "nodes": [1, 1, 1, 2, 2, 2],
@@ -220,6 +375,27 @@ class TestWeatherData:
         assert wd.metadata.node_count == 2
         assert wd.metadata.series_len == 3
 
+    def test_from_dataframe_unsorted_rows(self):
+        df = pd.DataFrame({
+            "nodes": [2, 1, 2, 1, 2, 1],
+            "steps": [3, 2, 1, 1, 2, 3],
+            "values": [22.0, 11.0, 20.0, 10.0, 21.0, 12.0],
+        })
+        series = WeatherData.from_dataframe(df).to_dict()
+        np.testing.assert_array_equal(series[1], [10.0, 11.0, 12.0])
+        np.testing.assert_array_equal(series[2], [20.0, 21.0, 22.0])
+
+    def test_from_dataframe_rejects_unequal_lengths_and_bad_values(self):
+        df = pd.DataFrame({"nodes": [1, 1, 2], "steps": [1, 2, 1], "values": [1.0, 2.0, 3.0]})
+        with pytest.raises(ValueError, match="equal length"):
+            WeatherData.from_dataframe(df)
+        df = pd.DataFrame({"nodes": [1, 2], "steps": [1, 1], "values": [1.0, "x"]})
+        with pytest.raises(ValueError, match="float32"):
+            WeatherData.from_dataframe(df)
+        df = pd.DataFrame({"nodes": [1, 2], "steps": [1, 1], "values": [1.0, np.inf]})
+        with pytest.raises(ValueError, match="infinite"):
+            WeatherData.from_dataframe(df)
+
     def test_to_dataframe(self):
         ns = {1: [10.0, 11.0], 2: [20.0, 21.0]}
         wd = WeatherData.from_dict(ns)
@@ -227,6 +403,16 @@ class TestWeatherData:
         assert len(df) == 4  # 2 nodes * 2 steps
         assert "nodes" in df.columns
 
+    def test_to_dataframe_shared_series(self):
+        wd = WeatherData.from_dict({3: [1.0, 2.0], 1: [5.0, 6.0], 2: [1.0, 2.0]})
+        df = wd.to_dataframe()
+        assert df["nodes"].tolist() == [1, 1, 2, 2, 3, 3]
+        assert df["steps"].tolist() == [1, 2, 1, 2, 1, 2]
+        assert df["values"].tolist() == [5.0, 6.0, 1.0, 2.0, 1.0, 2.0]
+        assert df["values"].dtype == np.float32
+        unique = wd.to_dataframe(DataFrameInfo(only_unique_series=True))
+        assert unique["nodes"].tolist() == [1, 1, 2, 2]
+
     def test_csv_roundtrip(self, tmp_path):
         ns = _make_node_series(2, 5)
         wd = WeatherData.from_dict(ns)
@@ -329,6 +515,56 @@ class TestWeatherSet:
             for node_id in d1:
                 np.testing.assert_array_almost_equal(d1[node_id], d2[node_id])
 
+    def test_to_dataframe_rejects_mismatched_nodes(self):
+        ws = WeatherSet()
+        ws[WeatherVariable.AIR_TEMPERATURE] = WeatherData.from_dict({1: [1.0], 2: [2.0]})
+        ws[WeatherVariable.RAINFALL] = WeatherData.from_dict({1: [1.0], 3: [2.0]})
+        with pytest.raises(ValueError, match="Nodes"):
+            ws.to_dataframe()
+
+    def test_files_memory_mapped_select(self, tmp_path):
+        df = _make_weather_csv_df(n_nodes=3, series_len=5)
+        ws = WeatherSet.from_dataframe(df)
+        ws.to_files(dir_path=tmp_path)
+        mapped = WeatherSet.from_files(dir_path=tmp_path, mmap=True)
+        assert mapped == ws
+        subset = mapped.select(nodes=[2], steps=slice(1, 3))
+        assert subset.node_ids == [2]
+        for v in ws.weather_variables:
+            np.testing.assert_array_equal(subset[v].to_dict()[2], ws[v].to_dict()[2][1:3])
+
+    def test_files_max_workers(self, tmp_path):
+        df = _make_weather_csv_df(n_nodes=3, series_len=5)
+        ws = WeatherSet.from_dataframe(df)
+        ws.to_files(dir_path=tmp_path / "serial", max_workers=1)
+        ws.to_files(dir_path=tmp_path / "threaded", max_workers=2)
+        for v, name in ws.file_names.items():
+            assert (tmp_path / "serial" / name).read_bytes() == (tmp_path / "threaded" / name).read_bytes()
+        assert WeatherSet.from_files(dir_path=tmp_path / "threaded", max_workers=3) == ws
+        assert WeatherSet.from_files(dir_path=tmp_path / "threaded", max_workers=1) == ws
+        with pytest.raises(ValueError, match="max_workers"):
+            WeatherSet.from_files(dir_path=tmp_path / "threaded", max_workers=0)
+
+    def test_from_files_threaded_missing_file(self, tmp_path):
+        df = _make_weather_csv_df(n_nodes=2, series_len=5)
+        ws = WeatherSet.from_dataframe(df)
+        ws.to_files(dir_path=tmp_path)
+        (tmp_path / ws.file_names[WeatherVariable.RAINFALL]).unlink()
+        with pytest.raises(FileNotFoundError):
+            WeatherSet.from_files(dir_path=tmp_path, file_names=ws.file_names)
+
+    def test_resample_aggregation_per_variable(self):
+        df = _make_weather_csv_df(n_nodes=2, series_len=14)
+        ws = WeatherSet.from_dataframe(df)
+        weekly = ws.resample(ClimateUpdateResolution.CLIMATE_UPDATE_WEEK,
+                             from_resolution=ClimateUpdateResolution.CLIMATE_UPDATE_DAY,
+                             how={WeatherVariable.RELATIVE_HUMIDITY: "sum"})
+        for v, how in [(WeatherVariable.RAINFALL, "sum"), (WeatherVariable.RELATIVE_HUMIDITY, "sum"),
+                       (WeatherVariable.AIR_TEMPERATURE, "mean")]:
+            expected = getattr(ws[v].to_dict()[2].reshape(2, 7).astype(np.float64), how)(axis=1)
+            np.testing.assert_allclose(weekly[v].to_dict()[2], expected, rtol=1e-6)
+        assert weekly.tile(5).climatology(steps_per_year=5).node_ids == ws.node_ids
+
     def test_csv_roundtrip(self, tmp_path):
         df = _make_weather_csv_df(n_nodes=2, series_len=5)
         ws = WeatherSet.from_dataframe(df)
@@ -358,6 +594,99 @@ class TestWeatherSet:
         assert ws2.notes == "ERA5 reanalysis, bilinear interpolation to nodes"
 
 
+# ---------------------------------------------------------------------------
+# WeatherGrid
+# ---------------------------------------------------------------------------
+
+def _make_grid(n_steps=6):
+    lats = np.array([2.0, 1.0, 0.0, -1.0])
+    lons = np.array([10.0, 11.0, 12.0])
+    values = np.random.default_rng(7).random((n_steps, len(lats), len(lons))).astype(np.float32)
+    return lats, lons, values
+
+
+@pytest.mark.unit
+class TestWeatherGrid:
+    def test_nearest_cells_shared(self):
+        lats, lons, values = _make_grid()
+        grid = WeatherGrid(lats, lons, node_ids=[1, 2, 3], node_lats=[1.1, 0.9, -1.4], node_lons=[11.2, 10.8, 9.6])
+        assert grid.node_cells == {1: (1, 1), 2: (1, 1), 3: (3, 0)}
+        wd = grid.extract(values)
+        assert wd.metadata.series_count == 2
+        assert wd.metadata.node_offsets[1] == wd.metadata.node_offsets[2]
+        np.testing.assert_array_equal(wd.to_dict()[3], values[:, 3, 0])
+
+    def test_bilinear_weights(self):
+        lats, lons, values = _make_grid()
+        grid = WeatherGrid(lats, lons, node_ids=[1, 2], node_lats=[0.5, 2.0], node_lons=[11.25, 12.0],
+                           method="bilinear")
+        data = grid.extract(values).to_dict()
+        expected = (0.5 * (0.75 * values[:, 1, 1] + 0.25 * values[:, 1, 2])
+                    + 0.5 * (0.75 * values[:, 2, 1] + 0.25 * values[:, 2, 2]))
+        np.testing.assert_allclose(data[1], expected, rtol=1e-6)
+        np.testing.assert_array_equal(data[2], values[:, 0, 2])
+
+    def test_grid_bounds_and_longitude_wrap(self):
+        lons = np.arange(0.0, 360.0, 90.0)
+        grid = WeatherGrid([0.0, 1.0], lons, node_ids=[1], node_lats=[0.0], node_lons=[-90.0])
+        assert grid.node_cells == {1: (0, 3)}
+        with pytest.raises(ValueError, match="outside the grid"):
+            WeatherGrid([0.0, 1.0], [10.0, 11.0], node_ids=[1], node_lats=[1.6], node_lons=[10.0])
+        with pytest.raises(ValueError, match="outside the grid"):
+            WeatherGrid([0.0, 1.0], [10.0, 11.0], node_ids=[1], node_lats=[1.2], node_lons=[10.0], method="bilinear")
+        with pytest.raises(ValueError, match="grid method"):
+            WeatherGrid([0.0, 1.0], [10.0, 11.0], node_ids=[1], node_lats=[0.0], node_lons=[10.0], method="cubic")
+
+    def test_global_grid_is_periodic(self):
+        lons = np.arange(0.5, 360.0, 1.0)
+        values = np.random.default_rng(3).random((4, 2, len(lons))).astype(np.float32)
+        grid = WeatherGrid([0.0, 1.0], lons, node_ids=[1, 2, 3], node_lats=[0.0] * 3, node_lons=[-0.2, 359.8, 180.2])
+        assert grid.node_cells == {1: (0, 359), 2: (0, 359), 3: (0, 180)}
+        bilinear = WeatherGrid([0.0, 1.0], lons, node_ids=[1, 2], node_lats=[0.0] * 2, node_lons=[-0.25, 0.25],
+                               method="bilinear").extract(values).to_dict()
+        np.testing.assert_allclose(bilinear[1], 0.75 * values[:, 0, 359] + 0.25 * values[:, 0, 0], rtol=1e-6)
+        np.testing.assert_allclose(bilinear[2], 0.25 * values[:, 0, 359] + 0.75 * values[:, 0, 0], rtol=1e-6)
+
+    def test_regional_grid_wraps_within_half_cell(self):
+        grid = WeatherGrid([0.0, 1.0], [0.5, 1.5, 2.5], node_ids=[1], node_lats=[0.0], node_lons=[360.2])
+        assert grid.node_cells == {1: (0, 0)}
+        with pytest.raises(ValueError, match="outside the grid"):
+            WeatherGrid([0.0, 1.0], [0.5, 1.5, 2.5], node_ids=[1], node_lats=[0.0], node_lons=[-0.2],
+                        method="bilinear")
+
+    def test_extract_rejects_bad_values(self):
+        lats, lons, values = _make_grid()
+        grid = WeatherGrid(lats, lons, node_ids=[4], node_lats=[0.0], node_lons=[12.0])
+        with pytest.raises(ValueError, match="shaped"):
+            grid.extract(values[:, 1:])
+        values[2, 2, 2] = np.nan
+        with pytest.raises(ValueError, match="nodes \\[4\\]"):
+            grid.extract(values)
+
+    def test_from_demographics_extract_set(self):
+        lats, lons, values = _make_grid()
+        demog = MalariaDemographics(nodes=[Node(lat=0.1, lon=11.9, pop=100, forced_id=5),
+                                           Node(lat=1.9, lon=10.1, pop=100, forced_id=6)])
+        grid = WeatherGrid.from_demographics(demog, lats, lons)
+        assert grid.node_ids == [5, 6]
+        ws = grid.extract_set({WeatherVariable.AIR_TEMPERATURE: values, WeatherVariable.RAINFALL: values * 2})
+        assert ws.node_ids == [5, 6]
+        np.testing.assert_array_equal(ws[WeatherVariable.RAINFALL].to_dict()[6], values[:, 0, 0] * 2)
+
+    def test_read_grid_npz(self, tmp_path):
+        lats, lons, values = _make_grid()
+        path = tmp_path / "grid.npz"
+        np.savez(path, latitude=lats, longitude=lons, t2m=values)
+        read_lats, read_lons, grids = read_grid(path, {WeatherVariable.AIR_TEMPERATURE: "t2m"},
+                                                lat_name="latitude", lon_name="longitude")
+        np.testing.assert_array_equal(read_lats, lats)
+        np.testing.assert_array_equal(grids[WeatherVariable.AIR_TEMPERATURE], values)
+        with pytest.raises(ValueError, match="not found"):
+            read_grid(path, {WeatherVariable.RAINFALL: "tp"}, lat_name="latitude", lon_name="longitude")
+        with pytest.raises(ValueError, match="Unsupported"):
+            read_grid(__file__, {WeatherVariable.RAINFALL: "tp"})
+
+
 # ---------------------------------------------------------------------------
 # Top-level convenience functions
 # ---------------------------------------------------------------------------
@@ -374,6 +703,27 @@ class TestConvenienceFunctions:
         assert len(bin_files) == 3
         assert len(json_files) == 3
 
+    def test_csv_to_weather_chunked(self, tmp_path):
+        df = _make_weather_csv_df(n_nodes=4, series_len=6)
+        df.loc[df["nodes"] == 3, "rainfall"] = df.loc[df["nodes"] == 1, "rainfall"].to_numpy()
+        csv_path = tmp_path / "weather.csv"
+        df.sample(frac=1.0, random_state=1).to_csv(csv_path, index=False)
+        expected = csv_to_weather(csv_path)
+        ws = csv_to_weather(csv_path, weather_dir=tmp_path / "bin", chunk_size=5)
+        assert ws == expected
+        assert ws[WeatherVariable.RAINFALL].metadata.series_count == 3
+        assert len(list((tmp_path / "bin").glob("*.bin"))) == 3
+
+    def test_csv_to_weather_chunked_rejects_missing_and_duplicate_rows(self, tmp_path):
+        df = _make_weather_csv_df(n_nodes=2, series_len=3)
+        csv_path = tmp_path / "weather.csv"
+        df.drop(index=4).to_csv(csv_path, index=False)
+        with pytest.raises(ValueError, match="missing 1"):
+            csv_to_weather(csv_path, chunk_size=2)
+        pd.concat([df, df.iloc[[0]]]).to_csv(csv_path, index=False)
+        with pytest.raises(ValueError, match="more than one row"):
+            csv_to_weather(csv_path, chunk_size=2)
+
     def test_weather_to_csv_roundtrip(self, tmp_path):
         df_in = _make_weather_csv_df(n_nodes=2, series_len=5)
         csv_to_weather(df_in, weather_dir=tmp_path)
@@ -567,6 +917,41 @@ class TestAddWeather:
         assert "era5_rainfall_daily.bin" in names
         assert "era5_humidity_daily.bin" in names
 
+    def test_add_weather_cache(self, tmp_path, monkeypatch):
+        from emodpy_malaria.utils.asset_cache import AssetCache
+        cache = AssetCache(tmp_path / "cache")
+        for sim in ["sim1", "sim2"]:
+            (tmp_path / sim).mkdir()
+            monkeypatch.chdir(tmp_path / sim)
+            _make_demog([1, 2]).add_weather(_make_weather_set([1, 2]), cache=cache)
+        assert (cache.stats.hits, cache.stats.misses) == (3, 3)
+        for name in ["airtemp_daily.bin", "rainfall_daily.bin.json"]:
+            assert (tmp_path / "sim2" / name).read_bytes() == (tmp_path / "sim1" / name).read_bytes()
+
+        monkeypatch.chdir(tmp_path / "sim1")
+        _make_demog([1, 2]).add_weather(_make_weather_set([1, 2], series_len=6), cache=cache)
+        assert (cache.stats.hits, cache.stats.misses) == (3, 6)
+        assert WeatherData.from_file(tmp_path / "sim1" / "airtemp_daily.bin").metadata.series_len == 6
+        assert WeatherData.from_file(tmp_path / "sim2" / "airtemp_daily.bin").metadata.series_len == 5
+
+    def test_add_weather_cache_hits_under_other_names(self, tmp_path, monkeypatch):
+        from emodpy_malaria.utils.asset_cache import AssetCache
+        monkeypatch.chdir(tmp_path)
+        cache = AssetCache(tmp_path / "cache")
+        for prefix in ["a_", "b_", "a_"]:
+            ws = _make_weather_set([1, 2])
+            _make_demog([1, 2]).add_weather(ws, prefix=prefix, cache=cache)
+        assert (cache.stats.hits, cache.stats.misses) == (6, 3)
+        assert ws.dir_path == str(tmp_path)
+        assert ws.file_names[WeatherVariable.AIR_TEMPERATURE] == "a_airtemp_daily.bin"
+        assert (tmp_path / "b_airtemp_daily.bin").read_bytes() == (tmp_path / "a_airtemp_daily.bin").read_bytes()
+
+        # rewriting an output without the cache must not change the cached copy
+        _make_demog([1, 2]).add_weather(_make_weather_set([1, 2], series_len=6), prefix="b_")
+        _make_demog([1, 2]).add_weather(_make_weather_set([1, 2]), prefix="c_", cache=cache)
+        assert (cache.stats.hits, cache.stats.misses) == (9, 3)
+        assert WeatherData.from_file(tmp_path / "c_airtemp_daily.bin").metadata.series_len == 5
+
     def test_add_weather_extra_nodes(self):
         demog = _make_demog([1, 2])
         ws = _make_weather_set([1, 2, 3])